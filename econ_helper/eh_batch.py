@@ -0,0 +1,601 @@
+"""
+Headless evaluation of graphs saved by the editor, project files or legacy JSON.
+
+The saved node settings are mapped straight to the kernel parameters
+in econ_helper.kernels, so no QApplication and no node widgets are needed.
+"""
+import io
+import logging
+import os
+import traceback
+from collections import namedtuple, OrderedDict
+from functools import partial
+
+import pandas as pd
+
+from econ_helper import eh_project, kernels
+from econ_helper.eh_cache import file_fingerprint, fingerprint_frame, fingerprint_object, joint_fingerprint, result_key
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+GraphNode = namedtuple('GraphNode', ['id', 'op_code', 'type_code', 'title', 'data', 'inputs'])
+
+
+class BatchException(Exception): pass
+class UnsupportedNode(BatchException): pass
+
+# rows per Parquet row group written by ChunkWriter, pyarrow's default for whole
+# tables; dictionary encoding is tried per group, so small groups are slow to write
+PARQUET_ROW_GROUP = 1024 * 1024
+
+# output of a streamed node that was written or dropped chunk by chunk, see evaluate_graph
+STREAMED = 'streamed'
+
+
+def load_graph(filename, allow_pickle=False):
+    """ Returns the serialized scene and the datasets of a project file, None for JSON graphs """
+    return eh_project.read_graph(filename, allow_pickle)
+
+
+def read_input(filename):
+    """ Reads a data file into {sheet name: DataFrame}, the format is taken from the extension
+
+    Workbook sheets are parsed when they are used, the values are callables then.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    name = os.path.splitext(os.path.basename(filename))[0]
+    if ext in ('.xls', '.xlsx', '.xlsm'):
+        with pd.ExcelFile(filename) as xlsdata:
+            return OrderedDict((sheet, partial(kernels.read_excel_sheet, filename, sheet))
+                               for sheet in xlsdata.sheet_names)
+    if ext == '.csv':
+        return {name: pd.read_csv(filename)}
+    if ext == '.parquet':
+        return {name: pd.read_parquet(filename)}
+    if ext == '.feather':
+        return {name: pd.read_feather(filename)}
+    raise BatchException(f'Unsupported input format "{ext}"')
+
+
+def write_output(frames, filename):
+    """ Writes {name: DataFrame} to filename, the format is taken from the extension
+
+    Excel gets one sheet per frame. Other formats hold a single table, so with
+    several frames every one goes to its own '<stem>.<name><ext>' file.
+    """
+    stem, ext = os.path.splitext(filename)
+    ext = ext.lower()
+    if ext in ('.xls', '.xlsx'):
+        with pd.ExcelWriter(filename) as writer:
+            for name, df in frames.items():
+                df.to_excel(writer, sheet_name=name[:31])
+        return [filename]
+
+    writers = {
+        '.csv': lambda df, fname: df.to_csv(fname),
+        '.parquet': lambda df, fname: df.to_parquet(fname),
+        '.feather': lambda df, fname: df.reset_index().to_feather(fname),
+        '.json': lambda df, fname: df.to_json(fname, orient='table'),
+    }
+    if ext not in writers:
+        raise BatchException(f'Unsupported output format "{ext}"')
+
+    written = []
+    for name, df in frames.items():
+        fname = filename if len(frames) == 1 else f'{stem}.{name}{ext}'
+        writers[ext](df, fname)
+        written.append(fname)
+    return written
+
+
+class ChunkWriter:
+    """ Writes results a chunk at a time, to the files write_output would write
+
+    The names of all results are given upfront, as they decide the file names.
+    Only formats that can be appended to are supported: CSV, Parquet and Feather.
+    """
+    def __init__(self, filename, names):
+        self.stem, self.ext = os.path.splitext(filename)
+        self.ext = self.ext.lower()
+        if not self.supports(filename):
+            raise BatchException(f'"{self.ext}" output can\'t be written in chunks')
+        self.filename = filename
+        self.names = list(names)
+        self._files = OrderedDict()
+        self._writers = {}
+        self._pending = {}
+
+    @staticmethod
+    def supports(filename):
+        ext = os.path.splitext(filename)[1].lower()
+        return ext == '.csv' or (ext in ('.parquet', '.feather') and pa is not None)
+
+    def filename_for(self, name):
+        return self.filename if len(self.names) == 1 else f'{self.stem}.{name}{self.ext}'
+
+    def write(self, name, df):
+        first = name not in self._files
+        fname = self._files.setdefault(name, self.filename_for(name))
+        if self.ext == '.csv':
+            df.to_csv(fname, mode='w' if first else 'a', header=first)
+            return
+
+        # same columns as write_output, the continuous index is not stored
+        table = pa.Table.from_pandas(df.reset_index() if self.ext == '.feather' else df, preserve_index=False)
+        if first:
+            if self.ext == '.parquet':
+                self._writers[name] = pq.ParquetWriter(fname, table.schema)
+            else:
+                self._writers[name] = pa.ipc.new_file(fname, table.schema,
+                                                      options=pa.ipc.IpcWriteOptions(compression='lz4'))
+        if self.ext == '.parquet':
+            pending = self._pending.setdefault(name, [])
+            pending.append(table)
+            if sum(t.num_rows for t in pending) >= PARQUET_ROW_GROUP:
+                self._flush(name, whole_groups=True)
+        else:
+            self._writers[name].write_table(table)
+
+    def _flush(self, name, whole_groups=False):
+        pending = self._pending.pop(name, [])
+        if len(pending) == 0:
+            return
+        table = pa.concat_tables(pending)
+        rows = table.num_rows - table.num_rows % PARQUET_ROW_GROUP if whole_groups else table.num_rows
+        self._writers[name].write_table(table.slice(0, rows), row_group_size=PARQUET_ROW_GROUP)
+        if rows < table.num_rows:
+            self._pending[name] = [table.slice(rows)]
+
+    def discard(self, name):
+        """ Removes the partly written result """
+        self._pending.pop(name, None)
+        writer = self._writers.pop(name, None)
+        if writer is not None:
+            writer.close()
+        fname = self._files.pop(name, None)
+        if fname is not None and os.path.exists(fname):
+            os.remove(fname)
+
+    def close(self):
+        """ Finishes the files and returns their names """
+        for name in list(self._writers):
+            self._flush(name)
+            self._writers.pop(name).close()
+        return list(self._files.values())
+
+
+def parse_graph(data):
+    """ Turns the serialized scene into GraphNodes, inputs hold (parent id, output index) per input socket """
+    sockets = {}
+    nodes = OrderedDict()
+    for node_data in data['nodes']:
+        for socket_data in node_data['inputs']:
+            sockets[socket_data['id']] = (node_data['id'], socket_data['index'], True)
+        for socket_data in node_data['outputs']:
+            sockets[socket_data['id']] = (node_data['id'], socket_data['index'], False)
+        nodes[node_data['id']] = GraphNode(node_data['id'], node_data.get('op_code'), node_data.get('type_code'),
+                                           node_data['title'], node_data, [None] * len(node_data['inputs']))
+
+    for edge_data in data['edges']:
+        start, end = sockets.get(edge_data['start']), sockets.get(edge_data['end'])
+        if start is None or end is None:
+            continue
+        # edges can be drawn in both directions
+        if start[2] and not end[2]:
+            start, end = end, start
+        if not end[2] or start[2]:
+            continue
+        nodes[end[0]].inputs[end[1]] = (start[0], start[1])
+
+    return nodes
+
+
+def topological_order(nodes):
+    in_degree = {node_id: 0 for node_id in nodes}
+    children = {node_id: [] for node_id in nodes}
+    for node in nodes.values():
+        for parent in node.inputs:
+            if parent is not None:
+                in_degree[node.id] += 1
+                children[parent[0]].append(node.id)
+
+    order = []
+    ready = [node_id for node_id in nodes if in_degree[node_id] == 0]
+    while ready:
+        node_id = ready.pop(0)
+        order.append(node_id)
+        for child in children[node_id]:
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                ready.append(child)
+
+    if len(order) != len(nodes):
+        logging.warning(f'Graph contains a cycle, {len(nodes) - len(order)} nodes are skipped')
+    return order
+
+
+# op_code -> saved node settings to kernel parameters, keys follow the nodes' serialize()
+PARAMS = {
+    'lag': lambda data: kernels.LagParams(data.get('lag_column'), data['lag_size'], data.get('replace', False)),
+    'lag_grid': lambda data: kernels.LagGridParams(tuple(data.get('lag_columns', [])),
+                                                   tuple(data.get('lag_sizes', []))),
+    'adstock': lambda data: kernels.AdstockParams(data.get('adstock_column'), data['adstock_size'],
+                                                  data.get('replace', False)),
+    'adstock_grid': lambda data: kernels.AdstockGridParams(tuple(data.get('adstock_columns', [])),
+                                                           tuple(data.get('decays', [])),
+                                                           data.get('half_life', False),
+                                                           data.get('saturation', 0), data.get('shape', 1)),
+    'trend': lambda data: kernels.TrendParams(data.get('trend_column'), data.get('replace', False)),
+    'trend_panel': lambda data: kernels.TrendPanelParams(tuple(data.get('trend_columns', [])),
+                                                         data.get('degree', 1), tuple(data.get('knots', [])),
+                                                         data.get('detrend', False)),
+    'unary': lambda data: kernels.UnaryParams(data.get('op_column'), data.get('op'), data.get('replace', False)),
+    'binary': lambda data: kernels.BinaryParams(data.get('op_column_1st'), data.get('op_column_2nd'), data.get('op')),
+    'filter': lambda data: kernels.FilterParams(data.get('filter_column')),
+    'model_search': lambda data: kernels.ModelSearchParams(data.get('target_column'),
+                                                           tuple(data.get('candidates', [])),
+                                                           data.get('strategy', 'forward'),
+                                                           data.get('criterion', 'aic'),
+                                                           data.get('max_factors', 5), data.get('top', 20)),
+    'transform_search': lambda data: kernels.TransformSearchParams(data.get('target_column'),
+                                                                   tuple(data.get('channels', [])),
+                                                                   tuple(data.get('decays', [])),
+                                                                   tuple(data.get('lag_sizes', [])),
+                                                                   tuple(data.get('controls', [])),
+                                                                   data.get('criterion', 'aic'),
+                                                                   data.get('max_rounds', 5)),
+    'cross_validation': lambda data: kernels.CrossValidationParams(data.get('target_column'),
+                                                                   tuple(data.get('factors', [])),
+                                                                   data.get('method', 'ols'), data.get('alpha', 1.0),
+                                                                   data.get('scheme', 'expanding'),
+                                                                   data.get('initial', 52), data.get('horizon', 13),
+                                                                   data.get('step', 13)),
+    'bootstrap': lambda data: kernels.BootstrapParams(data.get('target_column'), tuple(data.get('factors', [])),
+                                                      data.get('method', 'ols'), data.get('alpha', 1.0),
+                                                      data.get('block_size', 8), data.get('replicates', 1000),
+                                                      data.get('confidence', 0.95), data.get('seed', 0)),
+    'regression': lambda data: kernels.RegressionParams(data.get('target_column'), data.get('factors', []),
+                                                        data.get('method', 'ols'), data.get('alpha', 1.0)),
+    'predict': lambda data: kernels.PredictParams(data.get('residuals', True)),
+    'decompose': lambda data: kernels.DecomposeParams(data.get('baseline', 'zero')),
+    'scenario': lambda data: kernels.ScenarioParams(tuple(data.get('scenario_factors', [])),
+                                                    tuple(data.get('changes', []))),
+}
+
+# nodes that only visualize their input
+SKIPPED = {'plotter'}
+
+# eh_conf registers the Qt node classes, so node kinds are told apart by op_code here
+FILE_SOURCES = set(kernels.READERS)
+SOURCES = {'read_xls'} | FILE_SOURCES
+DESTINATIONS = {'write_xls'}
+
+# chain ends whose output is not a table to save
+SINKS = {'regression', 'plotter'}
+
+
+def read_params(node, columns=None):
+    """ Reader parameters of a file data source node """
+    return kernels.ReadParams(node.data.get('filename'), columns, node.data.get('memory_map', False))
+
+
+def consumed_columns(nodes, source_id):
+    """ Columns of the source output the graph reads, None when all of them are needed
+
+    That is the case when a descendant is not configured yet, or when its whole
+    output is a result: a data destination or a chain end other than a sink.
+    """
+    children = {node_id: [] for node_id in nodes}
+    for node in nodes.values():
+        # only the first input is a frame, a model input reads no columns
+        if len(node.inputs) > 0 and node.inputs[0] is not None:
+            children[node.inputs[0][0]].append(node.id)
+    if len(children[source_id]) == 0:
+        return None
+
+    columns = set()
+    seen = set()
+    pending = list(children[source_id])
+    while pending:
+        node = nodes[pending.pop()]
+        if node.id in seen:
+            continue
+        seen.add(node.id)
+
+        try:
+            if node.op_code == 'plotter':
+                params = kernels.PlotParams(node.data.get('plot_columns', []))
+            elif node.op_code in PARAMS:
+                params = PARAMS[node.op_code](node.data)
+            else:
+                return None
+            names = kernels.param_columns(params)
+            if names is not None and node.op_code in kernels.MODEL_KERNELS:
+                names = model_columns(nodes, node)
+        except KeyError:
+            return None
+        if names is None:
+            return None
+        columns.update(names)
+
+        if len(children[node.id]) == 0 and node.op_code not in SINKS:
+            return None
+        pending.extend(children[node.id])
+    return sorted(columns)
+
+
+def model_columns(nodes, node):
+    """ Input columns the model on the second input of node is applied to, None when they are not known """
+    parent = node.inputs[1] if len(node.inputs) > 1 else None
+    if parent is None or nodes[parent[0]].op_code != 'regression':
+        return None
+    return kernels.param_columns(PARAMS['regression'](nodes[parent[0]].data))
+
+
+def model_input(node, outputs):
+    """ The fitted model on the second input of node, None if there is none """
+    parent = node.inputs[1] if len(node.inputs) > 1 else None
+    value = outputs.get(parent[0]) if parent is not None else None
+    # a regression outputs its whole result
+    return value.model if isinstance(value, kernels.RegressionResult) else value
+
+
+def source_page(node, pages):
+    page = node.data.get('current_page')
+    return page if page in pages else list(pages)[0]
+
+
+def source_fingerprint(node, frame, sheets=None):
+    """ The content hash a project file stores with the sheet, the frame is hashed otherwise """
+    refs = node.data.get('dataset_refs', {}) if sheets is None else {}
+    key = refs.get(source_page(node, refs)) if len(refs) > 0 else None
+    if key is None or key.startswith('object-'):
+        return fingerprint_frame(frame)
+    return key
+
+
+def source_frame(node, sheets=None, datasets=None):
+    """ The frame a data source node outputs, from the given sheets or the data saved with the graph """
+    if sheets is None and 'dataset_refs' in node.data:
+        if datasets is None:
+            raise BatchException('the graph refers to datasets of a project file')
+        # only the selected sheet is read
+        sheets = {page: partial(datasets.get, key) for page, key in node.data['dataset_refs'].items()}
+    elif sheets is None:
+        sheets = OrderedDict()
+        for page, value in node.data.get('json_value', {}).items():
+            sheets[page] = partial(pd.read_json, io.StringIO(value), orient='table')
+    if len(sheets) == 0:
+        raise BatchException('no data')
+
+    page = source_page(node, sheets)
+    frame = sheets[page]
+    if callable(frame):
+        frame = frame()
+    if frame is None:
+        raise BatchException(f'sheet "{page}" is missing')
+    return frame
+
+
+def streamable_nodes(nodes):
+    """ Nodes that can run chunk by chunk: file sources and the chains of stream kernels below them """
+    streamable = set()
+    for node_id in topological_order(nodes):
+        node = nodes[node_id]
+        parent = node.inputs[0] if len(node.inputs) > 0 else None
+        if node.op_code in FILE_SOURCES:
+            streamable.add(node_id)
+        elif (node.op_code in kernels.STREAM_KERNELS or node.op_code in DESTINATIONS) \
+                and parent is not None and parent[0] in streamable:
+            streamable.add(node_id)
+    return streamable
+
+
+def _log_failure(node, e):
+    logging.error(f'{node.title} ({node.id}): {e}')
+    if not isinstance(e, BatchException):
+        traceback.print_tb(e.__traceback__)
+
+
+def stream_sources(nodes, streamed, chunksize, outputs, fingerprints, writer=None, names={}):
+    """ Evaluates the streamed nodes reading their sources chunk by chunk
+
+    Only the last chunk of every node is held in memory. Outputs the rest of the
+    graph takes as input, and results when there is no writer, are gathered
+    into outputs; results in names go to the writer as they are computed, any
+    other streamed output is dropped. These nodes get STREAMED as their output.
+    Lag and adstock carry their state from chunk to chunk, so the values are
+    the same as for the whole input at once.
+    """
+    order = [node_id for node_id in topological_order(nodes) if node_id in streamed]
+    gathered = {node.inputs[0][0] for node in nodes.values()
+                if node.id not in streamed and node.op_code not in SKIPPED
+                and len(node.inputs) > 0 and node.inputs[0] is not None and node.inputs[0][0] in streamed}
+    if writer is None:
+        gathered.update(node_id for node_id in order if node_id in names)
+
+    roots = {}
+    for node_id in order:
+        node = nodes[node_id]
+        roots[node_id] = node_id if node.op_code in FILE_SOURCES else roots[node.inputs[0][0]]
+
+    for source_id in [node_id for node_id in order if roots[node_id] == node_id]:
+        tree = [node_id for node_id in order if roots[node_id] == source_id]
+        params, states, chunks = {}, {}, {node_id: [] for node_id in tree if node_id in gathered}
+        failed = set()
+        try:
+            source = nodes[source_id]
+            params[source_id] = read_params(source, consumed_columns(nodes, source_id))
+            fingerprints[source_id] = result_key(source.op_code, params[source_id],
+                                                 file_fingerprint(params[source_id].filename))
+            for node_id in tree[1:]:
+                node, parent_key = nodes[node_id], fingerprints.get(nodes[node_id].inputs[0][0])
+                if node.op_code in DESTINATIONS:
+                    fingerprints[node_id] = parent_key
+                    continue
+                params[node_id] = PARAMS[node.op_code](node.data)
+                fingerprints[node_id] = result_key(node.op_code, params[node_id], parent_key)
+
+            for chunk in kernels.CHUNK_READERS[source.op_code](params[source_id], chunksize):
+                values = {source_id: chunk}
+                for node_id in tree:
+                    node = nodes[node_id]
+                    if node_id != source_id:
+                        parent = node.inputs[0][0]
+                        if parent in failed:
+                            failed.add(node_id)
+                        if node_id in failed:
+                            continue
+                        try:
+                            if node.op_code in DESTINATIONS:
+                                values[node_id] = values[parent]
+                            else:
+                                if node_id not in states:
+                                    error = kernels.validate(params[node_id], values[parent])
+                                    if error is not None:
+                                        raise BatchException(error)
+                                values[node_id], states[node_id] = \
+                                    kernels.STREAM_KERNELS[node.op_code](values[parent], params[node_id],
+                                                                         states.get(node_id))
+                        except Exception as e:
+                            _log_failure(node, e)
+                            failed.add(node_id)
+                            continue
+
+                    if node_id in chunks:
+                        chunks[node_id].append(values[node_id])
+                    elif writer is not None and node_id in names:
+                        writer.write(names[node_id], values[node_id])
+        except Exception as e:
+            _log_failure(nodes[source_id], e)
+            failed.update(tree)
+
+        for node_id in tree:
+            if node_id in failed:
+                if writer is not None and node_id in names:
+                    writer.discard(names[node_id])
+            elif node_id in chunks:
+                outputs[node_id] = pd.concat(chunks.pop(node_id)) if len(chunks[node_id]) > 0 else None
+            else:
+                outputs[node_id] = STREAMED
+
+
+def evaluate_graph(data, sheets=None, cache=None, datasets=None, chunksize=None, writer=None):
+    """ Evaluates a serialized scene
+
+    Returns the parsed nodes and {node id: output} for every node that succeeded.
+    sheets replaces the data saved in the data source nodes, datasets provides
+    the frames of a project file. With a ResultCache, results are looked up and
+    stored under the same keys the editor uses.
+
+    With chunksize, file sources and the lag, adstock, unary, binary and filter
+    nodes below them run chunksize rows at a time, see stream_sources. Their
+    results are written with the writer if there is one.
+    """
+    nodes = parse_graph(data)
+    outputs = {}
+    fingerprints = {}
+
+    streamed = streamable_nodes(nodes) if chunksize and sheets is None else set()
+    if len(streamed) > 0:
+        stream_sources(nodes, streamed, chunksize, outputs, fingerprints, writer, result_names(nodes))
+
+    for node_id in topological_order(nodes):
+        node = nodes[node_id]
+        if node_id in streamed:
+            continue
+        try:
+            if node.op_code in FILE_SOURCES and sheets is None:
+                # the graph is fixed, so only the columns it uses are read
+                params = read_params(node, consumed_columns(nodes, node_id))
+                key = result_key(node.op_code, params, file_fingerprint(params.filename)) \
+                    if cache is not None else None
+                outputs[node_id] = cache.get(key) if cache is not None else None
+                if outputs[node_id] is None:
+                    outputs[node_id] = kernels.READERS[node.op_code](params)
+                    if cache is not None:
+                        cache.put(key, outputs[node_id])
+                fingerprints[node_id] = key
+                continue
+            if node.op_code in SOURCES:
+                outputs[node_id] = source_frame(node, sheets, datasets)
+                if cache is not None:
+                    fingerprints[node_id] = source_fingerprint(node, outputs[node_id], sheets)
+                continue
+            if node.op_code in SKIPPED:
+                continue
+            if node.op_code not in PARAMS and node.op_code not in DESTINATIONS:
+                raise UnsupportedNode(f'node type "{node.op_code}" is not supported')
+
+            parent = node.inputs[0] if len(node.inputs) > 0 else None
+            if parent is None or outputs.get(parent[0]) is None:
+                raise BatchException('input is not connected or not evaluated')
+            df = outputs[parent[0]]
+
+            if node.op_code in DESTINATIONS:
+                outputs[node_id] = df
+                fingerprints[node_id] = fingerprints.get(parent[0])
+                continue
+
+            params = PARAMS[node.op_code](node.data)
+            upstream = fingerprints.get(parent[0])
+            if node.op_code in kernels.MODEL_KERNELS:
+                model = model_input(node, outputs)
+                error = kernels.validate_model(model, params, df)
+                kernel = partial(kernels.MODEL_KERNELS[node.op_code], model=model)
+                if error is None and cache is not None:
+                    upstream = joint_fingerprint(upstream, fingerprint_object(model))
+            else:
+                error = kernels.validate(params, df)
+                kernel = kernels.KERNELS[node.op_code]
+            if error is not None:
+                raise BatchException(error)
+
+            key = result_key(node.op_code, params, upstream) if cache is not None else None
+            result = cache.get(key) if cache is not None else None
+            if result is None:
+                result = kernel(df, params=params)
+                if cache is not None:
+                    cache.put(key, result)
+            outputs[node_id] = result
+            fingerprints[node_id] = key
+        except Exception as e:
+            _log_failure(node, e)
+    return nodes, outputs
+
+
+def result_names(nodes):
+    """ {node id: name} of the results to save: data destination nodes and regressions, or the leaf nodes without them """
+    selected = [n for n in nodes.values()
+                if n.op_code in DESTINATIONS or n.op_code == 'regression']
+    if not any(n.op_code in DESTINATIONS for n in selected):
+        parents = {parent[0] for n in nodes.values() for parent in n.inputs if parent is not None}
+        selected += [n for n in nodes.values()
+                     if n.id not in parents and n.op_code != 'regression' and n.op_code not in SKIPPED]
+
+    names = OrderedDict()
+    for node in selected:
+        name = node.title
+        if name in names.values():
+            name = f'{node.title} {node.id}'
+        names[node.id] = name
+    return names
+
+
+def collect_results(nodes, outputs):
+    """ {name: DataFrame} to save, see result_names, results written by the runner in chunks are left out """
+    results = OrderedDict()
+    for node_id, name in result_names(nodes).items():
+        value = outputs.get(node_id)
+        if value is None:
+            continue
+        if nodes[node_id].op_code == 'regression':
+            value = kernels.coefficient_table(value)
+        if not isinstance(value, pd.DataFrame):
+            continue
+        results[name] = value
+    return results
@@ -0,0 +1,318 @@
+"""
+Content-addressed cache of node results.
+
+A data source is fingerprinted by hashing its content once. Every node
+downstream derives its key from its op code, its kernel parameters and the
+fingerprint of its input, so a key identifies a result without looking at
+the data again. Going back to settings that were computed before (lag
+2 -> 3 -> 2, undo) finds the results of the whole chain in the cache.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+DEFAULT_BUDGET = 256 * 1024 * 1024
+DEFAULT_DISK_BUDGET = 2 * 1024 * 1024 * 1024
+
+
+def fingerprint_frame(df):
+    """ Hash of the frame content, None if it can't be hashed """
+    try:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+        h.update(repr(list(zip(df.columns, df.dtypes))).encode('utf-8'))
+        return h.hexdigest()
+    except Exception as e:
+        logging.debug(f'frame is not hashable: {e}')
+        return None
+
+
+def fingerprint_object(value):
+    """ Hash of a picklable result other than a frame, e.g. a fitted model, None if it can't be hashed """
+    try:
+        return hashlib.blake2b(pickle.dumps(value, protocol=4), digest_size=16).hexdigest()
+    except Exception as e:
+        logging.debug(f'object is not hashable: {e}')
+        return None
+
+
+def joint_fingerprint(*fingerprints):
+    """ Fingerprint of several inputs, None unless all of them are known """
+    if any(fingerprint is None for fingerprint in fingerprints):
+        return None
+    return '|'.join(fingerprints)
+
+
+def file_fingerprint(filename):
+    """ Identifies a file version by its path, size and modification time, the content is not read """
+    stat = os.stat(filename)
+    return f'{os.path.abspath(filename)}|{stat.st_size}|{stat.st_mtime_ns}'
+
+
+def result_key(op_code, params, upstream):
+    """ Key of a result computed by op_code with params from the input fingerprinted as upstream """
+    if upstream is None:
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{op_code}|{params!r}|{upstream}'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def estimate_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class DiskCache:
+    """ Results kept across sessions in a directory, bounded by the total file size
+
+    Frames are stored as Arrow IPC (feather) files when pyarrow is installed,
+    anything else is pickled. The least recently used files are removed first;
+    writing and eviction run on a background thread.
+    """
+    FRAME_EXT = '.arrow'
+    OBJECT_EXT = '.pkl'
+
+    def __init__(self, directory, max_bytes=DEFAULT_DISK_BUDGET):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    def __getstate__(self):
+        # jobs running in worker processes only read, the writer thread stays here
+        return {'directory': self.directory, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['directory'], state['max_bytes'])
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    def __contains__(self, key):
+        return any(os.path.exists(self._path(key, ext)) for ext in (self.FRAME_EXT, self.OBJECT_EXT))
+
+    def get(self, key):
+        if key is None:
+            return None
+        for ext in (self.FRAME_EXT, self.OBJECT_EXT):
+            path = self._path(key, ext)
+            if not os.path.exists(path):
+                continue
+            try:
+                if ext == self.FRAME_EXT:
+                    value = feather.read_feather(path) if feather is not None else None
+                else:
+                    with open(path, 'rb') as file:
+                        value = pickle.load(file)
+            except Exception as e:
+                logging.debug(f'dropping unreadable cache file {path}: {e}')
+                self._remove(path)
+                continue
+            if value is not None:
+                try:
+                    # access time for the LRU eviction
+                    os.utime(path)
+                except OSError:
+                    # evicted by another run sharing the directory, the value is read already
+                    pass
+                return value
+        return None
+
+    def put(self, key, value):
+        if key is None or value is None or key in self:
+            return
+        self._writer.submit(self._write, key, value)
+
+    def _write(self, key, value):
+        try:
+            if feather is not None and isinstance(value, pd.DataFrame):
+                try:
+                    self._atomic_write(self._path(key, self.FRAME_EXT),
+                                       lambda fname: feather.write_feather(value, fname))
+                    return
+                except Exception as e:
+                    # e.g. non-string column names, pickle keeps everything
+                    logging.debug(f'frame is not storable as arrow: {e}')
+
+            def dump(fname):
+                with open(fname, 'wb') as file:
+                    pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            self._atomic_write(self._path(key, self.OBJECT_EXT), dump)
+        except Exception as e:
+            logging.error(f'writing result cache failed: {e}')
+        finally:
+            self.evict()
+
+    def _atomic_write(self, path, write):
+        # a file of its own, runs sharing the directory may write the same key at once
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            self._remove(tmp)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith((self.FRAME_EXT, self.OBJECT_EXT)):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def flush(self):
+        """ Waits for the pending writes """
+        self._writer.submit(lambda: None).result()
+
+    def clear(self):
+        self.flush()
+        for name in os.listdir(self.directory):
+            if name.endswith((self.FRAME_EXT, self.OBJECT_EXT)):
+                self._remove(os.path.join(self.directory, name))
+
+
+class ResultCache:
+    """ LRU cache of results bounded by their estimated memory size
+
+    With a DiskCache attached, results also outlive the session: memory
+    misses are looked up on disk and computed results are written there.
+    Nodes check memory only with peek and read the disk in their job, see
+    load_or_run.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET, disk=None):
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def peek(self, key):
+        """ The result if it is in memory, the disk tier is not read """
+        if key is None:
+            return None
+        item = self._items.get(key)
+        if item is None:
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def get(self, key):
+        if key is None:
+            return None
+        item = self._items.get(key)
+        if item is None:
+            value = self.disk.get(key) if self.disk is not None else None
+            if value is None:
+                self.misses += 1
+                return None
+            self._store(key, value)
+            self.hits += 1
+            return value
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, value):
+        if key is None or value is None:
+            return
+        self._store(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def _store(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            logging.debug(f'result of {size} bytes exceeds the cache budget')
+            return
+
+        if key in self._items:
+            self.size -= self._items.pop(key)[1]
+        self._items[key] = (value, size)
+        self.size += size
+
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self._items.popitem(last=False)
+            self.size -= evicted_size
+
+    def clear(self):
+        self._items.clear()
+        self.size = 0
+
+    def enable_disk(self, directory, max_bytes=DEFAULT_DISK_BUDGET):
+        self.disk = DiskCache(directory, max_bytes)
+        logging.debug(f'result cache on disk: {directory}')
+
+    def disable_disk(self):
+        if self.disk is not None:
+            self.disk.flush()
+        self.disk = None
+
+
+def load_or_run(disk, key, operation, *args):
+    """ The result stored by the disk tier, computed by operation when there is none
+
+    Runs as the executor job, reading and decoding a large file stays off the GUI thread.
+    """
+    value = disk.get(key)
+    if value is not None:
+        logging.debug(f'result {key} found in the disk cache')
+        return value
+    return operation(*args)
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
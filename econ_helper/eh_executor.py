@@ -0,0 +1,227 @@
+import logging
+from concurrent.futures import BrokenExecutor
+from contextlib import contextmanager
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QCoreApplication, pyqtSignal
+
+from econ_helper import eh_parallel
+
+
+class EvalSignals(QObject):
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+
+
+class EvalJob(QRunnable):
+    def __init__(self, owner, fn, args, on_result=None, on_error=None):
+        super().__init__()
+        # the executor keeps the reference, Qt must not delete the runnable behind our back
+        self.setAutoDelete(False)
+
+        self.owner = owner
+        self.fn = fn
+        self.args = args
+        self.on_result = on_result
+        self.on_error = on_error
+        self.cancelled = False
+
+        self.signals = EvalSignals()
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(self, e)
+            return
+        self.signals.finished.emit(self, result)
+
+
+class ProcessJob:
+    """ Same contract as EvalJob, but the operation runs in a worker process """
+
+    def __init__(self, owner, fn, args, on_result=None, on_error=None):
+        self.owner = owner
+        self.fn = fn
+        self.args = args
+        self.on_result = on_result
+        self.on_error = on_error
+        self.cancelled = False
+
+        self.payload = None
+        self.future = None
+
+        self.signals = EvalSignals()
+
+    def start(self, process_pool):
+        self.payload = eh_parallel.pack((self.fn, self.args))
+        try:
+            self.future = process_pool.submit(eh_parallel.run_packed, self.payload)
+        except Exception:
+            eh_parallel.release(self.payload)
+            raise
+        self.future.add_done_callback(self._done)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def _done(self, future):
+        # called on the pool's management thread, signals are queued to the GUI thread
+        eh_parallel.release(self.payload)
+        if future.cancelled():
+            return
+        try:
+            packed = future.result()
+        except Exception as e:
+            self.signals.failed.emit(self, e)
+            return
+        try:
+            result = eh_parallel.unpack(packed)
+        except Exception as e:
+            self.signals.failed.emit(self, e)
+            return
+        finally:
+            eh_parallel.release(packed)
+        if not self.cancelled:
+            self.signals.finished.emit(self, result)
+
+
+class EvalExecutor(QObject):
+    """ Runs node operations on a thread pool and delivers results on the GUI thread.
+
+    Every owner (usually a node) has at most one live job. Submitting a new job
+    supersedes the previous one: it is taken off the queue if it did not start yet,
+    otherwise its result is dropped when it arrives.
+
+    Inside parallel() jobs go to a pool of worker processes instead of threads,
+    so independent branches of the graph use all cores during a full recompute.
+    """
+
+    def __init__(self, pool=None, parent=None):
+        super().__init__(parent)
+        self.pool = pool if pool is not None else QThreadPool.globalInstance()
+        self.synchronous = False
+        self.max_processes = eh_parallel.default_workers()
+        self.process_pool = None
+        self._parallel = False
+        self._jobs = {}
+
+    def isPending(self, owner):
+        return owner in self._jobs
+
+    def cancel(self, owner):
+        self._cancelJob(owner)
+        self._checkIdle()
+
+    def _cancelJob(self, owner):
+        job = self._jobs.pop(owner, None)
+        if job is not None:
+            if isinstance(job, ProcessJob):
+                job.cancel()
+            else:
+                job.cancelled = True
+                self.pool.tryTake(job)
+            logging.debug(f'cancelled evaluation of {owner.__class__.__name__}')
+
+    @contextmanager
+    def parallel(self):
+        """ Jobs submitted in the block, and the jobs their results trigger, run in worker processes
+
+        The mode lasts until the executor is idle again, so a whole recompute
+        started in the block fans out across the process pool.
+        """
+        self._parallel = self.max_processes > 1
+        try:
+            yield
+        finally:
+            self._checkIdle()
+
+    def submit(self, owner, fn, *args, on_result=None, on_error=None):
+        self._cancelJob(owner)
+
+        inline = self.synchronous or QCoreApplication.instance() is None
+        if self._parallel and not inline:
+            job = self._submitToProcess(owner, fn, args, on_result, on_error)
+            if job is not None:
+                return job
+
+        job = EvalJob(owner, fn, args, on_result, on_error)
+        # queued to the GUI thread when emitted from a worker
+        job.signals.finished.connect(self._deliverResult)
+        job.signals.failed.connect(self._deliverError)
+        self._jobs[owner] = job
+
+        if inline:
+            job.run()
+        else:
+            self.pool.start(job)
+        return job
+
+    def get_process_pool(self):
+        """ The pool of worker processes, for operations splitting their own work; None with one core """
+        if self.max_processes <= 1:
+            return None
+        if self.process_pool is None:
+            self.process_pool = eh_parallel.create_process_pool(self.max_processes)
+        return self.process_pool
+
+    def _submitToProcess(self, owner, fn, args, on_result, on_error):
+        if self.process_pool is None:
+            self.process_pool = eh_parallel.create_process_pool(self.max_processes)
+
+        job = ProcessJob(owner, fn, args, on_result, on_error)
+        job.signals.finished.connect(self._deliverResult)
+        job.signals.failed.connect(self._deliverError)
+        self._jobs[owner] = job
+        try:
+            job.start(self.process_pool)
+        except Exception as e:
+            # e.g. the operation does not pickle, the thread pool can still run it
+            logging.debug(f'running {owner.__class__.__name__} on a thread instead of a process: {e!r}')
+            del self._jobs[owner]
+            if isinstance(e, BrokenExecutor):
+                self.process_pool = None
+            return None
+        return job
+
+    def shutdown(self):
+        for owner in list(self._jobs):
+            self.cancel(owner)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
+
+    def _checkIdle(self):
+        if not self._jobs:
+            self._parallel = False
+
+    def _takeJob(self, job):
+        if self._jobs.get(job.owner) is not job:
+            # superseded by a newer submit, result is stale
+            return False
+        del self._jobs[job.owner]
+        return True
+
+    def _deliverResult(self, job, result):
+        if self._takeJob(job) and job.on_result is not None:
+            job.on_result(result)
+        # after the callback, it may have submitted the downstream nodes
+        self._checkIdle()
+
+    def _deliverError(self, job, e):
+        if self._takeJob(job) and job.on_error is not None:
+            job.on_error(e)
+        self._checkIdle()
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = EvalExecutor()
+    return _executor
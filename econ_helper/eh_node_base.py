@@ -1,6 +1,10 @@
 import logging
+import traceback
+from functools import partial
 from typing import Tuple
 
+import pandas as pd
+
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
@@ -9,6 +13,8 @@ from nodeeditor.node_content_widget import QDMNodeContentWidget
 from nodeeditor.node_graphics_node import QDMGraphicsNode
 from nodeeditor.node_socket import LEFT_CENTER, RIGHT_CENTER
 from nodeeditor.utils import dumpException
+from econ_helper.eh_cache import get_cache, fingerprint_frame, fingerprint_object, load_or_run, result_key
+from econ_helper.eh_executor import get_executor
 
 
 class EcoGraphicsNode(QDMGraphicsNode):
@@ -43,6 +49,20 @@ class EcoGraphicsNode(QDMGraphicsNode):
         )
 
 
+class OutputWidgetWatcher(QObject):
+    """ Lets the node know when its output widget is shown, see EcoNode.refresh_output_widget """
+
+    def __init__(self, node):
+        super().__init__(node.node_output_widget)
+        self.node = node
+        node.node_output_widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Show:
+            self.node.on_output_widget_shown()
+        return False
+
+
 class EcoContent(QDMNodeContentWidget):
     def initUI(self):
         lbl = QLabel(self.node.content_label, self)
@@ -67,11 +87,18 @@ class EcoNode(Node):
         self.node_settings_widget = None
         self.node_output_widget = None
         self.output_value = None
+        self.output_fingerprint = None
+        self._fingerprinted_value = None
+        # {(column name, dtype): width} of the output table, see adjust_column_widths
+        self.column_widths = {}
+        self.output_widget_stale = False
 
         super().__init__(scene, self.__class__.op_title, inputs, outputs)
 
         self.node_settings_widget = self.create_settings_widget()
         self.node_output_widget = self.create_output_widget()
+        if self.node_output_widget is not None:
+            self.output_widget_watcher = OutputWidgetWatcher(self)
 
         # it's really important to mark all nodes Dirty by default
         self.markDirty()
@@ -100,6 +127,27 @@ class EcoNode(Node):
         w.setLayout(lo)
         return w
 
+    def update_output_widget(self):
+        """ Shows the current output in the output widget """
+        pass
+
+    def refresh_output_widget(self):
+        """ Updates the output widget if it is on screen, otherwise when it is shown
+
+        Only the selected node's output widget is shown, so evaluating a graph
+        doesn't rebuild a table or a plot for every node.
+        """
+        if self.node_output_widget is not None and self.node_output_widget.isVisible():
+            self.output_widget_stale = False
+            self.update_output_widget()
+        else:
+            self.output_widget_stale = True
+
+    def on_output_widget_shown(self):
+        if self.output_widget_stale:
+            self.output_widget_stale = False
+            self.update_output_widget()
+
     def initInnerClasses(self):
         self.content = EcoContent(self)
         self.grNode = EcoGraphicsNode(self)
@@ -114,6 +162,78 @@ class EcoNode(Node):
     def evalImplementation(self):
         raise NotImplementedError
 
+    def get_output_fingerprint(self):
+        """ Identifies the content of output_value, see eh_cache """
+        if self.output_value is None:
+            return None
+        if self._fingerprinted_value is not self.output_value:
+            # the output was set without a derived key, e.g. by a data source
+            self.output_fingerprint = fingerprint_frame(self.output_value) \
+                if isinstance(self.output_value, pd.DataFrame) else fingerprint_object(self.output_value)
+            self._fingerprinted_value = self.output_value
+        return self.output_fingerprint
+
+    def get_input_fingerprint(self, idx=0):
+        other_socket = self.getInputSocket(idx)
+        if other_socket is None or not hasattr(other_socket.node, 'get_output_fingerprint'):
+            return None
+        return other_socket.node.get_output_fingerprint()
+
+    def operation_key(self, operation, idx=0):
+        """ Cache key of a kernel bound by prepare_operation, applied to input idx """
+        params = getattr(operation, 'keywords', {}).get('params')
+        if params is None:
+            return None
+        return result_key(self.op_code, params, self.get_input_fingerprint(idx))
+
+    def submit_operation(self, operation, *args, cache_key=None):
+        cache = get_cache()
+        cached = cache.peek(cache_key)
+        if cached is not None:
+            logging.debug(f'{self.__class__.__name__} result found in cache')
+            # a run still computing older settings is superseded
+            get_executor().cancel(self)
+            self.on_keyed_result(cache_key, cached)
+            return
+
+        if cache_key is not None and cache.disk is not None:
+            # the disk tier is read by the job, not here
+            operation = partial(load_or_run, cache.disk, cache_key, operation)
+
+        # runs off the GUI thread, the result comes back through on_operation_result
+        get_executor().submit(self, operation, *args,
+                              on_result=partial(self.on_keyed_result, cache_key),
+                              on_error=self.on_operation_error)
+
+    def on_keyed_result(self, cache_key, result):
+        get_cache().put(cache_key, result)
+
+        # children evaluated from on_operation_result derive their keys from this one
+        previous = self.output_fingerprint, self._fingerprinted_value
+        if cache_key is not None:
+            self.output_fingerprint, self._fingerprinted_value = cache_key, result
+        self.on_operation_result(result)
+        if self.output_value is not result:
+            # the node kept its previous output
+            self.output_fingerprint, self._fingerprinted_value = previous
+
+    def on_operation_result(self, result):
+        raise NotImplementedError
+
+    def on_operation_error(self, e):
+        logging.error(e)
+        traceback.print_tb(e.__traceback__)
+        self.output_value = None
+        self.markInvalid(error_message='Internal node error. See log for details')
+        self.scene.controller.scene_changed()
+
+    def isPending(self):
+        return get_executor().isPending(self)
+
+    def remove(self):
+        get_executor().cancel(self)
+        super().remove()
+
     def get_guarded_input(self, idx):
         other_socket = self.getInputSocket(idx)
 
@@ -208,9 +328,10 @@ class EcoNode(Node):
 
     def onInputChanged(self, new_edge):
         #logging.debug("%s::__onInputChanged" % self.__class__.__name__)
-        self.markInvalid()
-        self.markDirty()
-        self.markDescendantsDirty()
+        with self.scene.controller.deferred():
+            self.markInvalid()
+            self.markDirty()
+            self.markDescendantsDirty()
 
     def serialize(self):
         res = super().serialize()
@@ -219,6 +340,23 @@ class EcoNode(Node):
         # logging.debug(f"Serialized EcoNode {self.__class__.__name__}, result {res}" )
         return res
 
+    def update_ui(self):
+        """ Brings the settings widgets in line with the node settings """
+        pass
+
+    def restoreState(self, data, hashmap={}):
+        res = super().restoreState(data, hashmap)
+        # the widgets still show the settings the node had before, and column
+        # lists built from the previous input would drop restored columns it
+        # lacks; until the node is evaluated again they show the restored settings only
+        self.forget_inputs()
+        self.update_ui()
+        return res
+
+    def forget_inputs(self):
+        """ Drops the values read from the inputs, read_params falls back to the stored settings """
+        self.input_value = None
+
     def deserialize(self, data, hashmap={}, restore_id=True):
         res = super().deserialize(data, hashmap, restore_id)
         # logging.debug(f"Deserialized EcoNode {self.__class__.__name__}, result {res}")
@@ -0,0 +1,103 @@
+"""
+Process pool transport for node operations.
+
+Job arguments and results are pickled with protocol 5. The large buffers
+(DataFrame blocks, numpy arrays) are taken out of band and placed in a
+shared memory segment, so only the small pickle stream goes through the
+pool pipe. This module must stay free of Qt imports: it is what the worker
+processes import.
+"""
+import logging
+import multiprocessing
+import os
+import pickle
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+SharedPayload = namedtuple('SharedPayload', ['data', 'shm_name', 'spans'])
+
+_ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def pack(obj):
+    """ Pickles obj, moving its contiguous buffers to a new shared memory segment """
+    raws = []
+
+    def out_of_band(buffer):
+        try:
+            raws.append(buffer.raw())
+        except BufferError:
+            # not contiguous, keep it in the pickle stream
+            return True
+        return False
+
+    data = pickle.dumps(obj, protocol=5, buffer_callback=out_of_band)
+    if not raws:
+        return SharedPayload(data, None, ())
+
+    spans = []
+    size = 0
+    for raw in raws:
+        start = _align(size)
+        spans.append((start, raw.nbytes))
+        size = start + raw.nbytes
+
+    shm = SharedMemory(create=True, size=max(size, 1))
+    try:
+        for (start, length), raw in zip(spans, raws):
+            shm.buf[start:start + length] = raw
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return SharedPayload(data, shm.name, tuple(spans))
+
+
+def unpack(payload):
+    """ Restores an object packed by pack(), the segment is left in place """
+    if payload.shm_name is None:
+        return pickle.loads(payload.data)
+
+    shm = SharedMemory(name=payload.shm_name)
+    try:
+        # one copy per buffer, so no array outlives the mapping
+        buffers = [bytearray(shm.buf[start:start + length]) for start, length in payload.spans]
+    finally:
+        shm.close()
+    return pickle.loads(payload.data, buffers=buffers)
+
+
+def release(payload):
+    """ Frees the shared memory segment behind a payload """
+    if payload is None or payload.shm_name is None:
+        return
+    try:
+        shm = SharedMemory(name=payload.shm_name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def run_packed(payload):
+    """ Worker entry point: payload holds (fn, args), the packed result is returned """
+    fn, args = unpack(payload)
+    return pack(fn(*args))
+
+
+def default_workers():
+    return max(os.cpu_count() or 1, 1)
+
+
+def create_process_pool(max_workers=None):
+    # spawn rather than fork, forking a process that runs Qt threads is not safe
+    context = multiprocessing.get_context('spawn')
+    max_workers = max_workers or default_workers()
+    logging.debug(f'starting process pool with {max_workers} workers')
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
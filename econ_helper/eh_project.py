@@ -0,0 +1,160 @@
+"""
+Project files: a zip container with the graph and its datasets.
+
+graph.json holds the serialized scene. Data source nodes reference their
+frames by content hash (see Node.serializeState), every frame is stored once
+under datasets/ as Parquet, or as table JSON when Arrow can't represent it.
+Frames are read when a node asks for them, not when the project is opened.
+
+Projects written by earlier versions may hold pickled frames. Unpickling runs
+code from the file, so they are read only when the caller allows it.
+
+Graphs saved as plain JSON, with the frames embedded, are still read.
+"""
+import io
+import json
+import logging
+import os
+import pickle
+import zipfile
+
+import pandas as pd
+
+PROJECT_EXT = '.ehp'
+GRAPH_ENTRY = 'graph.json'
+DATASETS_DIR = 'datasets/'
+PARQUET_EXT = '.parquet'
+JSON_EXT = '.json'
+PICKLE_EXT = '.pkl'
+
+
+class ProjectException(Exception): pass
+
+
+def is_project_file(filename):
+    return zipfile.is_zipfile(filename)
+
+
+def is_legacy_filename(filename):
+    """ Graphs are saved as plain JSON only when asked for by the extension """
+    return os.path.splitext(filename)[1].lower() == '.json'
+
+
+def dataset_refs(data):
+    """ Every dataset key the serialized scene refers to """
+    keys = []
+    for node_data in data['nodes']:
+        for key in node_data.get('dataset_refs', {}).values():
+            if key not in keys:
+                keys.append(key)
+    return keys
+
+
+def _encode(df):
+    try:
+        buffer = io.BytesIO()
+        df.to_parquet(buffer)
+        return PARQUET_EXT, buffer.getvalue()
+    except Exception as e:
+        # e.g. mixed type columns read from Excel, or no parquet engine
+        logging.debug(f'frame is not storable as parquet: {e}')
+        # the format of legacy graphs, values of mixed columns keep their types
+        return JSON_EXT, df.to_json(orient='table').encode('utf-8')
+
+
+def write_project(filename, data, datasets, source=None):
+    """ Writes the scene data and {key: DataFrame} to filename
+
+    A None frame is copied unchanged from the source project, so datasets that
+    were never loaded are not decoded just to be encoded again. Pickled frames
+    the source is allowed to read are stored in the current formats instead.
+    """
+    tmp = filename + '.tmp'
+    try:
+        with zipfile.ZipFile(tmp, 'w') as archive:
+            # parquet is compressed already
+            archive.writestr(GRAPH_ENTRY, json.dumps(data, indent=4), compress_type=zipfile.ZIP_DEFLATED)
+            for key, df in datasets.items():
+                if df is None and source is not None and key in source:
+                    if source.is_pickled(key) and source.allow_pickle:
+                        df = source.get(key)
+                if df is None and source is not None and key in source:
+                    name, raw = source.read_raw(key)
+                elif df is not None:
+                    ext, raw = _encode(df)
+                    name = DATASETS_DIR + key + ext
+                else:
+                    raise ProjectException(f'dataset {key} is not available')
+                archive.writestr(name, raw)
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class ProjectDatasets:
+    """ Datasets of a project file, read on demand
+
+    The archive is opened for every read rather than kept open, so the file
+    can be replaced while the scene still refers to it. Pickled frames are
+    left out unless allow_pickle is set.
+    """
+    def __init__(self, filename, allow_pickle=False):
+        self.filename = filename
+        self.allow_pickle = allow_pickle
+        self._names = {}
+        with zipfile.ZipFile(filename) as archive:
+            for name in archive.namelist():
+                if name.startswith(DATASETS_DIR):
+                    key = os.path.splitext(name[len(DATASETS_DIR):])[0]
+                    self._names[key] = name
+
+    def __contains__(self, key):
+        return key in self._names
+
+    def keys(self):
+        return self._names.keys()
+
+    def is_pickled(self, key):
+        return self._names[key].endswith(PICKLE_EXT)
+
+    def has_pickled(self):
+        return any(self.is_pickled(key) for key in self._names)
+
+    def read_raw(self, key):
+        name = self._names[key]
+        with zipfile.ZipFile(self.filename) as archive:
+            return name, archive.read(name)
+
+    def get(self, key):
+        if key not in self._names:
+            return None
+        name, raw = self.read_raw(key)
+        logging.debug(f'reading dataset {name} from {self.filename}')
+        if name.endswith(PARQUET_EXT):
+            return pd.read_parquet(io.BytesIO(raw))
+        if name.endswith(JSON_EXT):
+            return pd.read_json(io.StringIO(raw.decode('utf-8')), orient='table')
+        if not self.allow_pickle:
+            logging.error(f'dataset {name} of {self.filename} is pickled and is not read, '
+                          f'allow pickled datasets for trusted files only')
+            return None
+        return pickle.loads(raw)
+
+
+def read_project(filename, allow_pickle=False):
+    """ Returns the serialized scene and the datasets it refers to """
+    try:
+        with zipfile.ZipFile(filename) as archive:
+            data = json.loads(archive.read(GRAPH_ENTRY).decode('utf-8'))
+        return data, ProjectDatasets(filename, allow_pickle)
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise ProjectException(f'{os.path.basename(filename)} is not a valid project file: {e}')
+
+
+def read_graph(filename, allow_pickle=False):
+    """ Reads a project or a legacy JSON graph, the datasets are None for the latter """
+    if is_project_file(filename):
+        return read_project(filename, allow_pickle)
+    with open(filename, 'r') as file:
+        return json.loads(file.read()), None
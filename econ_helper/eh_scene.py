@@ -0,0 +1,54 @@
+import logging
+
+from econ_helper import eh_project
+from nodeeditor.node_scene import Scene, InvalidFile
+
+
+class EcoScene(Scene):
+    """ Scene saved as a project file, see eh_project
+
+    Files named *.json are written in the legacy format, with the datasets
+    embedded in the graph, and both formats are loaded.
+    """
+    # pickled datasets of projects saved by earlier versions are read when set, see eh_project
+    allow_pickle = False
+
+    def saveToFile(self, filename):
+        for node in self.nodes:
+            # data not loaded yet, e.g. sheets of a workbook nobody looked at, goes into the file too
+            if hasattr(node, 'gather_data'):
+                node.gather_data()
+
+        if eh_project.is_legacy_filename(filename):
+            return super().saveToFile(filename)
+
+        data = self.serializeState()
+        keys = eh_project.dataset_refs(data)
+
+        source = self.datasets.source
+        if source is not None:
+            # the new file becomes the source, keep what only the undo history refers to
+            for key in source.keys():
+                if key not in keys:
+                    self.datasets.get(key)
+
+        datasets = {key: self.datasets.peek(key) for key in keys}
+        eh_project.write_project(filename, data, datasets, source)
+        logging.debug(f"saving to {filename} was successful.")
+
+        self.datasets.source = eh_project.ProjectDatasets(filename, self.allow_pickle)
+        self.has_been_modified = False
+
+    def loadFromFile(self, filename):
+        if not eh_project.is_project_file(filename):
+            self.datasets.source = None
+            return super().loadFromFile(filename)
+
+        try:
+            data, datasets = eh_project.read_project(filename, self.allow_pickle)
+        except eh_project.ProjectException as e:
+            raise InvalidFile(str(e))
+
+        self.datasets.source = datasets
+        self.deserialize(data)
+        self.has_been_modified = False
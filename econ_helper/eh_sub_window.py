@@ -1,11 +1,18 @@
+import os
+
+from econ_helper import eh_project
 from econ_helper.eh_conf import *
 from econ_helper.eh_node_base import *
+from econ_helper.eh_executor import get_executor
+from econ_helper.eh_scene import EcoScene
 from nodeeditor.node_edge import EDGE_TYPE_DIRECT, EDGE_TYPE_BEZIER
 from nodeeditor.node_editor_widget import NodeEditorWidget
 from nodeeditor.utils import dumpException
 
 
 class EcoHelperSubWindow(NodeEditorWidget):
+    scene_class = EcoScene
+
     def __init__(self):
         super().__init__()
         self.setAttribute(Qt.WA_DeleteOnClose)
@@ -27,15 +34,36 @@ class EcoHelperSubWindow(NodeEditorWidget):
         return get_class_from_opcode(data['op_code'], data['type_code'])
 
     def fileLoad(self, filename):
-        if super().fileLoad(filename):
-            # eval all output nodes
-            for node in self.scene.nodes:
-                if len(node.getChildrenNodes()) == 0:
-                    node.eval()
-            return True
+        self.scene.allow_pickle = self.confirm_pickled_datasets(filename)
+
+        # loading recomputes the whole graph, independent branches
+        # are computed in parallel worker processes
+        with get_executor().parallel():
+            if super().fileLoad(filename):
+                # eval whatever is still dirty, in topological order
+                self.scene.controller.scene_changed()
+                return True
 
         return False
 
+    def confirm_pickled_datasets(self, filename):
+        """ Asks whether the pickled datasets of a project saved by an earlier version are read """
+        try:
+            if not eh_project.is_project_file(filename) or \
+                    not eh_project.ProjectDatasets(filename).has_pickled():
+                return False
+        except Exception as e:
+            # an invalid file is reported by the loading
+            dumpException(e)
+            return False
+
+        res = QMessageBox.question(self, "Pickled datasets",
+                                   f"{os.path.basename(filename)} was saved by an earlier version and holds "
+                                   f"pickled datasets. Reading them can run code from the file.\n\n"
+                                   f"Read them only if you trust the file. Read the pickled datasets?",
+                                   QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        return res == QMessageBox.Yes
+
     def initNewNodeActions(self):
         self.node_actions = {}
         keys = list(ECO_NODES.keys())
@@ -9,6 +9,8 @@ from nodeeditor.utils import dumpException, pp
 from nodeeditor.utils import loadStylesheets
 from .eh_conf import *
 from .eh_drag_listbox import QDMDragListbox
+from .eh_cache import get_cache, DEFAULT_DISK_BUDGET
+from .eh_executor import get_executor
 from .eh_node_base import EcoGraphicsNode
 from .eh_sub_window import EcoHelperSubWindow
 from .status_widget import *
@@ -69,8 +71,32 @@ class EcoHelperWindow(NodeEditorWindow):
             event.ignore()
         else:
             self.writeSettings()
+            get_executor().shutdown()
+            # pending result files are written before exit
+            get_cache().disable_disk()
             event.accept()
 
+    def readSettings(self):
+        super().readSettings()
+        settings = QSettings(self.name_company, self.name_product)
+        if settings.value('cache/disk_enabled', True, type=bool):
+            default_dir = os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), 'results')
+            directory = settings.value('cache/disk_dir', default_dir)
+            max_mb = settings.value('cache/disk_max_mb', DEFAULT_DISK_BUDGET // (1024 * 1024), type=int)
+            try:
+                get_cache().enable_disk(directory, max_mb * 1024 * 1024)
+            except OSError as e:
+                logging.error(f'result cache directory is not available: {e}')
+
+    def writeSettings(self):
+        super().writeSettings()
+        settings = QSettings(self.name_company, self.name_product)
+        disk = get_cache().disk
+        settings.setValue('cache/disk_enabled', disk is not None)
+        if disk is not None:
+            settings.setValue('cache/disk_dir', disk.directory)
+            settings.setValue('cache/disk_max_mb', disk.max_bytes // (1024 * 1024))
+
     def createActions(self):
         super().createActions()
 
@@ -100,6 +126,9 @@ class EcoHelperWindow(NodeEditorWindow):
             return activeSubWindow.widget()
         return None
 
+    def getFileDialogFilter(self):
+        return 'Graph (*.ehp *.json);;All files (*)'
+
     def onFileNew(self):
         try:
             subwnd = self.createMdiChild()
@@ -109,7 +138,7 @@ class EcoHelperWindow(NodeEditorWindow):
             dumpException(e)
 
     def onFileOpen(self):
-        fnames, filter = QFileDialog.getOpenFileNames(self, 'Open graph from file')
+        fnames, filter = QFileDialog.getOpenFileNames(self, 'Open graph from file', filter=self.getFileDialogFilter())
 
         try:
             for fname in fnames:
@@ -0,0 +1,1255 @@
+"""
+Pure compute kernels behind the nodes.
+
+Every kernel takes the input dataframe and an immutable parameter object and
+returns a new value; nothing here touches Qt. Nodes only translate their
+widgets into parameters, so the same kernels run on worker threads, in worker
+processes and in the headless runner, and can be benchmarked on their own.
+"""
+import heapq
+import math
+from collections import namedtuple
+from functools import lru_cache, partial
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import LinAlgError, cho_factor, cho_solve, solve_triangular
+from scipy.optimize import nnls
+from scipy.signal import lfilter
+from statsmodels.tsa.filters.filtertools import recursive_filter
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+UNARY_OPS = ['log', 'negate']
+CV_SCHEMES = ['expanding', 'rolling']
+DECOMPOSE_BASES = ['zero', 'mean']
+# least squares, ridge (alpha * |coef|^2 added), non-negative coefficients
+REGRESSION_METHODS = ['ols', 'ridge', 'nnls']
+BINARY_OPS = ['sum', 'diff', 'mult', 'div']
+SEARCH_STRATEGIES = ['forward', 'backward', 'best_subset']
+SEARCH_CRITERIA = ['aic', 'bic', 'adj_r2']
+# specifications a best subset search may go through
+MAX_SUBSETS = 10 * 1000 * 1000
+# below this many specifications a best subset search doesn't go to a process pool
+PARALLEL_SUBSETS = 200 * 1000
+# transformed values a transform search may hold, rows x channels x decays x lag sizes
+MAX_TRANSFORM_VALUES = 50 * 1000 * 1000
+
+# rows per chunk when a CSV is read without pyarrow
+CSV_CHUNKSIZE = 256 * 1024
+
+LagParams = namedtuple('LagParams', ['column', 'lag_size', 'replace'], defaults=[1, False])
+LagGridParams = namedtuple('LagGridParams', ['columns', 'lag_sizes'])
+AdstockParams = namedtuple('AdstockParams', ['column', 'adstock_size', 'replace'], defaults=[0, False])
+# decays are rates in % like adstock_size, or half-lives in rows when half_life is set;
+# saturation > 0 is the half-saturation point of a Hill curve applied to the adstock
+AdstockGridParams = namedtuple('AdstockGridParams', ['columns', 'decays', 'half_life', 'saturation', 'shape'],
+                               defaults=[False, 0, 1])
+TrendParams = namedtuple('TrendParams', ['column', 'replace'], defaults=[False])
+# degree of the polynomial in time, knots are the rows where the slope may change
+TrendPanelParams = namedtuple('TrendPanelParams', ['columns', 'degree', 'knots', 'detrend'],
+                              defaults=[1, (), False])
+UnaryParams = namedtuple('UnaryParams', ['column', 'op', 'replace'], defaults=[False])
+BinaryParams = namedtuple('BinaryParams', ['column_first', 'column_second', 'op'])
+FilterParams = namedtuple('FilterParams', ['column'])
+RegressionParams = namedtuple('RegressionParams', ['target_column', 'factors', 'method', 'alpha'],
+                              defaults=['ols', 1.0])
+ModelSearchParams = namedtuple('ModelSearchParams', ['target_column', 'candidates', 'strategy', 'criterion',
+                                                     'max_factors', 'top'],
+                               defaults=['forward', 'aic', 5, 20])
+# channels get one adstock decay (in %) and one lag size each, controls are always in the model
+TransformSearchParams = namedtuple('TransformSearchParams', ['target_column', 'channels', 'decays', 'lag_sizes',
+                                                             'controls', 'criterion', 'max_rounds'],
+                                   defaults=[(0,), (0,), (), 'aic', 5])
+# folds train on initial rows (all rows before the test with 'expanding') and test on the next horizon rows
+CrossValidationParams = namedtuple('CrossValidationParams', ['target_column', 'factors', 'method', 'alpha', 'scheme',
+                                                             'initial', 'horizon', 'step'],
+                                   defaults=['ols', 1.0, 'expanding', 52, 13, 13])
+BootstrapParams = namedtuple('BootstrapParams', ['target_column', 'factors', 'method', 'alpha', 'block_size',
+                                                 'replicates', 'confidence', 'seed'],
+                             defaults=['ols', 1.0, 8, 1000, 0.95, 0])
+# applied with a fitted LinearModel, see MODEL_KERNELS
+PredictParams = namedtuple('PredictParams', ['residuals'], defaults=[True])
+DecomposeParams = namedtuple('DecomposeParams', ['baseline'], defaults=['zero'])
+# changes are in percent of the factors
+ScenarioParams = namedtuple('ScenarioParams', ['factors', 'changes'])
+PlotParams = namedtuple('PlotParams', ['columns'])
+ReadParams = namedtuple('ReadParams', ['filename', 'columns', 'memory_map'], defaults=[None, False])
+
+# cross products of the centered target and candidate regressors, see regression_gram. gaps are
+# the columns missing values where the target is known, they decide which rows the gram covers
+Gram = namedtuple('Gram', ['target', 'columns', 'rows', 'y_mean', 'means', 'xx', 'xy', 'yy', 'gaps'],
+                  defaults=[()])
+# std errors are NaN unless method is 'ols'
+LinearModel = namedtuple('LinearModel', ['target', 'factors', 'method', 'intercept', 'coef',
+                                         'intercept_std_err', 'std_err', 'r2', 'rows'])
+RegressionResult = namedtuple('RegressionResult', ['model', 'data', 'y', 'pred', 'gram'], defaults=[None])
+Workbook = namedtuple('Workbook', ['filename', 'sheet_names', 'sheet', 'frame'])
+
+# parameters naming a single column of the input
+_COLUMN_FIELDS = {
+    LagParams: ['column'],
+    AdstockParams: ['column'],
+    TrendParams: ['column'],
+    UnaryParams: ['column'],
+    BinaryParams: ['column_first', 'column_second'],
+    FilterParams: ['column'],
+    RegressionParams: ['target_column'],
+    ModelSearchParams: ['target_column'],
+    TransformSearchParams: ['target_column'],
+    CrossValidationParams: ['target_column'],
+    BootstrapParams: ['target_column'],
+}
+
+# parameters naming a list of columns, at least one must be in the input
+_COLUMN_LIST_FIELDS = {
+    LagGridParams: 'columns',
+    AdstockGridParams: 'columns',
+    TrendPanelParams: 'columns',
+    ModelSearchParams: 'candidates',
+    TransformSearchParams: 'channels',
+    CrossValidationParams: 'factors',
+    BootstrapParams: 'factors',
+    RegressionParams: 'factors',
+    ScenarioParams: 'factors',
+    PlotParams: 'columns',
+}
+
+
+def validate(params, df):
+    """ Returns the reason why params can't be applied to df, None if they can """
+    if params is None:
+        return 'Check node configuration'
+    if df is None or not isinstance(df, pd.DataFrame):
+        return 'Input is not valid'
+
+    for field in _COLUMN_FIELDS.get(type(params), []):
+        column = getattr(params, field)
+        if column is None or column == '' or column not in df.columns:
+            return f'Column "{column}" is not in the input'
+
+    field = _COLUMN_LIST_FIELDS.get(type(params))
+    if field is not None:
+        columns = getattr(params, field)
+        if not columns or set(columns).isdisjoint(df.columns):
+            return 'Select columns'
+
+    if isinstance(params, LagGridParams):
+        if not params.lag_sizes or min(params.lag_sizes) < 1:
+            return 'Select lag sizes'
+        return _clashing_column(df, lag_grid_columns(df, params))
+    if isinstance(params, AdstockGridParams):
+        if not params.decays:
+            return 'Select decays'
+        if params.half_life and min(params.decays) <= 0:
+            return 'Half-life must be positive'
+        if not params.half_life and (min(params.decays) < 0 or max(params.decays) > 100):
+            return 'Decay rates must be within 0-100'
+        if params.saturation < 0 or params.shape <= 0:
+            return 'Check saturation settings'
+        return _clashing_column(df, adstock_grid_columns(df, params))
+    if isinstance(params, TrendPanelParams):
+        if params.degree < 1:
+            return 'Trend degree must be positive'
+        if any(knot <= 0 or knot >= df.shape[0] - 1 for knot in params.knots):
+            return f'Knots must be within rows 1-{df.shape[0] - 2}'
+        return _clashing_column(df, trend_panel_columns(df, params))
+    if isinstance(params, (RegressionParams, CrossValidationParams, BootstrapParams)):
+        if params.method not in REGRESSION_METHODS:
+            return f'Unknown method "{params.method}"'
+        if params.alpha < 0:
+            return 'Ridge alpha must not be negative'
+    if isinstance(params, ModelSearchParams):
+        if params.strategy not in SEARCH_STRATEGIES:
+            return f'Unknown strategy "{params.strategy}"'
+        if params.criterion not in SEARCH_CRITERIA:
+            return f'Unknown criterion "{params.criterion}"'
+        if params.max_factors < 1 or params.top < 1:
+            return 'Check search limits'
+        if params.strategy == 'best_subset' \
+                and subset_count(len(search_candidates(df, params)), params.max_factors) > MAX_SUBSETS:
+            return 'Too many subsets, lower the number of factors'
+    if isinstance(params, TransformSearchParams):
+        if not params.decays or min(params.decays) < 0 or max(params.decays) > 100:
+            return 'Decay rates must be within 0-100'
+        if not params.lag_sizes or min(params.lag_sizes) < 0:
+            return 'Lag sizes must not be negative'
+        if params.criterion not in SEARCH_CRITERIA:
+            return f'Unknown criterion "{params.criterion}"'
+        if params.max_rounds < 1:
+            return 'Check search limits'
+        channels, _ = search_channels(df, params)
+        if df.shape[0] * len(channels) * len(params.decays) * len(params.lag_sizes) > MAX_TRANSFORM_VALUES:
+            return 'Too many transformed columns, shorten the grid'
+    if isinstance(params, CrossValidationParams):
+        if params.scheme not in CV_SCHEMES:
+            return f'Unknown scheme "{params.scheme}"'
+        if params.horizon < 1 or params.step < 1:
+            return 'Check fold sizes'
+        if params.initial < len(params.factors) + 2:
+            return 'Training window is shorter than the number of regressors'
+        if params.initial + params.horizon > df.shape[0]:
+            return 'Not enough rows for one fold'
+    if isinstance(params, DecomposeParams) and params.baseline not in DECOMPOSE_BASES:
+        return f'Unknown baseline "{params.baseline}"'
+    if isinstance(params, ScenarioParams) and not params.changes:
+        return 'Select changes'
+    if isinstance(params, BootstrapParams):
+        if params.block_size < 1 or params.replicates < 2 or not 0 < params.confidence < 1:
+            return 'Check bootstrap settings'
+    if isinstance(params, UnaryParams) and params.op not in UNARY_OPS:
+        return f'Unknown operation "{params.op}"'
+    if isinstance(params, BinaryParams) and params.op not in BINARY_OPS:
+        return f'Unknown operation "{params.op}"'
+    return None
+
+
+def _clashing_column(df, new_columns):
+    existing = set(df.columns).intersection(new_columns)
+    if len(existing) > 0:
+        return f'Column "{sorted(existing)[0]}" is in the input already'
+    return None
+
+
+def param_columns(params):
+    """ Input columns params refer to, None when one of them is not selected yet """
+    columns = []
+    for field in _COLUMN_FIELDS.get(type(params), []):
+        column = getattr(params, field)
+        if column is None or column == '':
+            return None
+        columns.append(column)
+
+    field = _COLUMN_LIST_FIELDS.get(type(params))
+    if field is not None:
+        columns.extend(getattr(params, field) or [])
+    return columns
+
+
+def _insert_column(df, new_column, new_value, replace_column=None):
+    """ df with new_column in front, the columns of df are shared, not copied
+
+    Kernels never modify their input in place, so a chain of nodes holds every
+    input column once and each node adds only the columns it computes.
+    """
+    dfc = df.copy(deep=False)
+    dfc.insert(0, new_column, new_value)
+    if replace_column is not None:
+        # drop() would copy the block holding the column, slices of it are views
+        loc = dfc.columns.get_loc(replace_column)
+        if isinstance(loc, int):
+            dfc = pd.concat([dfc.iloc[:, :loc], dfc.iloc[:, loc + 1:]], axis=1)
+        else:
+            dfc = dfc.drop(columns=[replace_column])
+    return dfc
+
+
+def lag(df, params):
+    new_column = params.column + ' lag' + f' {params.lag_size}'
+    new_value = df[params.column].shift(params.lag_size).fillna(0)
+    return _insert_column(df, new_column, new_value, params.column if params.replace else None)
+
+
+def lag_chunk(df, params, state=None):
+    """ lag of one chunk, state holds the last lag_size values of the preceding chunks """
+    new_column = params.column + ' lag' + f' {params.lag_size}'
+    column = df[params.column]
+    if state is not None:
+        column = pd.concat([state, column])
+    new_value = column.shift(params.lag_size).fillna(0).iloc[len(column) - len(df):]
+    new_value.index = df.index
+    result = _insert_column(df, new_column, new_value, params.column if params.replace else None)
+    return result, column.iloc[-params.lag_size:]
+
+
+def lag_grid_columns(df, params):
+    """ Names of the columns lag_grid makes, every lag of a column follows the other """
+    columns = [c for c in params.columns if c in df.columns]
+    return [f'{column} lag {lag_size}' for column in columns for lag_size in params.lag_sizes]
+
+
+def _lag_block(values, lag_sizes, history=None):
+    """ values (rows x columns) lagged by every size into one array, missing values are 0
+
+    Column j lagged by lag_sizes[i] goes to column j * len(lag_sizes) + i. history
+    holds the rows preceding values, they fill the first rows instead of zeros.
+    The array is the transpose of a C-ordered one, the layout of a DataFrame block.
+    """
+    rows, lags = values.shape[0], len(lag_sizes)
+    known = 0
+    if history is not None and len(history) > 0:
+        known = len(history)
+        values = np.vstack([history, values])
+    values = np.ascontiguousarray(values.T)
+
+    result = np.zeros((values.shape[0] * lags, rows))
+    for i, lag_size in enumerate(lag_sizes):
+        start = max(lag_size - known, 0)
+        if start < rows:
+            # all columns at once, every lags-th row of the block
+            result[i::lags, start:] = values[:, known + start - lag_size:known + rows - lag_size]
+    if np.isnan(values).any():
+        np.copyto(result, 0, where=np.isnan(result))
+    return result.T
+
+
+def lag_grid(df, params):
+    """ Every selected column lagged by every size, computed as one block
+
+    Same values and names as a lag node per column and size.
+    """
+    columns = [c for c in params.columns if c in df.columns]
+    block = _lag_block(df[columns].to_numpy(dtype=float), params.lag_sizes)
+    lagged = pd.DataFrame(block, index=df.index, columns=lag_grid_columns(df, params), copy=False)
+    return pd.concat([lagged, df], axis=1)
+
+
+def lag_grid_chunk(df, params, state=None):
+    """ lag_grid of one chunk, state holds the last rows of the selected columns """
+    columns = [c for c in params.columns if c in df.columns]
+    values = df[columns].to_numpy(dtype=float)
+    block = _lag_block(values, params.lag_sizes, state)
+    lagged = pd.DataFrame(block, index=df.index, columns=lag_grid_columns(df, params), copy=False)
+    history = values if state is None else np.vstack([state, values])
+    return pd.concat([lagged, df], axis=1), history[-max(params.lag_sizes):]
+
+
+def adstock(df, params):
+    new_column = params.column + ' adstock' + f' {params.adstock_size}'
+    new_value = recursive_filter(df[params.column], params.adstock_size / 100)
+    return _insert_column(df, new_column, new_value, params.column if params.replace else None)
+
+
+def adstock_chunk(df, params, state=None):
+    """ adstock of one chunk, state is the last adstocked value of the preceding chunks """
+    new_column = params.column + ' adstock' + f' {params.adstock_size}'
+    init = [state] if state is not None else None
+    new_value = recursive_filter(df[params.column], params.adstock_size / 100, init=init)
+    result = _insert_column(df, new_column, new_value, params.column if params.replace else None)
+    return result, new_value.iloc[-1] if len(new_value) > 0 else state
+
+
+def adstock_grid_columns(df, params):
+    """ Names of the columns adstock_grid makes, every decay of a column follows the other """
+    columns = [c for c in params.columns if c in df.columns]
+    kind = 'adstock hl' if params.half_life else 'adstock'
+    saturation = f' hill {params.saturation:g},{params.shape:g}' if params.saturation > 0 else ''
+    return [f'{column} {kind} {decay:g}{saturation}' for column in columns for decay in params.decays]
+
+
+def _adstock_block(values, params, state=None):
+    """ values (rows x columns) adstocked with every decay into one array, laid out like _lag_block
+
+    Each rate runs as one filter over all columns. state holds the adstock
+    (before saturation) of the row preceding values for every result column.
+    Returns the block and the adstock of its last row.
+    """
+    values = np.ascontiguousarray(values.T)
+    decays = np.asarray(params.decays, dtype=float)
+    rates = 0.5 ** (1 / decays) if params.half_life else decays / 100
+
+    result = np.empty((values.shape[0] * len(rates), values.shape[1]))
+    for i, rate in enumerate(rates):
+        # y[t] = x[t] + rate * y[t - 1], as recursive_filter does
+        if state is None:
+            result[i::len(rates)] = lfilter([1.], [1., -rate], values, axis=1)
+        else:
+            result[i::len(rates)] = lfilter([1.], [1., -rate], values, axis=1,
+                                            zi=rate * state[i::len(rates), None])[0]
+    last = result[:, -1].copy() if result.shape[1] > 0 else state
+
+    if params.saturation > 0:
+        np.power(result, params.shape, out=result)
+        result /= result + params.saturation ** params.shape
+    return result.T, last
+
+
+def adstock_grid(df, params):
+    """ Every selected column adstocked with every decay, computed as one block
+
+    Without saturation the values and names for rates in % are the ones of an
+    adstock node per column and rate.
+    """
+    columns = [c for c in params.columns if c in df.columns]
+    block, _ = _adstock_block(df[columns].to_numpy(dtype=float), params)
+    adstocked = pd.DataFrame(block, index=df.index, columns=adstock_grid_columns(df, params), copy=False)
+    return pd.concat([adstocked, df], axis=1)
+
+
+def adstock_grid_chunk(df, params, state=None):
+    """ adstock_grid of one chunk, state is the adstock of the last row of the preceding chunks """
+    columns = [c for c in params.columns if c in df.columns]
+    block, state = _adstock_block(df[columns].to_numpy(dtype=float), params, state)
+    adstocked = pd.DataFrame(block, index=df.index, columns=adstock_grid_columns(df, params), copy=False)
+    return pd.concat([adstocked, df], axis=1), state
+
+
+@lru_cache(maxsize=8)
+def _trend_basis(rows, degree=1, knots=()):
+    """ Orthonormal basis of the trend design over rows: constant, powers of time, a hinge per knot
+
+    The least squares trend of any column over rows is basis @ (basis.T @ column),
+    so the basis is computed once and shared by all columns of the same length.
+    """
+    # time scaled to 0-1 keeps the powers well conditioned
+    t = np.arange(rows, dtype=float) / max(rows - 1, 1)
+    design = [t ** power for power in range(degree + 1)]
+    design += [np.maximum(t - knot / max(rows - 1, 1), 0) for knot in knots]
+    basis, _ = np.linalg.qr(np.column_stack(design))
+    basis.flags.writeable = False
+    return basis
+
+
+def _trend_block(values, degree=1, knots=()):
+    """ Least squares trends of the columns of values (rows x columns), laid out like _lag_block """
+    basis = _trend_basis(values.shape[0], degree, tuple(knots))
+    # (columns x rows), the layout of a DataFrame block
+    return ((basis.T @ values).T @ basis.T).T
+
+
+def trend(df, params):
+    new_column = params.column + ' trend'
+    trend_data = _trend_block(df[[params.column]].to_numpy(dtype=float))[:, 0]
+    return _insert_column(df, new_column, trend_data, params.column if params.replace else None)
+
+
+def trend_panel_columns(df, params):
+    """ Names of the columns trend_panel makes """
+    suffix = ' detrended' if params.detrend else ' trend'
+    return [column + suffix for column in params.columns if column in df.columns]
+
+
+def trend_panel(df, params):
+    """ Trends, or the columns without their trends, of all selected columns by one projection """
+    columns = [c for c in params.columns if c in df.columns]
+    values = df[columns].to_numpy(dtype=float)
+    block = _trend_block(values, params.degree, params.knots)
+    if params.detrend:
+        block = values - block
+    trends = pd.DataFrame(block, index=df.index, columns=trend_panel_columns(df, params), copy=False)
+    return pd.concat([trends, df], axis=1)
+
+
+def unary(df, params):
+    column, op = params.column, params.op
+    new_column = f'{op}({column})'
+    if op == 'log':
+        new_value = np.log(df[column]).fillna(0)
+    elif op == 'negate':
+        new_value = -1 * df[column]
+    else:
+        return df.copy(deep=False)
+    return _insert_column(df, new_column, new_value, column if params.replace else None)
+
+
+def binary(df, params):
+    column_first, column_second, op = params
+    if op == 'sum':
+        new_column = f'({column_first}) + ({column_second})'
+        new_value = df[column_first] + df[column_second]
+    elif op == 'diff':
+        new_column = f'({column_first}) - ({column_second})'
+        new_value = df[column_first] - df[column_second]
+    elif op == 'mult':
+        new_column = f'({column_first}) * ({column_second})'
+        new_value = df[column_first] * df[column_second]
+    elif op == 'div':
+        new_column = f'({column_first}) / ({column_second})'
+        new_value = df[column_first] / df[column_second]
+    else:
+        return None
+    return _insert_column(df, new_column, new_value)
+
+
+def drop(df, params):
+    return df.drop(columns=params.column)
+
+
+def _row_local(kernel):
+    """ Streaming form of a kernel that looks at one row at a time, no state is carried """
+    def chunk_kernel(df, params, state=None):
+        return kernel(df, params), None
+    return chunk_kernel
+
+
+def regression_gram(df, target, columns):
+    """ Gram of the target and the candidate regressors in columns, centered
+
+    Rows where the target or any candidate is missing are left out. Any
+    subset of the candidates is fitted from the gram alone, see fit_gram.
+    """
+    columns = list(columns)
+    return _gram(target, columns, df[[target] + columns].to_numpy(dtype=float))
+
+
+def _gram(target, columns, values):
+    """ Gram of values, the target in the first column and columns in the others """
+    finite = np.isfinite(values)
+    complete = finite.all(axis=1)
+    gaps = tuple(column for column, known in zip(columns, finite[finite[:, 0], 1:].all(axis=0)) if not known)
+    values = values[complete]
+    means = values.mean(axis=0) if len(values) > 0 else np.zeros(values.shape[1])
+    values = values - means
+    cross = values.T @ values
+    return Gram(target, columns, len(values), means[0], means[1:], cross[1:, 1:], cross[1:, 0], cross[0, 0],
+                gaps)
+
+
+def _covers(gram, target, factors):
+    """ True when fitting factors from gram uses the rows a gram of the target and factors alone would
+
+    The gram leaves out the rows where any of its columns is missing, a fit of
+    fewer columns has the same rows only if it keeps every column with gaps.
+    """
+    return gram.target == target and set(gram.gaps).issubset(factors) and set(factors).issubset(gram.columns)
+
+
+def _solve_normal(xx, xy):
+    try:
+        return cho_solve(cho_factor(xx), xy)
+    except LinAlgError:
+        # collinear regressors, the minimum norm solution
+        return np.linalg.lstsq(xx, xy, rcond=None)[0]
+
+
+def _nnls_normal(xx, xy):
+    """ Non-negative least squares given only the normal equations
+
+    With xx = V diag(w) V', |A b - t|^2 for A = diag(sqrt(w)) V' and
+    t = diag(1 / sqrt(w)) V' xy differs from the least squares loss by a constant.
+    """
+    w, v = np.linalg.eigh(xx)
+    keep = w > max(w.max(initial=0), 0) * 1e-12
+    root = np.sqrt(w[keep])
+    coef, _ = nnls(root[:, None] * v[:, keep].T, (v[:, keep].T @ xy) / root)
+    return coef
+
+
+def _fit_normal(xx, xy, method='ols', alpha=1.0):
+    """ Coefficients from the centered normal equations """
+    if method == 'nnls':
+        return _nnls_normal(xx, xy)
+    if method == 'ridge':
+        return _solve_normal(xx + alpha * np.eye(len(xy)), xy)
+    return _solve_normal(xx, xy)
+
+
+def fit_gram(gram, factors, method='ols', alpha=1.0):
+    """ LinearModel of gram.target on factors, a subset of gram.columns, with an unpenalized intercept """
+    idx = [gram.columns.index(factor) for factor in factors]
+    xx, xy = gram.xx[np.ix_(idx, idx)], gram.xy[idx]
+    coef = _fit_normal(xx, xy, method, alpha)
+
+    means = gram.means[idx]
+    intercept = gram.y_mean - means @ coef
+    rss = max(gram.yy - 2 * coef @ xy + coef @ xx @ coef, 0)
+    r2 = 1 - rss / gram.yy if gram.yy > 0 else np.nan
+
+    std_err = np.full(len(idx), np.nan)
+    intercept_std_err = np.nan
+    dof = gram.rows - len(idx) - 1
+    if method == 'ols' and dof > 0:
+        cov = rss / dof * np.linalg.pinv(xx)
+        std_err = np.sqrt(np.diag(cov))
+        intercept_std_err = np.sqrt(rss / dof / gram.rows + means @ cov @ means)
+
+    return LinearModel(gram.target, list(factors), method, intercept, coef,
+                       intercept_std_err, std_err, r2, gram.rows)
+
+
+def predict(model, df):
+    return model.intercept + df[model.factors].to_numpy(dtype=float) @ model.coef
+
+
+def regression(df, params, gram=None, candidates=None):
+    """ Linear regression of the target on the factors
+
+    gram, when it covers the target and the factors, saves going through
+    the data again. Otherwise a gram is computed over candidates (the factors
+    by default) and comes back with the result, so it serves other factor
+    selections later.
+    """
+    # here we additionally check if incoming dataframe has expected columns
+    # while it can be changed by parent node, keeping factors unchanged yet
+    sanity_factors = list(df.columns[df.columns.isin(params.factors)])
+
+    if gram is None or not _covers(gram, params.target_column, sanity_factors):
+        # a candidate missing values where the target is known would leave those rows out of the fit
+        known = np.isfinite(df[params.target_column].to_numpy(dtype=float))
+        candidates = [c for c in (candidates or []) if c in df.columns and c not in sanity_factors
+                      and np.isfinite(df[c].to_numpy(dtype=float)[known]).all()]
+        gram = regression_gram(df, params.target_column, sanity_factors + candidates)
+
+    model = fit_gram(gram, sanity_factors, params.method, params.alpha)
+    y = df[params.target_column]
+    data = df[sanity_factors]
+    pred = predict(model, df)
+    return RegressionResult(model, data, y, pred, gram)
+
+
+def coefficient_table(result):
+    """ Intercept and coefficients of a fitted regression with their std errors and t values """
+    model = result.model
+    coef = np.concatenate([[model.intercept], model.coef])
+    std_err = np.concatenate([[model.intercept_std_err], model.std_err])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_value = coef / std_err
+    return pd.DataFrame({'factor': ['intercept'] + list(model.factors), 'coefficient': coef,
+                         'std_error': std_err, 't_value': t_value})
+
+
+def validate_model(model, params, df):
+    """ Returns the reason why a kernel of MODEL_KERNELS can't apply model to df, None if it can """
+    if model is None or not isinstance(model, LinearModel):
+        return 'Connect a fitted model'
+    error = validate(params, df)
+    if error is not None:
+        return error
+
+    for factor in model.factors:
+        if factor not in df.columns:
+            return f'Column "{factor}" is not in the input'
+    if isinstance(params, PredictParams):
+        return _clashing_column(df, prediction_columns(df, model, params))
+    if isinstance(params, DecomposeParams):
+        return _clashing_column(df, decomposition_columns(df, model, params))
+    if isinstance(params, ScenarioParams):
+        unknown = [factor for factor in params.factors if factor not in model.factors]
+        if len(unknown) > 0:
+            return f'"{unknown[0]}" is not a regressor of the model'
+        return _clashing_column(df, scenario_columns(df, model, params))
+    return None
+
+
+def _with_block(df, block, columns):
+    """ df with the rows of block (columns x rows) as new columns in front """
+    new = pd.DataFrame(block.T, index=df.index, columns=columns, copy=False)
+    return pd.concat([new, df], axis=1)
+
+
+def prediction_columns(df, model, params):
+    columns = [f'{model.target} predicted']
+    if params.residuals and model.target in df.columns:
+        columns.append(f'{model.target} residual')
+    return columns
+
+
+def prediction(df, model, params):
+    """ The model prediction for the rows of df, and the residuals when df has the target """
+    columns = prediction_columns(df, model, params)
+    block = np.empty((len(columns), df.shape[0]))
+    block[0] = predict(model, df)
+    if len(columns) > 1:
+        block[1] = df[model.target].to_numpy(dtype=float) - block[0]
+    return _with_block(df, block, columns)
+
+
+def decomposition_columns(df, model, params):
+    return [f'{model.target} base'] + [f'{factor} contribution' for factor in model.factors]
+
+
+def decomposition(df, model, params):
+    """ The model prediction split into the contribution of every factor, coefficient times value
+
+    With the 'mean' baseline a contribution is measured from the mean of the
+    factor in df, the base takes the rest. The columns sum up to the prediction.
+    """
+    values = df[model.factors].to_numpy(dtype=float)
+    baseline = np.zeros(len(model.factors))
+    if params.baseline == 'mean' and values.shape[0] > 0:
+        baseline = np.nanmean(values, axis=0)
+
+    block = np.empty((len(model.factors) + 1, df.shape[0]))
+    block[0] = model.intercept + baseline @ model.coef
+    block[1:] = model.coef[:, None] * (values - baseline).T
+    return _with_block(df, block, decomposition_columns(df, model, params))
+
+
+def scenario_columns(df, model, params):
+    return [f'{model.target} baseline'] + [f'{model.target} {change:+g}%' for change in params.changes]
+
+
+def scenario(df, model, params):
+    """ The model prediction with the selected factors changed by every percentage in params.changes
+
+    The prediction is linear in the factors, so every scenario is the baseline
+    plus a multiple of the part the selected factors contribute.
+    """
+    baseline = predict(model, df)
+    idx = [model.factors.index(factor) for factor in params.factors]
+    part = df[[model.factors[i] for i in idx]].to_numpy(dtype=float) @ model.coef[idx]
+
+    block = np.empty((len(params.changes) + 1, df.shape[0]))
+    block[0] = baseline
+    for i, change in enumerate(params.changes):
+        block[i + 1] = baseline + change / 100 * part
+    return _with_block(df, block, scenario_columns(df, model, params))
+
+
+def _shifted_rows(df, target, factors):
+    """ Complete rows of the target and the factors, less their means, and the means
+
+    Shifting leaves the fits unchanged and keeps grams summed over many rows precise.
+    """
+    values = df[[target] + factors].to_numpy(dtype=float)
+    values = values[np.isfinite(values).all(axis=1)]
+    shift = values.mean(axis=0) if len(values) > 0 else np.zeros(values.shape[1])
+    return values - shift, shift
+
+
+def _raw_gram(values):
+    """ Cross products of [1, values], summing them over row ranges gives the gram of their union """
+    augmented = np.column_stack([np.ones(len(values)), values])
+    return augmented.T @ augmented
+
+
+def _window_gram(raw, target, factors, shift):
+    """ Gram (see regression_gram) from the summed cross products of rows shifted by shift """
+    rows = raw[0, 0]
+    means = raw[0, 1:] / rows
+    cross = raw[1:, 1:] - rows * np.outer(means, means)
+    means = means + shift
+    return Gram(target, factors, int(round(rows)), means[0], means[1:], cross[1:, 1:], cross[1:, 0], cross[0, 0])
+
+
+def cross_validation(df, params):
+    """ Out of sample errors of the regression over rolling origin folds
+
+    The cross products of the rows are summed at the fold boundaries once, in
+    order. The gram of a training window is then the difference of two sums,
+    so moving to the next fold only adds (and, rolling, removes) the rows
+    that changed, instead of refitting the window.
+    """
+    factors = list(df.columns[df.columns.isin(params.factors)])
+    values, shift = _shifted_rows(df, params.target_column, factors)
+    rows = len(values)
+
+    folds = []
+    for end in range(params.initial, rows - params.horizon + 1, params.step):
+        folds.append((0 if params.scheme == 'expanding' else end - params.initial, end))
+
+    sums = {}
+    total = np.zeros((len(factors) + 2, len(factors) + 2))
+    previous = 0
+    for boundary in sorted({0} | {b for fold in folds for b in fold}):
+        total = total + _raw_gram(values[previous:boundary])
+        sums[boundary] = total
+        previous = boundary
+
+    records = []
+    for number, (start, end) in enumerate(folds):
+        gram = _window_gram(sums[end] - sums[start], params.target_column, factors, shift)
+        model = fit_gram(gram, factors, params.method, params.alpha)
+        test = values[end:end + params.horizon] + shift
+        error = test[:, 0] - (model.intercept + test[:, 1:] @ model.coef)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ape = np.abs(error / test[:, 0])
+        records.append((number + 1, start, end, end, end + len(test),
+                        np.sqrt(np.mean(error ** 2)), np.mean(np.abs(error)), np.mean(error),
+                        np.nanmean(np.where(np.isfinite(ape), ape, np.nan)) * 100 if np.isfinite(ape).any() else np.nan))
+
+    return pd.DataFrame.from_records(records, columns=['fold', 'train_start', 'train_end', 'test_start', 'test_end',
+                                                       'rmse', 'mae', 'bias', 'mape'])
+
+
+def bootstrap(df, params):
+    """ Confidence intervals of the regression coefficients by block bootstrap
+
+    Rows are cut into consecutive blocks of block_size, which keeps the serial
+    correlation within a block; a replicate draws as many blocks with
+    replacement. The gram of a replicate is the count-weighted sum of block
+    grams, so all replicates come from one product of the draw counts with
+    the block grams and none goes back to the rows.
+    """
+    factors = list(df.columns[df.columns.isin(params.factors)])
+    values, shift = _shifted_rows(df, params.target_column, factors)
+    size = len(factors) + 2
+
+    starts = range(0, len(values), params.block_size)
+    blocks = np.stack([_raw_gram(values[start:start + params.block_size]) for start in starts]) \
+        if len(values) > 0 else np.zeros((0, size, size))
+
+    rng = np.random.default_rng(params.seed)
+    draws = rng.integers(0, len(blocks), size=(params.replicates, len(blocks)))
+    counts = np.stack([np.bincount(draw, minlength=len(blocks)) for draw in draws])
+    replicates = (counts @ blocks.reshape(len(blocks), -1)).reshape(-1, size, size)
+
+    full = fit_gram(_window_gram(blocks.sum(axis=0), params.target_column, factors, shift),
+                    factors, params.method, params.alpha)
+    estimates = np.empty((params.replicates, len(factors) + 1))
+    for i, raw in enumerate(replicates):
+        gram = _window_gram(raw, params.target_column, factors, shift)
+        coef = _fit_normal(gram.xx, gram.xy, params.method, params.alpha)
+        estimates[i] = np.concatenate([[gram.y_mean - gram.means @ coef], coef])
+
+    tail = (1 - params.confidence) / 2 * 100
+    return pd.DataFrame({
+        'factor': ['intercept'] + factors,
+        'coefficient': np.concatenate([[full.intercept], full.coef]),
+        'std_error': estimates.std(axis=0, ddof=1),
+        'lower': np.percentile(estimates, tail, axis=0),
+        'upper': np.percentile(estimates, 100 - tail, axis=0),
+    })
+
+
+def search_candidates(df, params):
+    return [c for c in df.columns[df.columns.isin(params.candidates)] if c != params.target_column]
+
+
+def subset_count(candidates, max_factors):
+    """ Number of non-empty subsets of at most max_factors out of candidates """
+    return sum(math.comb(candidates, size) for size in range(1, min(candidates, max_factors) + 1))
+
+
+def _scores(gram, rss, size, criterion):
+    """ criterion of fits with size factors leaving rss, lower is better """
+    n = gram.rows
+    rss = np.maximum(rss, np.finfo(float).tiny)
+    if criterion == 'adj_r2':
+        return (rss / (n - size - 1)) / (gram.yy / (n - 1)) - 1
+    # log likelihood as statsmodels reports it
+    llf = -n / 2 * (np.log(2 * np.pi) + np.log(rss / n) + 1)
+    penalty = 2 if criterion == 'aic' else np.log(n)
+    return -2 * llf + penalty * (size + 1)
+
+
+class _Leaderboard:
+    """ Best scored specifications seen, at most top of them """
+
+    def __init__(self, top):
+        self.top = top
+        # (-score, factors, rss), the worst kept one first
+        self.heap = []
+
+    def threshold(self):
+        return -self.heap[0][0] if len(self.heap) >= self.top else np.inf
+
+    def add(self, scores, subsets, rss):
+        for i in np.flatnonzero(scores < self.threshold()):
+            entry = (-scores[i], subsets[i], rss[i])
+            if len(self.heap) < self.top:
+                heapq.heappush(self.heap, entry)
+            elif entry > self.heap[0]:
+                heapq.heapreplace(self.heap, entry)
+
+    def merge(self, entries):
+        for entry in entries:
+            self.add(np.array([-entry[0]]), [entry[1]], [entry[2]])
+
+
+def _extensions(gram, factors, chol, z, rss, added):
+    """ rss of factors + [j] for every j in added, with the new row of the Cholesky factor
+
+    chol is the lower Cholesky factor of the gram of factors and z = chol^-1 xy,
+    so rss = yy - |z|^2. Adding j appends the row [l, d] with l = chol^-1 xx[factors, j];
+    z gains (xy[j] - l.z) / d, which is all the new rss needs.
+    """
+    if len(factors) > 0:
+        rows = solve_triangular(chol, gram.xx[np.ix_(factors, added)], lower=True, check_finite=False)
+        d2 = gram.xx[added, added] - np.einsum('ij,ij->j', rows, rows)
+        z_new = gram.xy[added] - rows.T @ z
+    else:
+        rows = np.zeros((0, len(added)))
+        d2 = gram.xx[added, added].copy()
+        z_new = gram.xy[added].copy()
+    # a regressor (nearly) collinear with the factors adds nothing
+    valid = d2 > 1e-10 * np.maximum(gram.xx[added, added], np.finfo(float).tiny)
+    d = np.sqrt(np.where(valid, d2, 1))
+    z_new /= d
+    return rss - z_new ** 2, rows, d, z_new, valid
+
+
+def _extend(chol, row, d):
+    size = chol.shape[0]
+    grown = np.zeros((size + 1, size + 1))
+    grown[:size, :size] = chol
+    grown[size, :size] = row
+    grown[size, size] = d
+    return grown
+
+
+def _subset_branch(gram, criterion, max_factors, top, first):
+    """ Best subsets holding candidate first and candidates after it only, see _best_subsets """
+    board = _Leaderboard(top)
+    _, _, d, z, valid = _extensions(gram, [], None, None, gram.yy, [first])
+    if valid[0]:
+        stack = [([first], np.array([[d[0]]]), z, gram.yy - z[0] ** 2)]
+        board.add(_scores(gram, np.array([stack[0][3]]), 1, criterion), [(first,)], [stack[0][3]])
+    else:
+        stack = []
+
+    size_limit = min(max_factors, len(gram.columns))
+    while stack:
+        factors, chol, z, rss = stack.pop()
+        added = np.arange(factors[-1] + 1, len(gram.columns))
+        if len(added) == 0:
+            continue
+        rss_new, rows, d, z_new, valid = _extensions(gram, factors, chol, z, rss, added)
+        added, rss_new, rows, d, z_new = added[valid], rss_new[valid], rows[:, valid], d[valid], z_new[valid]
+        size = len(factors) + 1
+        board.add(_scores(gram, rss_new, size, criterion), [tuple(factors) + (j,) for j in added], rss_new)
+        if size < size_limit:
+            for i, j in enumerate(added):
+                stack.append((factors + [j], _extend(chol, rows[:, i], d[i]), np.append(z, z_new[i]), rss_new[i]))
+    return board.heap
+
+
+def _best_subsets(gram, params, pool=None):
+    """ Every subset of at most max_factors candidates, searched depth first
+
+    Each step of the search adds one candidate to a subset by extending the
+    Cholesky factor of its gram by one row, all candidates at once. The
+    subsets starting with each candidate are independent branches, they are
+    spread over pool when the search is large.
+    """
+    board = _Leaderboard(params.top)
+    branch = partial(_subset_branch, gram, params.criterion, params.max_factors, params.top)
+    firsts = range(len(gram.columns))
+    if pool is not None and subset_count(len(gram.columns), params.max_factors) > PARALLEL_SUBSETS:
+        branches = pool.map(branch, firsts)
+    else:
+        branches = map(branch, firsts)
+    for entries in branches:
+        board.merge(entries)
+    return board
+
+
+def _forward(gram, params):
+    """ Adds the candidate improving the criterion most until none does or max_factors are in """
+    board = _Leaderboard(params.top)
+    factors, chol, z, rss = [], np.zeros((0, 0)), np.zeros(0), gram.yy
+    score = _scores(gram, rss, 0, params.criterion)
+    while len(factors) < params.max_factors:
+        added = np.array([j for j in range(len(gram.columns)) if j not in factors], dtype=int)
+        if len(added) == 0:
+            break
+        rss_new, rows, d, z_new, valid = _extensions(gram, factors, chol, z, rss, added)
+        scores = np.where(valid, _scores(gram, rss_new, len(factors) + 1, params.criterion), np.inf)
+        board.add(scores, [tuple(sorted(factors + [j])) for j in added], rss_new)
+        best = int(np.argmin(scores))
+        if not scores[best] < score:
+            break
+        factors, chol = factors + [added[best]], _extend(chol, rows[:, best], d[best])
+        z, rss, score = np.append(z, z_new[best]), rss_new[best], scores[best]
+    return board
+
+
+def _backward(gram, params):
+    """ Starting from all candidates, drops the one whose removal improves the criterion most
+
+    Dropping factor j raises rss by coef[j]^2 / inv[j, j], inv being the
+    inverse gram of the factors, so all removals are scored from one inverse.
+    Factors are dropped while that improves the criterion or more than
+    max_factors are left, only specifications of at most max_factors are ranked.
+    """
+    board = _Leaderboard(params.top)
+    factors = list(range(len(gram.columns)))
+    inv = np.linalg.pinv(gram.xx)
+    coef = inv @ gram.xy
+    rss = gram.yy - coef @ gram.xy
+    score = _scores(gram, np.array([rss]), len(factors), params.criterion)[0]
+    if len(factors) <= params.max_factors:
+        board.add(np.array([score]), [tuple(factors)], [rss])
+    while len(factors) > 1:
+        diag = np.diag(inv)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rss_new = rss + np.where(diag > 0, coef ** 2 / diag, 0)
+        scores = _scores(gram, rss_new, len(factors) - 1, params.criterion)
+        if len(factors) - 1 <= params.max_factors:
+            board.add(scores, [tuple(factors[:i] + factors[i + 1:]) for i in range(len(factors))], rss_new)
+        best = int(np.argmin(scores))
+        if not (scores[best] < score or len(factors) > params.max_factors):
+            break
+        # the inverse gram without row and column best
+        keep = np.arange(len(factors)) != best
+        inv = inv[np.ix_(keep, keep)] - np.outer(inv[keep, best], inv[best, keep]) / inv[best, best]
+        factors = factors[:best] + factors[best + 1:]
+        coef = inv @ gram.xy[factors]
+        rss, score = rss_new[best], scores[best]
+    return board
+
+
+def model_search(df, params, pool=None):
+    """ Leaderboard of linear specifications of the target over subsets of the candidates
+
+    All specifications are scored from one gram (see regression_gram), fits
+    with an intercept ranked by params.criterion. pool, a concurrent.futures
+    executor, runs the branches of a large best subset search.
+    """
+    gram = regression_gram(df, params.target_column, search_candidates(df, params))
+    if params.strategy == 'best_subset':
+        board = _best_subsets(gram, params, pool)
+    elif params.strategy == 'backward':
+        board = _backward(gram, params)
+    else:
+        board = _forward(gram, params)
+
+    entries = sorted(board.heap, reverse=True)
+    rss = np.array([entry[2] for entry in entries], dtype=float)
+    sizes = np.array([len(entry[1]) for entry in entries], dtype=int)
+    r2 = 1 - rss / gram.yy if gram.yy > 0 else np.full(len(rss), np.nan)
+    return pd.DataFrame({
+        'factors': [', '.join(str(gram.columns[j]) for j in entry[1]) for entry in entries],
+        'size': sizes,
+        'r2': r2,
+        'adj_r2': -_scores(gram, rss, sizes, 'adj_r2'),
+        'aic': _scores(gram, rss, sizes, 'aic'),
+        'bic': _scores(gram, rss, sizes, 'bic'),
+    })
+
+
+def search_channels(df, params):
+    """ Channels and controls of a transform search present in df, neither holds the target """
+    channels = [c for c in params.channels if c in df.columns and c != params.target_column]
+    controls = [c for c in params.controls
+                if c in df.columns and c != params.target_column and c not in channels]
+    return channels, controls
+
+
+def _factor_state(gram, factors):
+    """ Lower Cholesky factor of the gram of factors, z = chol^-1 xy and rss, see _extensions """
+    if len(factors) == 0:
+        return np.zeros((0, 0)), np.zeros(0), gram.yy
+    xx = gram.xx[np.ix_(factors, factors)]
+    try:
+        chol = np.linalg.cholesky(xx)
+    except np.linalg.LinAlgError:
+        # collinear controls, a tiny ridge keeps the factor defined
+        chol = np.linalg.cholesky(xx + 1e-10 * np.trace(xx) / len(factors) * np.eye(len(factors)))
+    z = solve_triangular(chol, gram.xy[factors], lower=True, check_finite=False)
+    return chol, z, gram.yy - z @ z
+
+
+def transform_search(df, params):
+    """ Adstock decay and lag size per channel that fit the target best, by coordinate descent
+
+    Every channel is adstocked with every decay and then lagged by every lag
+    size once, as one (channels x grid x rows) block, and a single gram over
+    all of them is computed. A round then goes over the channels, trying the
+    whole grid of one channel with the others fixed: one triangular solve
+    against the Cholesky factor of the fixed regressors. The search stops
+    after a round that changes nothing, or after max_rounds.
+    """
+    channels, controls = search_channels(df, params)
+    decays, lag_sizes = tuple(params.decays), tuple(params.lag_sizes)
+    grid = [(decay, lag_size) for decay in decays for lag_size in lag_sizes]
+
+    # adstock commutes with lag, both start from zeros
+    adstocked, _ = _adstock_block(df[channels].to_numpy(dtype=float), AdstockGridParams((), decays))
+    block = _lag_block(adstocked, lag_sizes)
+    names = [f'{channel} adstock {decay:g} lag {lag_size}' for channel in channels for decay, lag_size in grid]
+    values = np.column_stack([df[[params.target_column] + controls].to_numpy(dtype=float), block])
+    gram = _gram(params.target_column, controls + names, values)
+    del values, block, adstocked
+
+    def column(channel, choice):
+        return len(controls) + channel * len(grid) + choice
+
+    choices = [0] * len(channels)
+    rounds = 0
+    for rounds in range(1, params.max_rounds + 1):
+        changed = False
+        for channel in range(len(channels)):
+            fixed = list(range(len(controls))) + [column(other, choices[other])
+                                                  for other in range(len(channels)) if other != channel]
+            chol, z, rss = _factor_state(gram, fixed)
+            rss_new, _, _, _, valid = _extensions(gram, fixed, chol, z, rss,
+                                                  column(channel, np.arange(len(grid))))
+            scores = np.where(valid, _scores(gram, rss_new, len(fixed) + 1, params.criterion), np.inf)
+            best = int(np.argmin(scores))
+            if scores[best] < scores[choices[channel]] - 1e-9 * abs(scores[choices[channel]]):
+                choices[channel] = best
+                changed = True
+        if not changed:
+            break
+
+    factors = controls + [names[column(channel, choices[channel]) - len(controls)] for channel in range(len(channels))]
+    model = fit_gram(gram, factors, 'ols')
+    _, _, rss = _factor_state(gram, [gram.columns.index(factor) for factor in factors])
+    score = _scores(gram, np.array([rss]), len(factors), params.criterion)[0]
+    return pd.DataFrame({
+        'channel': channels,
+        'decay': [grid[choice][0] for choice in choices],
+        'lag': [grid[choice][1] for choice in choices],
+        'column': factors[len(controls):],
+        'coefficient': model.coef[len(controls):],
+        'std_error': model.std_err[len(controls):],
+        'r2': model.r2,
+        params.criterion: -score if params.criterion == 'adj_r2' else score,
+        'rounds': rounds,
+    })
+
+
+def plot_data(df, params):
+    # the input can lose columns upstream while the node keeps its selection
+    sanity_plot_columns = df.columns[df.columns.isin(params.columns)]
+    return df[sanity_plot_columns]
+
+
+def read_workbook(filename, sheet=None):
+    """ Sheet names of the workbook and one parsed sheet, the first one by default """
+    with pd.ExcelFile(filename) as xlsdata:
+        if sheet is None:
+            sheet = xlsdata.sheet_names[0]
+        return Workbook(filename, list(xlsdata.sheet_names), sheet, xlsdata.parse(sheet))
+
+
+def read_excel_sheet(filename, sheet):
+    return pd.read_excel(filename, sheet_name=sheet)
+
+
+def _projection(columns, available):
+    """ The requested columns in file order, columns made downstream are not in the file """
+    if columns is None:
+        return None
+    requested = set(columns)
+    projected = [c for c in available if c in requested]
+    return projected if len(projected) > 0 else None
+
+
+def _source(params):
+    return pa.memory_map(params.filename) if params.memory_map else params.filename
+
+
+def read_csv(params):
+    """ Reads a CSV file, with pyarrow in parallel blocks that share the column types """
+    header = pd.read_csv(params.filename, nrows=0).columns
+    columns = _projection(params.columns, header)
+    if pa is not None:
+        options = pa_csv.ConvertOptions(include_columns=columns)
+        return pa_csv.read_csv(_source(params), convert_options=options).to_pandas()
+
+    chunks = pd.read_csv(params.filename, usecols=columns, chunksize=CSV_CHUNKSIZE, memory_map=params.memory_map)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_parquet(params):
+    columns = params.columns
+    if pa is not None and columns is not None:
+        columns = _projection(columns, pq.read_schema(params.filename).names)
+    elif columns is not None:
+        # the columns in the file are unknown without pyarrow
+        columns = None
+    return pd.read_parquet(params.filename, columns=columns, memory_map=params.memory_map)
+
+
+def read_feather(params):
+    """ Reads Feather v2 / Arrow IPC files, memory mapped files are not copied while reading """
+    if pa is None:
+        return pd.read_feather(params.filename)
+    source = _source(params)
+    with pa.ipc.open_file(source) as reader:
+        columns = _projection(params.columns, reader.schema.names)
+    return feather.read_table(source, columns=columns, memory_map=params.memory_map).to_pandas()
+
+
+def _frames(batches, chunksize, offset=0):
+    """ Record batches regrouped into DataFrames of chunksize rows, the index continues across them """
+    pending, rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        rows += batch.num_rows
+        while rows >= chunksize:
+            table = pa.Table.from_batches(pending)
+            frame = table.slice(0, chunksize).to_pandas()
+            frame.index = pd.RangeIndex(offset, offset + len(frame))
+            offset += len(frame)
+            pending = table.slice(chunksize).to_batches()
+            rows -= len(frame)
+            yield frame
+    if rows > 0:
+        frame = pa.Table.from_batches(pending).to_pandas()
+        frame.index = pd.RangeIndex(offset, offset + len(frame))
+        yield frame
+
+
+def read_csv_chunks(params, chunksize):
+    header = pd.read_csv(params.filename, nrows=0).columns
+    columns = _projection(params.columns, header)
+    if pa is None:
+        yield from pd.read_csv(params.filename, usecols=columns, chunksize=chunksize, memory_map=params.memory_map)
+        return
+    # column types are inferred from the first block and kept for the rest of the file
+    options = pa_csv.ConvertOptions(include_columns=columns)
+    with pa_csv.open_csv(_source(params), convert_options=options) as reader:
+        yield from _frames(reader, chunksize)
+
+
+def read_parquet_chunks(params, chunksize):
+    if pa is None:
+        raise ValueError('reading parquet in chunks requires pyarrow')
+    with pq.ParquetFile(params.filename, memory_map=params.memory_map) as file:
+        columns = _projection(params.columns, file.schema_arrow.names)
+        yield from _frames(file.iter_batches(batch_size=chunksize, columns=columns), chunksize)
+
+
+def read_feather_chunks(params, chunksize):
+    if pa is None:
+        raise ValueError('reading feather in chunks requires pyarrow')
+    with pa.ipc.open_file(_source(params)) as reader:
+        columns = _projection(params.columns, reader.schema.names)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        if columns is not None:
+            batches = (batch.select(columns) for batch in batches)
+        yield from _frames(batches, chunksize)
+
+
+# op_code -> file reader, used by the data source nodes
+READERS = {
+    'read_csv': read_csv,
+    'read_parquet': read_parquet,
+    'read_feather': read_feather,
+}
+
+# op_code -> reader yielding the file in DataFrames of a given number of rows
+CHUNK_READERS = {
+    'read_csv': read_csv_chunks,
+    'read_parquet': read_parquet_chunks,
+    'read_feather': read_feather_chunks,
+}
+
+# op_code -> kernel
+KERNELS = {
+    'lag': lag,
+    'lag_grid': lag_grid,
+    'adstock': adstock,
+    'adstock_grid': adstock_grid,
+    'trend': trend,
+    'trend_panel': trend_panel,
+    'model_search': model_search,
+    'transform_search': transform_search,
+    'cross_validation': cross_validation,
+    'bootstrap': bootstrap,
+    'unary': unary,
+    'binary': binary,
+    'filter': drop,
+    'regression': regression,
+    'plotter': plot_data,
+}
+
+# op_code -> kernel(df, model, params) applying a fitted LinearModel
+MODEL_KERNELS = {
+    'predict': prediction,
+    'decompose': decomposition,
+    'scenario': scenario,
+}
+
+# op_code -> kernel(chunk, params, state) returning (result, state), for the
+# kernels that can run over consecutive chunks of the input. trend fits over
+# the whole column and regression over the whole input, so they can't.
+STREAM_KERNELS = {
+    'lag': lag_chunk,
+    'lag_grid': lag_grid_chunk,
+    'adstock': adstock_chunk,
+    'adstock_grid': adstock_grid_chunk,
+    'unary': _row_local(unary),
+    'binary': _row_local(binary),
+    'filter': _row_local(drop),
+}
@@ -1,9 +1,10 @@
-import traceback
+from functools import partial
 
 import pandas as pd
 
+from econ_helper import kernels
 from econ_helper.eh_node_base import *
-from econ_helper.pandas_model import PandasModel
+from econ_helper.pandas_model import PandasModel, adjust_column_widths
 from nodeeditor.node_content_widget import ImprovedPlainTextEdit
 from nodeeditor.node_node import SOCKET_TYPE_DF
 from nodeeditor.utils import dumpException
@@ -45,13 +46,16 @@ class BaseNodeContent(QDMNodeContentWidget):
 
 class BaseInOutNode(EcoNode):
 
-    def __init__(self, scene, default_node_text=None):
+    def __init__(self, scene, default_node_text=None, inputs=None):
         self.default_node_text = default_node_text
         self.input_value = None
         self.content = None
         self.grNode = None
 
-        super().__init__(scene, inputs=[SOCKET_TYPE_DF], outputs=[SOCKET_TYPE_DF])
+        # the frame is always the first input
+        if inputs is None:
+            inputs = [SOCKET_TYPE_DF]
+        super().__init__(scene, inputs=inputs, outputs=[SOCKET_TYPE_DF])
 
     def initInnerClasses(self):
         self.content = BaseNodeContent(self)
@@ -59,18 +63,36 @@ class BaseInOutNode(EcoNode):
         if self.default_node_text is not None:
             self.content.default_node_text = self.default_node_text
 
-    def main_node_operation(self, df):
+    def read_params(self, df):
+        """ Builds the kernel parameters from the widgets, falling back to the stored settings """
         raise NotImplementedError
 
+    def store_params(self, params):
+        """ Keeps the parameters as node settings, update_ui restores the widgets from them """
+        pass
+
+    def prepare_operation(self, df):
+        """ Reads node settings on the GUI thread.
+
+        Returns the node kernel bound to its parameters, or None when the node
+        is not configured. The callable runs off the GUI thread and must not
+        touch any widget.
+        """
+        params = self.read_params(df)
+        # a partial selection is kept too, the user completes it in the next step
+        self.store_params(params)
+
+        error = kernels.validate(params, df)
+        if error is not None:
+            logging.debug(f'{self.__class__.__name__}: {error}')
+            return None
+
+        return partial(kernels.KERNELS[self.op_code], params=params)
+
     def adjust_table_width(self):
         if self.table is None:
             return
-        header = self.table.horizontalHeader()
-        for column in range(header.count()):
-            header.setSectionResizeMode(column, QHeaderView.ResizeToContents)
-            width = header.sectionSize(column)
-            header.setSectionResizeMode(column, QHeaderView.Interactive)
-            header.resizeSection(column, width)
+        adjust_column_widths(self.table, self.column_widths)
 
     def onMarkedInvalid(self):
         if self.input_value is None:
@@ -103,32 +125,36 @@ class BaseInOutNode(EcoNode):
 
         logging.debug(f'evaluating connection -> {self.__class__.__name__}')
 
-        need_update_children = False
         self.input_value = input_value
         try:
-            new_output_value = self.main_node_operation(self.input_value)
-            if new_output_value is not None \
-                    and isinstance(new_output_value, pd.DataFrame) \
-                    and not new_output_value.equals(self.output_value):
-                self.output_value = new_output_value
-                need_update_children = True
-
-            if new_output_value is None:
-                self.markInvalid(error_message='Check node configuration')
+            operation = self.prepare_operation(self.input_value)
         except Exception as e:
-            logging.error(e)
-            traceback.print_tb(e.__traceback__)
-            self.output_value = None
-            self.markInvalid(error_message='Internal node error. See log for details')
+            self.on_operation_error(e)
+            return None
+
+        if operation is None:
+            self.markInvalid(error_message='Check node configuration')
+            return None
+
+        self.submit_operation(operation, self.input_value, cache_key=self.operation_key(operation))
+        return [self.output_value]
+
+    def on_operation_result(self, new_output_value):
+        need_update_children = False
+        if new_output_value is not None \
+                and isinstance(new_output_value, pd.DataFrame) \
+                and new_output_value is not self.output_value \
+                and not new_output_value.equals(self.output_value):
+            self.output_value = new_output_value
+            need_update_children = True
+
+        if new_output_value is None:
+            self.markInvalid(error_message='Check node configuration')
 
         logging.debug(f'Main node operation done for node {self.__class__.__name__}')
 
         if self.output_value is not None:
-            self.dataModel = PandasModel(self.output_value)
-            self.dataModel.set_paint_callback(self.dataModel.default_paint_callback)
-            self.table.setModel(self.dataModel)
-            self.adjust_table_width()
-            self.table.show()
+            self.refresh_output_widget()
 
             self.markDirty(False)
             self.markInvalid(False)
@@ -144,7 +170,15 @@ class BaseInOutNode(EcoNode):
 
         logging.debug(f'evaluation completed for node {self.__class__.__name__}')
 
-        return [self.output_value]
+        # descendants waiting for this result are evaluated now
+        self.scene.controller.scene_changed()
+
+    def update_output_widget(self):
+        self.dataModel = PandasModel(self.output_value)
+        self.dataModel.set_paint_callback(self.dataModel.default_paint_callback)
+        self.table.setModel(self.dataModel)
+        self.adjust_table_width()
+        self.table.show()
 
     def update_ui(self):
         pass
@@ -153,9 +187,8 @@ class BaseInOutNode(EcoNode):
         super().onUnmarkedInvalid()
         self.update_ui()
 
-    def onMarkedDirty(self):
-        super().onMarkedDirty()
-        self.eval()
+    def onEvaluated(self):
+        super().onEvaluated()
         self.update_ui()
 
     def create_settings_widget(self):
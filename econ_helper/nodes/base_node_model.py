@@ -0,0 +1,52 @@
+from econ_helper.eh_cache import joint_fingerprint, result_key
+from econ_helper.nodes.base_node_inout import *
+from nodeeditor.node_node import SOCKET_TYPE_MODEL
+
+
+class BaseModelNode(BaseInOutNode):
+    """ Applies the fitted model on the second input to the frame on the first one
+
+    The kernel is chosen from kernels.MODEL_KERNELS by op_code. The model is
+    not fitted again, a new frame or new settings only run the kernel.
+    """
+
+    def __init__(self, scene, default_node_text=None):
+        self.model = None
+
+        super().__init__(scene, default_node_text, inputs=[SOCKET_TYPE_DF, SOCKET_TYPE_MODEL])
+
+    def get_model(self):
+        """ The fitted model on the model input, None if there is none """
+        model, socket_type = self.get_guarded_input(1)
+        if socket_type is not SOCKET_TYPE_MODEL or not isinstance(model, kernels.LinearModel):
+            return None
+        return model
+
+    def forget_inputs(self):
+        super().forget_inputs()
+        self.model = None
+
+    def prepare_operation(self, df):
+        params = self.read_params(df)
+        self.store_params(params)
+
+        self.model = self.get_model()
+        error = kernels.validate_model(self.model, params, df)
+        if error is not None:
+            logging.debug(f'{self.__class__.__name__}: {error}')
+            return None
+
+        return partial(kernels.MODEL_KERNELS[self.op_code], model=self.model, params=params)
+
+    def operation_key(self, operation, idx=0):
+        params = getattr(operation, 'keywords', {}).get('params')
+        if params is None:
+            return None
+        return result_key(self.op_code, params,
+                          joint_fingerprint(self.get_input_fingerprint(0), self.get_input_fingerprint(1)))
+
+    def update_ui(self):
+        if self.input_value is None:
+            self.markInvalid(error_message='Input is not connected')
+        elif self.model is None:
+            self.markInvalid(error_message='Connect a fitted model')
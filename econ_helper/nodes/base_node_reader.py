@@ -0,0 +1,253 @@
+import os
+import traceback
+from collections import OrderedDict
+from functools import partial
+
+from econ_helper import eh_batch, kernels
+from econ_helper.eh_cache import file_fingerprint, result_key
+from econ_helper.eh_conf import *
+from econ_helper.eh_node_base import *
+from econ_helper.pandas_model import PandasModel, adjust_column_widths
+from nodeeditor.node_node import SOCKET_TYPE_DF
+from nodeeditor.utils import dumpException
+
+
+class ReaderContent(QDMNodeContentWidget):
+    def initUI(self):
+        self.edit = QPlainTextEdit(self.node.op_title, self)
+        self.edit.setReadOnly(True)
+        self.edit.setObjectName(self.node.content_label_objname)
+
+    def serialize(self):
+        res = super().serialize()
+        res['value'] = self.edit.toPlainText()
+        return res
+
+    def deserialize(self, data, hashmap={}):
+        res = super().deserialize(data, hashmap)
+        try:
+            value = data['value']
+            self.edit.setPlainText(value)
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
+
+
+class BaseReaderNode(EcoNode):
+    """ Data source reading a file with one of kernels.READERS, chosen by op_code
+
+    Unlike Read XLS the data is not saved with the graph, the file is read
+    again when the graph is loaded.
+    """
+    file_filter = 'All files (*)'
+
+    def __init__(self, scene):
+        self.filename = None
+        self.pending_params = None
+        self.loaded_params = None
+
+        self.buttonSelectFile = QPushButton('Source file')
+
+        self.labelFileName = QLabel('File name')
+        self.labelFileName.setVisible(False)
+
+        self.checkProjection = QCheckBox('Read only the columns used downstream')
+        self.checkProjection.setToolTip('Columns are taken from the nodes configured when the file is read')
+        self.checkMemoryMap = QCheckBox('Memory map the file')
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, inputs=[], outputs=[SOCKET_TYPE_DF])
+
+    def initInnerClasses(self):
+        self.content = ReaderContent(self)
+        self.grNode = EcoGraphicsNode(self)
+
+    def onoff_signals(self, activate=True):
+        if activate:
+            self.buttonSelectFile.clicked.connect(self.buttonSelectFileClicked)
+            self.checkProjection.toggled.connect(self.settingsChanged)
+            self.checkMemoryMap.toggled.connect(self.settingsChanged)
+        else:
+            self.buttonSelectFile.clicked.disconnect(self.buttonSelectFileClicked)
+            self.checkProjection.toggled.disconnect(self.settingsChanged)
+            self.checkMemoryMap.toggled.disconnect(self.settingsChanged)
+
+    def adjust_table_width(self):
+        if self.table is None:
+            return
+        adjust_column_widths(self.table, self.column_widths)
+
+    def projection_state(self):
+        """ Settings of this node and of the nodes reading its output, see eh_batch.consumed_columns
+
+        Only these nodes are serialized, the data of other sources is not
+        encoded. None when a descendant is not a kernel node, all columns are
+        read then.
+        """
+        nodes, edges = OrderedDict(), OrderedDict()
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            if node.id in nodes:
+                continue
+            op_code = getattr(node, 'op_code', None)
+            if node is not self and op_code not in eh_batch.PARAMS and op_code not in eh_batch.SKIPPED:
+                return None
+            nodes[node.id] = node
+            for socket in node.outputs:
+                for edge in socket.edges:
+                    edges[edge.id] = edge
+                    pending.append(edge.getOtherSocket(socket).node)
+            # a model is applied to the columns it was fitted on
+            for socket in node.inputs[1:]:
+                for edge in socket.edges:
+                    parent = edge.getOtherSocket(socket).node
+                    if getattr(parent, 'op_code', None) in eh_batch.PARAMS:
+                        nodes.setdefault(parent.id, parent)
+                        edges[edge.id] = edge
+
+        return {'nodes': [node.serialize() for node in nodes.values()],
+                'edges': [edge.serialize() for edge in edges.values()]}
+
+    def current_params(self):
+        columns = None
+        if self.checkProjection.isChecked():
+            state = self.projection_state()
+            if state is not None:
+                columns = eh_batch.consumed_columns(eh_batch.parse_graph(state), self.id)
+        return kernels.ReadParams(self.filename, columns, self.checkMemoryMap.isChecked())
+
+    def evalImplementation(self):
+        if self.filename is None:
+            self.markInvalid(error_message='Select source file')
+            return None
+
+        params = self.current_params()
+        if self.output_value is not None and params == self.loaded_params:
+            self.show_output()
+            return self.output_value
+
+        self.labelFileName.setText(f'Loading {os.path.basename(self.filename)}...')
+        self.labelFileName.setVisible(True)
+        try:
+            cache_key = result_key(self.op_code, params, file_fingerprint(self.filename))
+        except OSError as e:
+            self.on_operation_error(e)
+            return None
+
+        self.pending_params = params
+        self.submit_operation(partial(kernels.READERS[self.op_code], params=params), cache_key=cache_key)
+        return None
+
+    def on_operation_result(self, frame):
+        self.output_value = frame
+        self.loaded_params = self.pending_params
+        self.show_output()
+
+        # descendants waiting for the data are evaluated now
+        self.scene.controller.scene_changed()
+
+    def on_operation_error(self, e):
+        logging.error(e)
+        traceback.print_tb(e.__traceback__)
+        self.output_value = None
+        self.loaded_params = None
+        self.labelFileName.setText(f'Failed to read {os.path.basename(self.filename)}')
+        self.markInvalid(error_message=str(e))
+        self.grNode.setToolTip(str(e))
+
+    def show_output(self):
+        self.refresh_output_widget()
+
+        self.markDirty(False)
+        self.markInvalid(False)
+        self.markDescendantsInvalid(False)
+        self.markChildrenDirty()
+
+        self.grNode.setToolTip("")
+        self.update_ui()
+
+    def update_output_widget(self):
+        self.dataModel = PandasModel(self.output_value)
+        self.table.setModel(self.dataModel)
+        self.adjust_table_width()
+        self.table.show()
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        if self.filename is not None:
+            self.labelFileName.setText(f'File name: {os.path.basename(self.filename)}')
+            self.labelFileName.setVisible(True)
+            self.content.edit.setPlainText(f'{self.op_title}\n{os.path.basename(self.filename)}')
+
+        self.onoff_signals(activate=True)
+
+    def buttonSelectFileClicked(self):
+        fname = QFileDialog.getOpenFileName(None, 'Open file', '.', self.file_filter)
+        if fname[0]:
+            self.filename = fname[0]
+            self.markDirty()
+            self.eval()
+
+    def settingsChanged(self):
+        if self.filename is None:
+            return
+        self.markDirty()
+        self.eval()
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+        lo.addWidget(QLabel(f'{self.title} settings'))
+
+        lo.addWidget(self.buttonSelectFile)
+        lo.addWidget(self.labelFileName)
+        lo.addWidget(self.checkProjection)
+        lo.addWidget(self.checkMemoryMap)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+        return w
+
+    def create_output_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+        lo.addWidget(QLabel(f'{self.title} output'))
+
+        self.table = QTableView()
+        self.dataModel = PandasModel()
+        self.table.setModel(self.dataModel)
+
+        lo.addWidget(self.table)
+
+        w.setLayout(lo)
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['filename'] = self.filename
+        res['projection'] = self.checkProjection.isChecked()
+        res['memory_map'] = self.checkMemoryMap.isChecked()
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.filename = data['filename']
+
+            self.onoff_signals(activate=False)
+            self.checkProjection.setChecked(data.get('projection', False))
+            self.checkMemoryMap.setChecked(data.get('memory_map', False))
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
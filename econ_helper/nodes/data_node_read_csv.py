@@ -0,0 +1,12 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_reader import *
+
+
+@register_node('read_csv', NODE_TYPE_DATA_SOURCE)
+class Node_ReadCsv(BaseReaderNode):
+    op_code = 'read_csv'
+    type_code = NODE_TYPE_DATA_SOURCE
+    op_title = 'Read CSV'
+    content_label_objname = 'node_read_csv'
+
+    file_filter = 'CSV files (*.csv *.txt);;All files (*)'
@@ -0,0 +1,12 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_reader import *
+
+
+@register_node('read_feather', NODE_TYPE_DATA_SOURCE)
+class Node_ReadFeather(BaseReaderNode):
+    op_code = 'read_feather'
+    type_code = NODE_TYPE_DATA_SOURCE
+    op_title = 'Read Feather / Arrow'
+    content_label_objname = 'node_read_feather'
+
+    file_filter = 'Feather / Arrow IPC files (*.feather *.arrow *.ipc);;All files (*)'
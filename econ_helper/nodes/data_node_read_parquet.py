@@ -0,0 +1,12 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_reader import *
+
+
+@register_node('read_parquet', NODE_TYPE_DATA_SOURCE)
+class Node_ReadParquet(BaseReaderNode):
+    op_code = 'read_parquet'
+    type_code = NODE_TYPE_DATA_SOURCE
+    op_title = 'Read Parquet'
+    content_label_objname = 'node_read_parquet'
+
+    file_filter = 'Parquet files (*.parquet *.pq);;All files (*)'
@@ -1,10 +1,14 @@
 import os
+import traceback
+from collections import OrderedDict
 
 import pandas as pd
 
+from econ_helper import kernels
+from econ_helper.eh_cache import fingerprint_frame
 from econ_helper.eh_conf import *
 from econ_helper.eh_node_base import *
-from econ_helper.pandas_model import PandasModel
+from econ_helper.pandas_model import PandasModel, adjust_column_widths
 from nodeeditor.node_node import SOCKET_TYPE_DF
 from nodeeditor.utils import dumpException
 
@@ -41,11 +45,19 @@ class Node_ReadXls(EcoNode):
     op_title = 'Read XLS'
     content_label_objname = 'node_read_xls'
 
+    # parsed sheets kept in memory, sheets are parsed when they are selected
+    max_loaded_sheets = 4
+
     def __init__(self, scene):
-        self.data = {}
+        self.data = OrderedDict()
+        # {page: key in scene.datasets} of the sheets hashed so far, see dataset_refs
+        self.data_refs = {}
+        self.workbook = None
+        self.sheet_names = None
         self.current_page = None
         self.output_value = None
         self.data_filename = None
+        self.pending_filename = None
 
         self.buttonSelectFile = QPushButton('Source file')
 
@@ -73,20 +85,11 @@ class Node_ReadXls(EcoNode):
     def adjustTableWidth(self):
         if self.table is None:
             return
-        header = self.table.horizontalHeader()
-        for column in range(header.count()):
-            header.setSectionResizeMode(column, QHeaderView.ResizeToContents)
-            width = header.sectionSize(column)
-            header.setSectionResizeMode(column, QHeaderView.Interactive)
-            header.resizeSection(column, width)
+        adjust_column_widths(self.table, self.column_widths)
 
     def evalImplementation(self):
         if self.output_value is not None:
-            self.dataModel = PandasModel(self.output_value)
-            self.table.setModel(self.dataModel)
-            self.adjustTableWidth()
-
-            self.table.show()
+            self.refresh_output_widget()
 
             self.markDirty(False)
             self.markInvalid(False)
@@ -103,6 +106,13 @@ class Node_ReadXls(EcoNode):
 
         return self.output_value
 
+    def update_output_widget(self):
+        self.dataModel = PandasModel(self.output_value)
+        self.table.setModel(self.dataModel)
+        self.adjustTableWidth()
+
+        self.table.show()
+
     def onoff_signals(self, activate=True):
         if activate:
             self.buttonSelectFile.clicked.connect(self.buttonSelectFileClicked)
@@ -119,7 +129,7 @@ class Node_ReadXls(EcoNode):
             self.labelFileName.setText(f'File name: {self.data_filename}')
             self.labelFileName.setVisible(True)
 
-        pages = self.data.keys()
+        pages = self.pages()
         self.dropSelectPage.clear()
         self.dropSelectPage.addItems(pages)
 
@@ -138,6 +148,56 @@ class Node_ReadXls(EcoNode):
         #
         # self.eval()
         # self.evalChildren()
+    def update_ui(self):
+        self.update_ui_on_data()
+
+    def pages(self):
+        """ Sheets of the source, the ones not parsed yet included """
+        if self.sheet_names is not None:
+            return list(self.sheet_names)
+        return list(self.data.keys()) + [page for page in self.data_refs if page not in self.data]
+
+    def stored_sheet(self, page):
+        """ The parsed sheet, from memory or from scene.datasets, None if it was never parsed """
+        if page in self.data:
+            return self.data[page]
+        if page in self.data_refs:
+            return self.scene.datasets.get(self.data_refs[page])
+        return None
+
+    def sheet_ref(self, page, frame):
+        """ Key of the sheet in scene.datasets, the sheet is hashed once """
+        key = self.data_refs.get(page)
+        if key is None:
+            key = fingerprint_frame(frame) or f'object-{id(frame)}'
+            self.data_refs[page] = key
+        if key not in self.scene.datasets:
+            self.scene.datasets.put(key, frame)
+        return key
+
+    def keep_sheet(self, page, frame):
+        self.data[page] = frame
+        self.data.move_to_end(page)
+        for old_page in list(self.data.keys()):
+            if len(self.data) <= self.max_loaded_sheets:
+                break
+            if old_page != page:
+                # scene.datasets keeps the sheet for the undo history and the saved file
+                self.sheet_ref(old_page, self.data[old_page])
+                del self.data[old_page]
+
+    def gather_data(self):
+        """ Parses the sheets that were never loaded, so that the saved file holds the whole workbook """
+        if self.workbook is None or self.sheet_names is None:
+            return
+        for page in self.sheet_names:
+            if page in self.data or page in self.data_refs:
+                continue
+            try:
+                self.sheet_ref(page, kernels.read_excel_sheet(self.workbook, page))
+            except Exception as e:
+                logging.warning(f'sheet {page} of {self.workbook} is not saved: {e}')
+
     def onMarkedDirty(self):
         pass
         # print(f'{self.__class__.__name__} marked dirty')
@@ -147,46 +207,76 @@ class Node_ReadXls(EcoNode):
     def buttonSelectFileClicked(self):
         fname = QFileDialog.getOpenFileName(None, 'Open file', '.')
         if fname[0]:
-            try:
-                xlsdata = pd.ExcelFile(fname[0])
-                for sheet in xlsdata.sheet_names:
-                    self.data[sheet] = xlsdata.parse(sheet)
+            self.labelFileName.setText(f'Loading {os.path.basename(fname[0])}...')
+            self.labelFileName.setVisible(True)
+            # only the sheet list and the first sheet are read, off the GUI thread
+            self.submit_operation(kernels.read_workbook, fname[0])
+            self.pending_filename = fname[0]
+
+    def on_operation_result(self, workbook):
+        if workbook.filename == self.pending_filename:
+            # a new file, the sheets parsed from the previous one are dropped
+            self.pending_filename = None
+            self.workbook = workbook.filename
+            self.sheet_names = workbook.sheet_names
+            self.data = OrderedDict()
+            self.data_refs = {}
+            self.data_filename = os.path.basename(workbook.filename)
+        elif workbook.filename != self.workbook:
+            return
 
-                self.data_filename = os.path.basename(fname[0])
-                self.labelFileName.setText(f'File name: {self.data_filename}')
-                self.labelFileName.setVisible(True)
+        self.keep_sheet(workbook.sheet, workbook.frame)
+        self.current_page = workbook.sheet
+        self.output_value = workbook.frame
 
-                self.dropSelectPage.addItems(self.data.keys())
-                self.dropSelectPage.setVisible(True)
+        self.labelFileName.setText(f'File name: {self.data_filename}')
+        self.labelFileName.setVisible(True)
+        self.update_ui_on_data()
 
-                self.current_page = list(self.data.keys())[0]
-                self.output_value = self.data[self.current_page]
+        #for c in self.output_value.columns:
+        #    print(c, self.output_value[c].dtype)
 
-                #for c in self.output_value.columns:
-                #    print(c, self.output_value[c].dtype)
+        self.markDirty()
+        #self.markDescendantsDirty()
+        self.eval()
+
+    def on_operation_error(self, e):
+        logging.error(e)
+        traceback.print_tb(e.__traceback__)
+        if self.pending_filename is None and self.workbook is not None:
+            # a sheet failed to parse, the output stays on the current one
+            self.update_ui_on_data()
+            return
 
-                self.markDirty()
-                #self.markDescendantsDirty()
-                self.eval()
-            except Exception as e:
-                self.markInvalid()
-                #self.content = None
-                self.data = {}
-                self.data_filename = None
-                self.dropSelectPage.setVisible(False)
-                self.labelFileName.setVisible(False)
-                raise
+        self.markInvalid()
+        #self.content = None
+        self.data = OrderedDict()
+        self.data_refs = {}
+        self.workbook = None
+        self.sheet_names = None
+        self.pending_filename = None
+        self.data_filename = None
+        self.dropSelectPage.setVisible(False)
+        self.labelFileName.setVisible(False)
 
     def dropSelectChanged(self):
         if self.data is None:
             return
-        previous_page = self.current_page
-        self.current_page = self.dropSelectPage.currentText()
-        if previous_page == self.current_page:
+        page = self.dropSelectPage.currentText()
+        if page == self.current_page or page == '':
             #nothing changed
             return
 
-        self.output_value = self.data[self.current_page]
+        frame = self.stored_sheet(page)
+        if frame is None:
+            if self.workbook is not None:
+                self.labelFileName.setText(f'Loading sheet {page}...')
+                self.submit_operation(kernels.read_workbook, self.workbook, page)
+            return
+
+        self.current_page = page
+        self.output_value = frame
+        self.keep_sheet(page, frame)
         self.update_ui_on_data()
 
         self.markDirty()
@@ -234,33 +324,78 @@ class Node_ReadXls(EcoNode):
         self.update_ui_on_data()
         return w
 
-    def serialize(self):
+    def serialize_settings(self):
         res = super().serialize()
 
         res['filename'] = self.data_filename
         res['current_page'] = self.dropSelectPage.currentText()
+        # the sheets that are not saved can be parsed again
+        res['workbook'] = self.workbook
+        res['sheet_names'] = self.sheet_names
+        return res
+
+    def serialize(self):
+        res = self.serialize_settings()
+
         serialized_data = {}
-        for page in self.data.keys():
-            serialized_data[page] = self.data[page].to_json(orient='table')
+        for page in self.pages():
+            frame = self.stored_sheet(page)
+            if frame is not None:
+                serialized_data[page] = frame.to_json(orient='table')
         res['json_value'] = serialized_data
 
         return res
 
+    def dataset_refs(self):
+        """ {page: key in scene.datasets} of the parsed sheets, every sheet is hashed once
+
+        Sheets dropped from memory are there as long as the store has them.
+        """
+        refs = {}
+        for page in self.pages():
+            if page in self.data:
+                refs[page] = self.sheet_ref(page, self.data[page])
+            elif page in self.data_refs and self.data_refs[page] in self.scene.datasets:
+                refs[page] = self.data_refs[page]
+        self.data_refs = refs
+        return refs
+
+    def serializeState(self):
+        res = self.serialize_settings()
+        res['dataset_refs'] = dict(self.dataset_refs())
+        return res
+
     def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
         res = super().deserialize(data, hashmap)
         try:
             self.data_filename = data['filename']
             self.current_page = data['current_page']
-            serialized_data = data['json_value']
-            for k in serialized_data.keys():
-                self.data[k] = pd.read_json(serialized_data[k], orient='table')
-
-            first_key = list(self.data.keys())[0]
-            self.output_value = self.data[self.current_page] if self.current_page in self.data else self.data[first_key]
+            # sheets that were not saved are parsed from the workbook when they are selected
+            self.workbook = data.get('workbook')
+            self.sheet_names = data.get('sheet_names')
+            self.data = OrderedDict()
+            self.data_refs = {}
+            if 'dataset_refs' in data:
+                # undo/redo or a project file, sheets are loaded when they are shown
+                self.data_refs = dict(data['dataset_refs'])
+            else:
+                serialized_data = data['json_value']
+                for k in serialized_data.keys():
+                    self.data[k] = pd.read_json(serialized_data[k], orient='table')
+
+            saved = list(self.data.keys()) + list(self.data_refs.keys())
+            page = self.current_page if self.current_page in saved else saved[0]
+            self.output_value = self.stored_sheet(page)
+            if self.output_value is not None:
+                self.keep_sheet(page, self.output_value)
+            key = self.data_refs.get(page)
+            if key is not None and not key.startswith('object-'):
+                # the content hash is known already
+                self.output_fingerprint, self._fingerprinted_value = key, self.output_value
 
             #self.update_ui_on_data()
 
             return True & res
         except Exception as e:
             dumpException(e)
-        return res
\ No newline at end of file
+        return res
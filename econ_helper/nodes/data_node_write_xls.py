@@ -2,7 +2,7 @@ from econ_helper.eh_node_base import *
 from econ_helper.eh_conf import *
 from nodeeditor.node_node import SOCKET_TYPE_DF
 from nodeeditor.utils import dumpException
-from econ_helper.pandas_model import PandasModel
+from econ_helper.pandas_model import PandasModel, adjust_column_widths
 
 import os
 import pandas as pd
@@ -67,12 +67,7 @@ class Node_WriteXls(EcoNode):
     def adjust_table_width(self):
         if self.table is None:
             return
-        header = self.table.horizontalHeader()
-        for column in range(header.count()):
-            header.setSectionResizeMode(column, QHeaderView.ResizeToContents)
-            width = header.sectionSize(column)
-            header.setSectionResizeMode(column, QHeaderView.Interactive)
-            header.resizeSection(column, width)
+        adjust_column_widths(self.table, self.column_widths)
 
 
 
@@ -94,10 +89,7 @@ class Node_WriteXls(EcoNode):
         #print(f'Main node op done for node {self.__class__.__name__}')
 
         if self.output_value is not None:
-            self.dataModel = PandasModel(self.output_value)
-            self.table.setModel(self.dataModel)
-            self.adjust_table_width()
-            self.table.show()
+            self.refresh_output_widget()
 
             self.markDirty(False)
             self.markInvalid(False)
@@ -106,6 +98,12 @@ class Node_WriteXls(EcoNode):
 
         return self.output_value
 
+    def update_output_widget(self):
+        self.dataModel = PandasModel(self.output_value)
+        self.table.setModel(self.dataModel)
+        self.adjust_table_width()
+        self.table.show()
+
     def buttonSelectFileClicked(self):
         # TODO: save instantly
         # (now its saved only after explicit button click)
@@ -0,0 +1,90 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_model import *
+
+BASELINE_NAMES = ['Zero', 'Mean of the input']
+
+
+@register_node('decompose', NODE_TYPE_ECO)
+class Node_Decompose(BaseModelNode):
+    """ Contribution of every regressor of a fitted model to its prediction, see kernels.decomposition """
+    op_code = 'decompose'
+    type_code = NODE_TYPE_ECO
+    op_title = 'Decompose'
+    content_label_objname = 'node_decompose'
+
+    def __init__(self, scene, default_node_text='Contributions to'):
+        self.baseline = 'zero'
+
+        #GUI
+        self.labelBaseline = QLabel('Contributions measured from')
+        self.baselineControl = QComboBox()
+        self.baselineControl.addItems(BASELINE_NAMES)
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, default_node_text)
+
+    def onoff_signals(self, activate=True):
+        if activate:
+            self.baselineControl.currentIndexChanged.connect(self.settingsChanged)
+        else:
+            self.baselineControl.currentIndexChanged.disconnect(self.settingsChanged)
+
+    def read_params(self, df):
+        return kernels.DecomposeParams(kernels.DECOMPOSE_BASES[self.baselineControl.currentIndex()])
+
+    def store_params(self, params):
+        self.baseline = params.baseline
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        super().update_ui()
+        self.baselineControl.setCurrentIndex(kernels.DECOMPOSE_BASES.index(self.baseline))
+
+        if not self.isInvalid():
+            new_text = f'{self.content.default_node_text} {self.model.target}\n' \
+                       f'{len(self.model.factors)} regressors'
+            self.content.edit.setText(new_text)
+
+        self.onoff_signals(activate=True)
+
+    def settingsChanged(self):
+        self.markInvalid()
+        self.eval()
+        self.update_ui()
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+
+        lo.addWidget(self.labelBaseline)
+        lo.addWidget(self.baselineControl)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['baseline'] = self.baseline
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.baseline = data.get('baseline', 'zero')
+
+            self.onoff_signals(activate=False)
+            self.baselineControl.setCurrentIndex(kernels.DECOMPOSE_BASES.index(self.baseline))
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
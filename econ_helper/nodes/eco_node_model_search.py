@@ -0,0 +1,197 @@
+from functools import partial
+
+from econ_helper.eh_conf import *
+from econ_helper.eh_executor import get_executor
+from econ_helper.nodes.base_node_inout import *
+from pandas.api.types import is_numeric_dtype
+
+STRATEGY_NAMES = ['Forward stepwise', 'Backward stepwise', 'Best subset']
+CRITERION_NAMES = ['AIC', 'BIC', 'Adjusted R squared']
+
+
+@register_node('model_search', NODE_TYPE_ECO)
+class Node_ModelSearch(BaseInOutNode):
+    """ Leaderboard of regressions of the target over subsets of the candidates, see kernels.model_search """
+    op_code = 'model_search'
+    type_code = NODE_TYPE_ECO
+    op_title = 'Model Search'
+    content_label_objname = 'node_model_search'
+
+    def __init__(self, scene, default_node_text='Model search'):
+        self.target_column = None
+        self.candidates = []
+        self.strategy = 'forward'
+        self.criterion = 'aic'
+        self.max_factors = 5
+        self.top = 20
+
+        #GUI
+        self.labelTarget = QLabel('Target column')
+        self.targetColumn = QComboBox()
+
+        self.labelCandidates = QLabel('Candidate regressors')
+        self.candidateList = QListWidget()
+
+        self.labelStrategy = QLabel('Search')
+        self.strategyControl = QComboBox()
+        self.strategyControl.addItems(STRATEGY_NAMES)
+        self.labelCriterion = QLabel('Ranked by')
+        self.criterionControl = QComboBox()
+        self.criterionControl.addItems(CRITERION_NAMES)
+
+        self.labelMaxFactors = QLabel('Most regressors in a model')
+        self.maxFactorsControl = QSpinBox()
+        self.maxFactorsControl.setMinimum(1)
+        self.maxFactorsControl.setMaximum(999)
+        self.maxFactorsControl.setValue(self.max_factors)
+        self.labelTop = QLabel('Models in the leaderboard')
+        self.topControl = QSpinBox()
+        self.topControl.setMinimum(1)
+        self.topControl.setMaximum(10000)
+        self.topControl.setValue(self.top)
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, default_node_text)
+
+    def onoff_signals(self, activate=True):
+        signals = [self.targetColumn.currentIndexChanged, self.candidateList.itemChanged,
+                   self.strategyControl.currentIndexChanged, self.criterionControl.currentIndexChanged,
+                   self.maxFactorsControl.valueChanged, self.topControl.valueChanged]
+        for signal in signals:
+            if activate:
+                signal.connect(self.settingsChanged)
+            else:
+                signal.disconnect(self.settingsChanged)
+
+    def read_params(self, df):
+        target = self.targetColumn.currentText()
+        if target == '' or target not in df.columns:
+            # widgets are populated after the first evaluation, use stored settings
+            target = self.target_column
+
+        candidates = [self.candidateList.item(i).text() for i in range(self.candidateList.count())
+                      if self.candidateList.item(i).checkState() == Qt.Checked]
+        if self.candidateList.count() == 0:
+            candidates = list(self.candidates)
+
+        return kernels.ModelSearchParams(target, tuple(candidates),
+                                         kernels.SEARCH_STRATEGIES[self.strategyControl.currentIndex()],
+                                         kernels.SEARCH_CRITERIA[self.criterionControl.currentIndex()],
+                                         self.maxFactorsControl.value(), self.topControl.value())
+
+    def store_params(self, params):
+        self.target_column = params.target_column
+        self.candidates = list(params.candidates)
+        self.strategy = params.strategy
+        self.criterion = params.criterion
+        self.max_factors = params.max_factors
+        self.top = params.top
+
+    def prepare_operation(self, df):
+        operation = super().prepare_operation(df)
+        if operation is None or self.strategy != 'best_subset':
+            return operation
+        # the branches of a large search go to the worker processes
+        return partial(operation, pool=get_executor().get_process_pool())
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        self.targetColumn.clear()
+        self.candidateList.clear()
+        if self.input_value is not None:
+            dtypes = self.input_value.dtypes
+            numeric = [c for c in self.input_value.columns if is_numeric_dtype(dtypes[c])]
+            self.targetColumn.addItems(numeric)
+            for column in numeric:
+                if column == self.target_column:
+                    continue
+                self.candidateList.addItem(column)
+                w = self.candidateList.item(self.candidateList.count() - 1)
+                w.setFlags(w.flags() | Qt.ItemIsUserCheckable)
+                w.setCheckState(Qt.Checked if column in self.candidates else Qt.Unchecked)
+        else:
+            self.markInvalid(error_message='Input is not connected')
+
+        self.targetColumn.setCurrentIndex(-1)
+        if self.target_column is not None:
+            self.targetColumn.setCurrentIndex(self.targetColumn.findText(self.target_column, Qt.MatchExactly))
+        else:
+            self.markInvalid(error_message='Select target column')
+
+        self.strategyControl.setCurrentIndex(kernels.SEARCH_STRATEGIES.index(self.strategy))
+        self.criterionControl.setCurrentIndex(kernels.SEARCH_CRITERIA.index(self.criterion))
+        self.maxFactorsControl.setValue(self.max_factors)
+        self.topControl.setValue(self.top)
+
+        if not self.isInvalid():
+            new_text = f'{self.content.default_node_text} for {self.target_column}\n' \
+                       f'{STRATEGY_NAMES[self.strategyControl.currentIndex()]}, ' \
+                       f'{len(self.candidates)} candidates'
+            self.content.edit.setText(new_text)
+
+        self.onoff_signals(activate=True)
+
+    def settingsChanged(self):
+        self.markInvalid()
+        self.eval()
+        self.update_ui()
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+
+        lo.addWidget(self.labelTarget)
+        lo.addWidget(self.targetColumn)
+        lo.addWidget(self.labelCandidates)
+        lo.addWidget(self.candidateList)
+        lo.addWidget(self.labelStrategy)
+        lo.addWidget(self.strategyControl)
+        lo.addWidget(self.labelCriterion)
+        lo.addWidget(self.criterionControl)
+        lo.addWidget(self.labelMaxFactors)
+        lo.addWidget(self.maxFactorsControl)
+        lo.addWidget(self.labelTop)
+        lo.addWidget(self.topControl)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['target_column'] = self.target_column
+        res['candidates'] = self.candidates
+        res['strategy'] = self.strategy
+        res['criterion'] = self.criterion
+        res['max_factors'] = self.max_factors
+        res['top'] = self.top
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.target_column = data['target_column']
+            self.candidates = data['candidates']
+            self.strategy = data.get('strategy', 'forward')
+            self.criterion = data.get('criterion', 'aic')
+            self.max_factors = data.get('max_factors', 5)
+            self.top = data.get('top', 20)
+
+            self.onoff_signals(activate=False)
+            self.strategyControl.setCurrentIndex(kernels.SEARCH_STRATEGIES.index(self.strategy))
+            self.criterionControl.setCurrentIndex(kernels.SEARCH_CRITERIA.index(self.criterion))
+            self.maxFactorsControl.setValue(self.max_factors)
+            self.topControl.setValue(self.top)
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
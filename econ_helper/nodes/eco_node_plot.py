@@ -3,6 +3,7 @@ import traceback
 import pandas as pd
 import pyqtgraph as pg
 
+from econ_helper import kernels
 from econ_helper.eh_conf import *
 from econ_helper.eh_node_base import *
 from econ_helper.nodes.base_node_inout import BaseNodeContent
@@ -87,30 +88,36 @@ class Node_Plotter(EcoNode):
 
         self.onoff_signals(activate=True)
 
-    def main_node_operation(self, df):
-        if df is None or not isinstance(df, pd.DataFrame):
-            return None
-
-        real_input = self.input_value
-        if real_input is None:
-            return None
-
+    def read_params(self, df):
         currently_checked = []
         for i in range(self.plotList.count()):
             w = self.plotList.item(i)
             if w.checkState() == Qt.Checked:
                 currently_checked.append(w.text())
+        if self.plotList.count() == 0 and self.plot_columns is not None:
+            # widgets are populated after the first evaluation, use stored settings
+            currently_checked = list(self.plot_columns)
+        return kernels.PlotParams(currently_checked)
+
+    def main_node_operation(self, df):
+        if df is None or not isinstance(df, pd.DataFrame):
+            return None
 
-        if len(currently_checked) == 0 or set(currently_checked).isdisjoint(real_input.columns):
-            return None, None
+        params = self.read_params(df)
+        self.plot_columns = params.columns
+        if kernels.validate(params, df) is not None:
+            return None
 
-        self.plot_columns = currently_checked
+        data = kernels.plot_data(df, params)
+        self.update_ui()
+        return data
 
-        # sanity check
-        # here we additionally check if incoming dataframe has expected columns
-        # while it can be changed by parent node, keeping plot_columns unchanged yet
-        sanity_plot_columns = df.columns[df.columns.isin(self.plot_columns)]
+    def update_output_widget(self):
+        data = self.output_value
+        if data is None:
+            return
 
+        # drawing is bound to the GUI thread, only the data preparation is a kernel
         legend = self.plotArea.getPlotItem().legend
         if legend is not None:
             for item in legend.items:
@@ -123,22 +130,17 @@ class Node_Plotter(EcoNode):
 
         self.plotArea.plotItem.addLegend()
 
-        data = df[sanity_plot_columns].copy()
         for ind, c in enumerate(data.columns):
             item = pg.PlotDataItem(data[c], name=c, pen=pg.mkPen(pg.intColor(index=ind)))
 #            self.plotArea.plot(data[c], name=c, pen=pg.mkPen(pg.intColor(index=ind)))
             self.plotArea.addItem(item)
 
-        self.update_ui()
-        return data
-
     def onUnmarkedInvalid(self):
         super().onUnmarkedInvalid()
         self.update_ui()
 
-    def onMarkedDirty(self):
-        super().onMarkedDirty()
-        self.eval()
+    def onEvaluated(self):
+        super().onEvaluated()
         self.update_ui()
 
     def settingsChanged(self):
@@ -181,6 +183,8 @@ class Node_Plotter(EcoNode):
             self.input_value = input_value
             new_output_value = self.main_node_operation(self.input_value)
             self.output_value = new_output_value
+            if new_output_value is not None:
+                self.refresh_output_widget()
         except Exception as e:
             logging.error(e)
             traceback.print_tb(e.__traceback__)
@@ -0,0 +1,86 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_model import *
+
+
+@register_node('predict', NODE_TYPE_ECO)
+class Node_Predict(BaseModelNode):
+    """ Prediction of a fitted model for the rows of the input, see kernels.prediction """
+    op_code = 'predict'
+    type_code = NODE_TYPE_ECO
+    op_title = 'Predict'
+    content_label_objname = 'node_predict'
+
+    def __init__(self, scene, default_node_text='Prediction of'):
+        self.residuals = True
+
+        #GUI
+        self.checkResiduals = QCheckBox('Add residuals when the input has the target')
+        self.checkResiduals.setChecked(self.residuals)
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, default_node_text)
+
+    def onoff_signals(self, activate=True):
+        if activate:
+            self.checkResiduals.toggled.connect(self.settingsChanged)
+        else:
+            self.checkResiduals.toggled.disconnect(self.settingsChanged)
+
+    def read_params(self, df):
+        return kernels.PredictParams(self.checkResiduals.isChecked())
+
+    def store_params(self, params):
+        self.residuals = params.residuals
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        super().update_ui()
+        self.checkResiduals.setChecked(self.residuals)
+
+        if not self.isInvalid():
+            new_text = f'{self.content.default_node_text} {self.model.target}\n' \
+                       f'{len(self.model.factors)} regressors'
+            self.content.edit.setText(new_text)
+
+        self.onoff_signals(activate=True)
+
+    def settingsChanged(self):
+        self.markInvalid()
+        self.eval()
+        self.update_ui()
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+
+        lo.addWidget(self.checkResiduals)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['residuals'] = self.residuals
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.residuals = data.get('residuals', True)
+
+            self.onoff_signals(activate=False)
+            self.checkResiduals.setChecked(self.residuals)
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
@@ -1,16 +1,18 @@
-import numpy as np
+from functools import partial
+
 import pandas as pd
 import pyqtgraph as pg
+from pandas.api.types import is_numeric_dtype
 
+from econ_helper import kernels
 from econ_helper.eh_conf import *
 from econ_helper.eh_node_base import *
 from econ_helper.nodes.base_node_inout import BaseNodeContent
 from nodeeditor.node_content_widget import ImprovedPlainTextEdit
 from nodeeditor.node_node import SOCKET_TYPE_DF, SOCKET_TYPE_MODEL
+from nodeeditor.node_socket import Socket
 from nodeeditor.utils import dumpException
 
-from sklearn.tree import DecisionTreeRegressor
-
 
 @register_node('regression', NODE_TYPE_ECO)
 class Node_Regression(EcoNode):
@@ -25,6 +27,13 @@ class Node_Regression(EcoNode):
 
         self.target_column = None
         self.factors = []
+        self.method = 'ols'
+        self.alpha = 1.0
+        self.result = None
+        # gram of the last fit and the fingerprint of its input, other factor selections are fitted from it
+        self.gram = None
+        self.gram_input = None
+        self.pending_gram_input = None
 
         self.labelTarget = QLabel('Target column')
         self.targetColumn = QComboBox()
@@ -32,13 +41,22 @@ class Node_Regression(EcoNode):
         self.labelFactors = QLabel('Regressors')
         self.factorList = QListWidget()
 
+        self.labelMethod = QLabel('Method')
+        self.methodControl = QComboBox()
+        self.methodControl.addItems(['Least squares', 'Ridge', 'Non-negative least squares'])
+        self.labelAlpha = QLabel('Ridge alpha')
+        self.alphaControl = QDoubleSpinBox()
+        self.alphaControl.setDecimals(4)
+        self.alphaControl.setMaximum(1e12)
+        self.alphaControl.setValue(self.alpha)
+
         self.outputArea = ImprovedPlainTextEdit()
         self.plotArea = pg.PlotWidget()
         self.plotArea.getPlotItem().setMenuEnabled(False)
 
         self.onoff_signals(activate=True)
 
-        super().__init__(scene, inputs=[SOCKET_TYPE_DF], outputs=[])
+        super().__init__(scene, inputs=[SOCKET_TYPE_DF], outputs=[SOCKET_TYPE_MODEL])
 
     def initInnerClasses(self):
         self.content = BaseNodeContent(self)
@@ -50,9 +68,13 @@ class Node_Regression(EcoNode):
         if activate:
             self.factorList.itemChanged.connect(self.settingsChanged)
             self.targetColumn.currentIndexChanged.connect(self.settingsChanged)
+            self.methodControl.currentIndexChanged.connect(self.settingsChanged)
+            self.alphaControl.valueChanged.connect(self.settingsChanged)
         else:
             self.factorList.itemChanged.disconnect(self.settingsChanged)
             self.targetColumn.currentIndexChanged.disconnect(self.settingsChanged)
+            self.methodControl.currentIndexChanged.disconnect(self.settingsChanged)
+            self.alphaControl.valueChanged.disconnect(self.settingsChanged)
 
     def update_ui(self):
         self.onoff_signals(activate=False)
@@ -77,11 +99,13 @@ class Node_Regression(EcoNode):
         if self.input_value is not None \
                 and column is not None \
                 and column in self.input_value.columns:
-            input_wo_target = self.input_value.drop(columns=[column])
-            self.factorList.addItems(input_wo_target)
+            dtypes = self.input_value.dtypes
+            self.factorList.addItems([c for c in self.input_value.columns if c != column])
             for i in range(self.factorList.count()):
                 w = self.factorList.item(i)
                 w.setFlags(w.flags() | Qt.ItemIsUserCheckable)
+                if not is_numeric_dtype(dtypes[w.text()]):
+                    w.setFlags(w.flags() & ~Qt.ItemIsEnabled)
                 w.setCheckState(Qt.Unchecked)
         else:
             self.markInvalid(error_message='Input is not valid')
@@ -101,6 +125,10 @@ class Node_Regression(EcoNode):
             if w.checkState() == Qt.Checked:
                 currently_checked.append(w.text())
 
+        self.methodControl.setCurrentIndex(kernels.REGRESSION_METHODS.index(self.method))
+        self.alphaControl.setValue(self.alpha)
+        self.alphaControl.setEnabled(self.method == 'ridge')
+
         if not self.isInvalid():
             new_text = self.content.default_node_text + ' ' + str(currently_checked)
             self.content.edit.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
@@ -108,70 +136,69 @@ class Node_Regression(EcoNode):
 
         self.onoff_signals(activate=True)
 
-    def model(self, X, y, constant=True, log_transform=False, verbose=True):
-        model = DecisionTreeRegressor().fit(X, y)
-        return model
-
-    def main_node_operation(self, df):
-        if df is None or not isinstance(df, pd.DataFrame):
-            return None
-
+    def read_params(self, df):
         y_column = self.targetColumn.currentText()
-        if y_column is None or y_column == '' \
-                or y_column not in df.columns \
-                or y_column not in self.input_value.columns:
-            return None, None
-
-        self.target_column = y_column
+        if y_column == '' or y_column not in df.columns:
+            # widgets are populated after the first evaluation, use stored settings
+            y_column = self.target_column
 
         currently_checked = []
         for i in range(self.factorList.count()):
             w = self.factorList.item(i)
             if w.checkState() == Qt.Checked:
                 currently_checked.append(w.text())
+        if self.factorList.count() == 0 and self.factors is not None:
+            currently_checked = list(self.factors)
 
-        if len(currently_checked) == 0 or set(currently_checked).isdisjoint(self.input_value.columns):
-            return None, None
+        return kernels.RegressionParams(y_column, currently_checked,
+                                        kernels.REGRESSION_METHODS[self.methodControl.currentIndex()],
+                                        self.alphaControl.value())
 
-        self.factors = currently_checked
+    def prepare_operation(self, df):
+        if df is None or not isinstance(df, pd.DataFrame):
+            return None
 
-        if self.target_column not in df.columns \
-                or self.factors is None:
-            return None, None
+        params = self.read_params(df)
+        self.target_column = params.target_column
+        self.factors = params.factors
+        self.method = params.method
+        self.alpha = params.alpha
 
-        # sanity check
-        # here we additionally check if incoming dataframe has expected columns
-        # while it can be changed by parent node, keeping factors unchanged yet
-        sanity_factors = df.columns[df.columns.isin(self.factors)]
+        if kernels.validate(params, df) is not None:
+            return None
 
-        y = df[self.target_column].copy()
-        data = df[sanity_factors].copy()
+        fingerprint = self.get_input_fingerprint(0)
+        self.pending_gram_input = fingerprint
+        if fingerprint is not None and fingerprint == self.gram_input:
+            # toggling a regressor only solves a submatrix of the gram
+            return partial(kernels.regression, params=params, gram=self.gram)
 
-        res_model = self.model(data, y)
-        importances = res_model.feature_importances_
-        indices = np.argsort(importances)[::-1]
-        output_text = "Feature ranking:\n\n"
-        for f in range(data.shape[1]):
-            output_text += f"{f+1}. feature {indices[f]} [{data.columns[indices[f]]}] ({importances[indices[f]]})\n"
+        # every numeric column may be selected next, the gram covers them all
+        candidates = [c for c in df.columns if c != params.target_column and is_numeric_dtype(df[c])]
+        return partial(kernels.regression, params=params, candidates=candidates)
 
-        self.outputArea.setText(f'{output_text}')
+    def update_output_widget(self):
+        if self.result is not None:
+            self.show_results(self.result)
 
-        pred = res_model.predict(data)
+    def show_results(self, result):
+        model = result.model
+        table = kernels.coefficient_table(result)
+        output_text = f'Target: {model.target}\nRows: {model.rows}\nR squared: {model.r2:.4f}\n\n'
+        output_text += table.to_string(index=False, float_format='{:,.4f}'.format, na_rep='')
 
-        self.plotArea.clear()
-        self.plotArea.plot(y, name='expected', pen=pg.mkPen('g', width=3))
-        self.plotArea.plot(pred, name='predicted', pen=pg.mkPen('y', width=3))
+        self.outputArea.setText(f'{output_text}')
 
-        self.update_ui()
-        return res_model, data
+        self.plotArea.clear()
+        self.plotArea.plot(result.y.to_numpy(dtype=float), name='expected', pen=pg.mkPen('g', width=3))
+        self.plotArea.plot(result.pred, name='predicted', pen=pg.mkPen('y', width=3))
 
     def onUnmarkedInvalid(self):
         super().onUnmarkedInvalid()
         self.update_ui()
 
-    def onMarkedDirty(self):
-        super().onMarkedDirty()
-        self.eval()
+    def onEvaluated(self):
+        super().onEvaluated()
         self.update_ui()
 
     def settingsChanged(self):
@@ -215,13 +242,29 @@ class Node_Regression(EcoNode):
             self.markInvalid(error_message='Input is not valid')
             return None
 
-        new_output_model, new_output_value = self.main_node_operation(self.input_value)
+        operation = self.prepare_operation(self.input_value)
+        if operation is None:
+            self.markInvalid(error_message='Check node configuration')
+            return None
+
+        self.submit_operation(operation, self.input_value, cache_key=self.operation_key(operation))
+        return self.output_value
+
+    def on_operation_result(self, result):
+        new_output_model, new_output_value = result.model, result.data
+        self.result = result
+        if result.gram is not None:
+            self.gram, self.gram_input = result.gram, self.pending_gram_input
+        self.refresh_output_widget()
+        self.update_ui()
+
         need_update_children = False
         if new_output_model is not None \
                 and new_output_value is not None \
                 and isinstance(new_output_value, pd.DataFrame):
             need_update_children = True
-            self.output_value = []
+            # the fitted model goes to Predict, Decompose and Scenario nodes
+            self.output_value = new_output_model
 
         if new_output_value is None:
             self.markInvalid(error_message='Check node configuration')
@@ -244,7 +287,7 @@ class Node_Regression(EcoNode):
             self.grNode.setToolTip("")
 
         logging.debug(f'Main node operation done for node {self.__class__.__name__}')
-        return self.output_value
+        self.scene.controller.scene_changed()
 
     def create_settings_widget(self):
         w = QWidget()
@@ -254,6 +297,10 @@ class Node_Regression(EcoNode):
         lo.addWidget(self.targetColumn)
         lo.addWidget(self.labelFactors)
         lo.addWidget(self.factorList)
+        lo.addWidget(self.labelMethod)
+        lo.addWidget(self.methodControl)
+        lo.addWidget(self.labelAlpha)
+        lo.addWidget(self.alphaControl)
 
         vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
         lo.addItem(vertSpacer)
@@ -288,6 +335,8 @@ class Node_Regression(EcoNode):
 
         res['target_column'] = self.target_column
         res['factors'] = self.factors
+        res['method'] = self.method
+        res['alpha'] = self.alpha
 
         return res
 
@@ -296,6 +345,19 @@ class Node_Regression(EcoNode):
         try:
             self.target_column = data['target_column']
             self.factors = data['factors']
+            self.method = data.get('method', 'ols')
+            self.alpha = data.get('alpha', 1.0)
+
+            self.onoff_signals(activate=False)
+            self.methodControl.setCurrentIndex(kernels.REGRESSION_METHODS.index(self.method))
+            self.alphaControl.setValue(self.alpha)
+            self.onoff_signals(activate=True)
+
+            if len(self.outputs) == 0:
+                # saved before the node had its model output
+                self.outputs.append(Socket(node=self, index=0, position=self.output_socket_position,
+                                           socket_type=SOCKET_TYPE_MODEL, multi_edges=self.output_multi_edged,
+                                           count_on_this_node_side=1, is_input=False))
 
             return True & res
         except Exception as e:
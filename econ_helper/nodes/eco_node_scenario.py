@@ -0,0 +1,134 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_model import *
+
+
+def parse_changes(text):
+    """ Percent changes from a text like '-20, -10, 10, 20', None when the text is not valid """
+    try:
+        changes = [float(part) for part in text.replace(' ', '').replace('%', '').split(',') if part != '']
+    except ValueError:
+        return None
+    if len(changes) == 0:
+        return None
+    return sorted(set(changes))
+
+
+def format_changes(changes):
+    return ', '.join(f'{change:g}' for change in changes)
+
+
+@register_node('scenario', NODE_TYPE_ECO)
+class Node_Scenario(BaseModelNode):
+    """ Prediction of a fitted model with some regressors changed by several percentages, see kernels.scenario """
+    op_code = 'scenario'
+    type_code = NODE_TYPE_ECO
+    op_title = 'Scenario'
+    content_label_objname = 'node_scenario'
+
+    def __init__(self, scene, default_node_text='Scenarios of'):
+        self.scenario_factors = []
+        self.changes = [-10., 10.]
+
+        #GUI
+        self.labelFactors = QLabel('Changed regressors')
+        self.factorList = QListWidget()
+
+        self.labelChanges = QLabel('Changes, %, e.g. -20, -10, 10, 20')
+        self.changesEdit = QLineEdit(format_changes(self.changes))
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, default_node_text)
+
+    def onoff_signals(self, activate=True):
+        if activate:
+            self.factorList.itemChanged.connect(self.settingsChanged)
+            self.changesEdit.editingFinished.connect(self.settingsChanged)
+        else:
+            self.factorList.itemChanged.disconnect(self.settingsChanged)
+            self.changesEdit.editingFinished.disconnect(self.settingsChanged)
+
+    def read_params(self, df):
+        factors = [self.factorList.item(i).text() for i in range(self.factorList.count())
+                   if self.factorList.item(i).checkState() == Qt.Checked]
+        if self.factorList.count() == 0:
+            # widgets are populated after the first evaluation, use stored settings
+            factors = list(self.scenario_factors)
+
+        changes = parse_changes(self.changesEdit.text())
+        if changes is None:
+            changes = list(self.changes)
+
+        return kernels.ScenarioParams(tuple(factors), tuple(changes))
+
+    def store_params(self, params):
+        self.scenario_factors = list(params.factors)
+        self.changes = list(params.changes)
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        super().update_ui()
+        self.factorList.clear()
+        if self.model is not None:
+            for factor in self.model.factors:
+                self.factorList.addItem(factor)
+                w = self.factorList.item(self.factorList.count() - 1)
+                w.setFlags(w.flags() | Qt.ItemIsUserCheckable)
+                w.setCheckState(Qt.Checked if factor in self.scenario_factors else Qt.Unchecked)
+
+        self.changesEdit.setText(format_changes(self.changes))
+
+        if len(self.scenario_factors) == 0:
+            self.markInvalid(error_message='Select changed regressors')
+
+        if not self.isInvalid():
+            new_text = f'{self.content.default_node_text} {self.model.target}\n' \
+                       f'{len(self.scenario_factors)} regressors by {self.changesEdit.text()}%'
+            self.content.edit.setText(new_text)
+
+        self.onoff_signals(activate=True)
+
+    def settingsChanged(self):
+        self.markInvalid()
+        self.eval()
+        self.update_ui()
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+
+        lo.addWidget(self.labelFactors)
+        lo.addWidget(self.factorList)
+        lo.addWidget(self.labelChanges)
+        lo.addWidget(self.changesEdit)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['scenario_factors'] = self.scenario_factors
+        res['changes'] = self.changes
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.scenario_factors = data['scenario_factors']
+            self.changes = data['changes']
+
+            self.onoff_signals(activate=False)
+            self.changesEdit.setText(format_changes(self.changes))
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
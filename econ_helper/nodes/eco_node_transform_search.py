@@ -0,0 +1,211 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_inout import *
+from econ_helper.nodes.eco_node_model_search import CRITERION_NAMES
+from econ_helper.nodes.preprocessing_node_adstock_grid import format_decays, parse_decays
+from pandas.api.types import is_numeric_dtype
+
+
+def parse_lags(text):
+    """ Lag sizes from a text like '0-4, 8', None when the text is not valid """
+    lags = parse_decays(text)
+    if lags is None or any(lag < 0 or lag != int(lag) for lag in lags):
+        return None
+    return [int(lag) for lag in lags]
+
+
+@register_node('transform_search', NODE_TYPE_ECO)
+class Node_TransformSearch(BaseInOutNode):
+    """ Adstock decay and lag size per channel fitted against the target, see kernels.transform_search """
+    op_code = 'transform_search'
+    type_code = NODE_TYPE_ECO
+    op_title = 'Transform Search'
+    content_label_objname = 'node_transform_search'
+
+    def __init__(self, scene, default_node_text='Transform search'):
+        self.target_column = None
+        self.channels = []
+        self.controls = []
+        self.decays = [float(decay) for decay in range(0, 100, 10)]
+        self.lag_sizes = list(range(0, 5))
+        self.criterion = 'aic'
+        self.max_rounds = 5
+
+        #GUI
+        self.labelTarget = QLabel('Target column')
+        self.targetColumn = QComboBox()
+
+        self.labelChannels = QLabel('Channels to adstock and lag')
+        self.channelList = QListWidget()
+        self.labelControls = QLabel('Other regressors')
+        self.controlList = QListWidget()
+
+        self.labelDecays = QLabel('Decay rates in %, e.g. 0-90/10')
+        self.decaysEdit = QLineEdit(format_decays(self.decays))
+        self.labelLags = QLabel('Lag sizes, e.g. 0-4')
+        self.lagsEdit = QLineEdit(format_decays(self.lag_sizes))
+
+        self.labelCriterion = QLabel('Ranked by')
+        self.criterionControl = QComboBox()
+        self.criterionControl.addItems(CRITERION_NAMES)
+        self.labelRounds = QLabel('Most rounds over the channels')
+        self.roundsControl = QSpinBox()
+        self.roundsControl.setMinimum(1)
+        self.roundsControl.setMaximum(100)
+        self.roundsControl.setValue(self.max_rounds)
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, default_node_text)
+
+    def onoff_signals(self, activate=True):
+        signals = [self.targetColumn.currentIndexChanged, self.channelList.itemChanged,
+                   self.controlList.itemChanged, self.decaysEdit.editingFinished, self.lagsEdit.editingFinished,
+                   self.criterionControl.currentIndexChanged, self.roundsControl.valueChanged]
+        for signal in signals:
+            if activate:
+                signal.connect(self.settingsChanged)
+            else:
+                signal.disconnect(self.settingsChanged)
+
+    @staticmethod
+    def checked_items(list_widget):
+        return [list_widget.item(i).text() for i in range(list_widget.count())
+                if list_widget.item(i).checkState() == Qt.Checked]
+
+    def read_params(self, df):
+        target = self.targetColumn.currentText()
+        if target == '' or target not in df.columns:
+            # widgets are populated after the first evaluation, use stored settings
+            target = self.target_column
+
+        channels = self.checked_items(self.channelList)
+        controls = self.checked_items(self.controlList)
+        if self.channelList.count() == 0:
+            channels, controls = list(self.channels), list(self.controls)
+
+        decays = parse_decays(self.decaysEdit.text())
+        if decays is None:
+            decays = list(self.decays)
+        lag_sizes = parse_lags(self.lagsEdit.text())
+        if lag_sizes is None:
+            lag_sizes = list(self.lag_sizes)
+
+        return kernels.TransformSearchParams(target, tuple(channels), tuple(decays), tuple(lag_sizes),
+                                             tuple(controls),
+                                             kernels.SEARCH_CRITERIA[self.criterionControl.currentIndex()],
+                                             self.roundsControl.value())
+
+    def store_params(self, params):
+        self.target_column = params.target_column
+        self.channels = list(params.channels)
+        self.controls = list(params.controls)
+        self.decays = list(params.decays)
+        self.lag_sizes = list(params.lag_sizes)
+        self.criterion = params.criterion
+        self.max_rounds = params.max_rounds
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        self.targetColumn.clear()
+        self.channelList.clear()
+        self.controlList.clear()
+        if self.input_value is not None:
+            dtypes = self.input_value.dtypes
+            numeric = [c for c in self.input_value.columns if is_numeric_dtype(dtypes[c])]
+            self.targetColumn.addItems(numeric)
+            for column in numeric:
+                if column == self.target_column:
+                    continue
+                for list_widget, selected in ((self.channelList, self.channels), (self.controlList, self.controls)):
+                    list_widget.addItem(column)
+                    w = list_widget.item(list_widget.count() - 1)
+                    w.setFlags(w.flags() | Qt.ItemIsUserCheckable)
+                    w.setCheckState(Qt.Checked if column in selected else Qt.Unchecked)
+        else:
+            self.markInvalid(error_message='Input is not connected')
+
+        self.targetColumn.setCurrentIndex(-1)
+        if self.target_column is not None:
+            self.targetColumn.setCurrentIndex(self.targetColumn.findText(self.target_column, Qt.MatchExactly))
+        else:
+            self.markInvalid(error_message='Select target column')
+
+        self.decaysEdit.setText(format_decays(self.decays))
+        self.lagsEdit.setText(format_decays(self.lag_sizes))
+        self.criterionControl.setCurrentIndex(kernels.SEARCH_CRITERIA.index(self.criterion))
+        self.roundsControl.setValue(self.max_rounds)
+
+        if not self.isInvalid():
+            new_text = f'{self.content.default_node_text} for {self.target_column}\n' \
+                       f'{len(self.channels)} channels, {len(self.decays)} decays x {len(self.lag_sizes)} lags'
+            self.content.edit.setText(new_text)
+
+        self.onoff_signals(activate=True)
+
+    def settingsChanged(self):
+        self.markInvalid()
+        self.eval()
+        self.update_ui()
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+
+        lo.addWidget(self.labelTarget)
+        lo.addWidget(self.targetColumn)
+        lo.addWidget(self.labelChannels)
+        lo.addWidget(self.channelList)
+        lo.addWidget(self.labelControls)
+        lo.addWidget(self.controlList)
+        lo.addWidget(self.labelDecays)
+        lo.addWidget(self.decaysEdit)
+        lo.addWidget(self.labelLags)
+        lo.addWidget(self.lagsEdit)
+        lo.addWidget(self.labelCriterion)
+        lo.addWidget(self.criterionControl)
+        lo.addWidget(self.labelRounds)
+        lo.addWidget(self.roundsControl)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['target_column'] = self.target_column
+        res['channels'] = self.channels
+        res['controls'] = self.controls
+        res['decays'] = self.decays
+        res['lag_sizes'] = self.lag_sizes
+        res['criterion'] = self.criterion
+        res['max_rounds'] = self.max_rounds
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.target_column = data['target_column']
+            self.channels = data['channels']
+            self.controls = data.get('controls', [])
+            self.decays = data['decays']
+            self.lag_sizes = data['lag_sizes']
+            self.criterion = data.get('criterion', 'aic')
+            self.max_rounds = data.get('max_rounds', 5)
+
+            self.onoff_signals(activate=False)
+            self.decaysEdit.setText(format_decays(self.decays))
+            self.lagsEdit.setText(format_decays(self.lag_sizes))
+            self.criterionControl.setCurrentIndex(kernels.SEARCH_CRITERIA.index(self.criterion))
+            self.roundsControl.setValue(self.max_rounds)
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
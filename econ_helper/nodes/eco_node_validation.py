@@ -0,0 +1,360 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_inout import *
+from pandas.api.types import is_numeric_dtype
+
+METHOD_NAMES = ['Least squares', 'Ridge', 'Non-negative least squares']
+SCHEME_NAMES = ['Expanding window', 'Rolling window']
+
+
+class BaseValidationNode(BaseInOutNode):
+    """ Regression of the target over the selected regressors, checked by the kernel of op_code
+
+    Subclasses add their own settings with add_settings, extra_params and show_settings.
+    """
+
+    def __init__(self, scene, default_node_text=None):
+        self.target_column = None
+        self.factors = []
+        self.method = 'ols'
+        self.alpha = 1.0
+
+        #GUI
+        self.labelTarget = QLabel('Target column')
+        self.targetColumn = QComboBox()
+
+        self.labelFactors = QLabel('Regressors')
+        self.factorList = QListWidget()
+
+        self.labelMethod = QLabel('Method')
+        self.methodControl = QComboBox()
+        self.methodControl.addItems(METHOD_NAMES)
+        self.labelAlpha = QLabel('Ridge alpha')
+        self.alphaControl = QDoubleSpinBox()
+        self.alphaControl.setDecimals(4)
+        self.alphaControl.setMaximum(1e12)
+        self.alphaControl.setValue(self.alpha)
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, default_node_text)
+
+    def settings_signals(self):
+        return [self.targetColumn.currentIndexChanged, self.factorList.itemChanged,
+                self.methodControl.currentIndexChanged, self.alphaControl.valueChanged]
+
+    def onoff_signals(self, activate=True):
+        for signal in self.settings_signals():
+            if activate:
+                signal.connect(self.settingsChanged)
+            else:
+                signal.disconnect(self.settingsChanged)
+
+    def extra_params(self):
+        """ Values of the settings after alpha in the kernel parameters """
+        raise NotImplementedError
+
+    def read_params(self, df):
+        target = self.targetColumn.currentText()
+        if target == '' or target not in df.columns:
+            # widgets are populated after the first evaluation, use stored settings
+            target = self.target_column
+
+        factors = [self.factorList.item(i).text() for i in range(self.factorList.count())
+                   if self.factorList.item(i).checkState() == Qt.Checked]
+        if self.factorList.count() == 0:
+            factors = list(self.factors)
+
+        return self.params_class(target, tuple(factors),
+                                 kernels.REGRESSION_METHODS[self.methodControl.currentIndex()],
+                                 self.alphaControl.value(), *self.extra_params())
+
+    def store_params(self, params):
+        self.target_column = params.target_column
+        self.factors = list(params.factors)
+        self.method = params.method
+        self.alpha = params.alpha
+
+    def show_settings(self):
+        """ Restores the widgets of the subclass settings """
+        pass
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        self.targetColumn.clear()
+        self.factorList.clear()
+        if self.input_value is not None:
+            dtypes = self.input_value.dtypes
+            numeric = [c for c in self.input_value.columns if is_numeric_dtype(dtypes[c])]
+            self.targetColumn.addItems(numeric)
+            for column in numeric:
+                if column == self.target_column:
+                    continue
+                self.factorList.addItem(column)
+                w = self.factorList.item(self.factorList.count() - 1)
+                w.setFlags(w.flags() | Qt.ItemIsUserCheckable)
+                w.setCheckState(Qt.Checked if column in self.factors else Qt.Unchecked)
+        else:
+            self.markInvalid(error_message='Input is not connected')
+
+        self.targetColumn.setCurrentIndex(-1)
+        if self.target_column is not None:
+            self.targetColumn.setCurrentIndex(self.targetColumn.findText(self.target_column, Qt.MatchExactly))
+        else:
+            self.markInvalid(error_message='Select target column')
+
+        self.methodControl.setCurrentIndex(kernels.REGRESSION_METHODS.index(self.method))
+        self.alphaControl.setValue(self.alpha)
+        self.alphaControl.setEnabled(self.method == 'ridge')
+        self.show_settings()
+
+        if not self.isInvalid():
+            new_text = f'{self.content.default_node_text} {self.target_column}\n' \
+                       f'{METHOD_NAMES[self.methodControl.currentIndex()]}, {len(self.factors)} regressors'
+            self.content.edit.setText(new_text)
+
+        self.onoff_signals(activate=True)
+
+    def settingsChanged(self):
+        self.markInvalid()
+        self.eval()
+        self.update_ui()
+
+    def add_settings(self, lo):
+        pass
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+
+        lo.addWidget(self.labelTarget)
+        lo.addWidget(self.targetColumn)
+        lo.addWidget(self.labelFactors)
+        lo.addWidget(self.factorList)
+        lo.addWidget(self.labelMethod)
+        lo.addWidget(self.methodControl)
+        lo.addWidget(self.labelAlpha)
+        lo.addWidget(self.alphaControl)
+        self.add_settings(lo)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['target_column'] = self.target_column
+        res['factors'] = self.factors
+        res['method'] = self.method
+        res['alpha'] = self.alpha
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.target_column = data['target_column']
+            self.factors = data['factors']
+            self.method = data.get('method', 'ols')
+            self.alpha = data.get('alpha', 1.0)
+
+            self.onoff_signals(activate=False)
+            self.methodControl.setCurrentIndex(kernels.REGRESSION_METHODS.index(self.method))
+            self.alphaControl.setValue(self.alpha)
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
+
+
+def row_count_control(value, minimum=1):
+    control = QSpinBox()
+    control.setMinimum(minimum)
+    control.setMaximum(10 ** 8)
+    control.setValue(value)
+    return control
+
+
+@register_node('cross_validation', NODE_TYPE_ECO)
+class Node_CrossValidation(BaseValidationNode):
+    """ Out of sample errors of a regression over rolling origin folds, see kernels.cross_validation """
+    op_code = 'cross_validation'
+    type_code = NODE_TYPE_ECO
+    op_title = 'Cross Validation'
+    content_label_objname = 'node_cross_validation'
+    params_class = kernels.CrossValidationParams
+
+    def __init__(self, scene, default_node_text='Cross validation of'):
+        self.scheme = 'expanding'
+        self.initial = 52
+        self.horizon = 13
+        self.step = 13
+
+        #GUI
+        self.labelScheme = QLabel('Training window')
+        self.schemeControl = QComboBox()
+        self.schemeControl.addItems(SCHEME_NAMES)
+        self.labelInitial = QLabel('Rows in the first training window')
+        self.initialControl = row_count_control(self.initial)
+        self.labelHorizon = QLabel('Rows forecast by a fold')
+        self.horizonControl = row_count_control(self.horizon)
+        self.labelStep = QLabel('Rows between fold origins')
+        self.stepControl = row_count_control(self.step)
+
+        super().__init__(scene, default_node_text)
+
+    def settings_signals(self):
+        return super().settings_signals() + [self.schemeControl.currentIndexChanged,
+                                             self.initialControl.valueChanged,
+                                             self.horizonControl.valueChanged, self.stepControl.valueChanged]
+
+    def extra_params(self):
+        return (kernels.CV_SCHEMES[self.schemeControl.currentIndex()], self.initialControl.value(),
+                self.horizonControl.value(), self.stepControl.value())
+
+    def store_params(self, params):
+        super().store_params(params)
+        self.scheme = params.scheme
+        self.initial = params.initial
+        self.horizon = params.horizon
+        self.step = params.step
+
+    def show_settings(self):
+        self.schemeControl.setCurrentIndex(kernels.CV_SCHEMES.index(self.scheme))
+        self.initialControl.setValue(self.initial)
+        self.horizonControl.setValue(self.horizon)
+        self.stepControl.setValue(self.step)
+
+    def add_settings(self, lo):
+        lo.addWidget(self.labelScheme)
+        lo.addWidget(self.schemeControl)
+        lo.addWidget(self.labelInitial)
+        lo.addWidget(self.initialControl)
+        lo.addWidget(self.labelHorizon)
+        lo.addWidget(self.horizonControl)
+        lo.addWidget(self.labelStep)
+        lo.addWidget(self.stepControl)
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['scheme'] = self.scheme
+        res['initial'] = self.initial
+        res['horizon'] = self.horizon
+        res['step'] = self.step
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.scheme = data.get('scheme', 'expanding')
+            self.initial = data.get('initial', 52)
+            self.horizon = data.get('horizon', 13)
+            self.step = data.get('step', 13)
+
+            self.onoff_signals(activate=False)
+            self.show_settings()
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
+
+
+@register_node('bootstrap', NODE_TYPE_ECO)
+class Node_Bootstrap(BaseValidationNode):
+    """ Confidence intervals of regression coefficients by block bootstrap, see kernels.bootstrap """
+    op_code = 'bootstrap'
+    type_code = NODE_TYPE_ECO
+    op_title = 'Bootstrap'
+    content_label_objname = 'node_bootstrap'
+    params_class = kernels.BootstrapParams
+
+    def __init__(self, scene, default_node_text='Bootstrap of'):
+        self.block_size = 8
+        self.replicates = 1000
+        self.confidence = 0.95
+        self.seed = 0
+
+        #GUI
+        self.labelBlockSize = QLabel('Rows in a block')
+        self.blockSizeControl = row_count_control(self.block_size)
+        self.labelReplicates = QLabel('Replicates')
+        self.replicatesControl = row_count_control(self.replicates, minimum=2)
+        self.labelConfidence = QLabel('Confidence level')
+        self.confidenceControl = QDoubleSpinBox()
+        self.confidenceControl.setDecimals(3)
+        self.confidenceControl.setRange(0.5, 0.999)
+        self.confidenceControl.setSingleStep(0.01)
+        self.confidenceControl.setValue(self.confidence)
+        self.labelSeed = QLabel('Random seed')
+        self.seedControl = row_count_control(self.seed, minimum=0)
+
+        super().__init__(scene, default_node_text)
+
+    def settings_signals(self):
+        return super().settings_signals() + [self.blockSizeControl.valueChanged,
+                                             self.replicatesControl.valueChanged,
+                                             self.confidenceControl.valueChanged, self.seedControl.valueChanged]
+
+    def extra_params(self):
+        return (self.blockSizeControl.value(), self.replicatesControl.value(),
+                self.confidenceControl.value(), self.seedControl.value())
+
+    def store_params(self, params):
+        super().store_params(params)
+        self.block_size = params.block_size
+        self.replicates = params.replicates
+        self.confidence = params.confidence
+        self.seed = params.seed
+
+    def show_settings(self):
+        self.blockSizeControl.setValue(self.block_size)
+        self.replicatesControl.setValue(self.replicates)
+        self.confidenceControl.setValue(self.confidence)
+        self.seedControl.setValue(self.seed)
+
+    def add_settings(self, lo):
+        lo.addWidget(self.labelBlockSize)
+        lo.addWidget(self.blockSizeControl)
+        lo.addWidget(self.labelReplicates)
+        lo.addWidget(self.replicatesControl)
+        lo.addWidget(self.labelConfidence)
+        lo.addWidget(self.confidenceControl)
+        lo.addWidget(self.labelSeed)
+        lo.addWidget(self.seedControl)
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['block_size'] = self.block_size
+        res['replicates'] = self.replicates
+        res['confidence'] = self.confidence
+        res['seed'] = self.seed
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.block_size = data.get('block_size', 8)
+            self.replicates = data.get('replicates', 1000)
+            self.confidence = data.get('confidence', 0.95)
+            self.seed = data.get('seed', 0)
+
+            self.onoff_signals(activate=False)
+            self.show_settings()
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
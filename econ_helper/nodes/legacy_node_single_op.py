@@ -1,3 +1,4 @@
+from econ_helper import kernels
 from econ_helper.eh_node_base import *
 from econ_helper.eh_conf import *
 from nodeeditor.node_serializable import Serializable
@@ -46,15 +47,7 @@ class TrendOperation(Operation):
     operation_name = 'trend'
 
     def apply(self, df, column, extra_param=None):
-        dfc = df.copy()
-        x = list(range(dfc[column].shape[0]))
-        new_column = column + ' ' + self.operation_name
-        x = sm_tools.add_constant(x)  # Add constant
-        ols_model = sm.OLS(dfc[column], x)  # Initialize model
-        ols_result = ols_model.fit()  # Fit model
-        trend_data = ols_result.predict(x)
-        dfc[new_column] = trend_data
-        return dfc
+        return kernels.trend(df, kernels.TrendParams(column))
 
 
 class LagOperation(Operation):
@@ -1,6 +1,5 @@
 from econ_helper.eh_conf import *
 from econ_helper.nodes.base_node_inout import *
-import statsmodels.tsa as tsa
 from pandas.api.types import is_numeric_dtype
 
 
@@ -47,31 +46,16 @@ class Node_Adstock(BaseInOutNode):
             self.adstockControl.valueChanged.disconnect(self.targetColumnChanged)
             self.addOrReplaceButton.toggled.disconnect(self.targetColumnChanged)
 
-    def main_node_operation(self, df):
-        dfc = None
+    def read_params(self, df):
         column = self.targetColumn.currentText()
-        adstock_size = self.adstockControl.value()
-        replace = self.addOrReplaceButton.isChecked()
-
-        if column == '' or column not in df.columns:
-            column = self.adstock_column
-            adstock_size = self.adstock_size
-
-        self.adstock_column = column if (column != '' and column in df.columns) else None
-
         if column == '' or column not in df.columns:
-            return None
-
-        new_column = column + ' ' + self.operation_name + f' {adstock_size}'
-        new_value = tsa.filters.filtertools.recursive_filter(df[column], adstock_size/100)
-        dfc = df.copy()
-        dfc.insert(0, new_column, new_value)
-        if replace:
-            dfc = dfc.drop(columns=[column])
-        self.adstock_column = column
-        self.adstock_size = adstock_size
+            return kernels.AdstockParams(self.adstock_column, self.adstock_size or 0,
+                                         self.addOrReplaceButton.isChecked())
+        return kernels.AdstockParams(column, self.adstockControl.value(), self.addOrReplaceButton.isChecked())
 
-        return dfc
+    def store_params(self, params):
+        self.adstock_column = params.column
+        self.adstock_size = params.adstock_size
 
     def update_ui(self):
         self.onoff_signals(activate=False)
@@ -132,8 +116,9 @@ class Node_Adstock(BaseInOutNode):
     def serialize(self):
         res = super().serialize()
 
-        res['adstock_column'] = self.targetColumn.currentText()
+        res['adstock_column'] = self.targetColumn.currentText() or self.adstock_column
         res['adstock_size'] = self.adstockControl.value()
+        res['replace'] = self.addOrReplaceButton.isChecked()
 
         return res
 
@@ -142,6 +127,10 @@ class Node_Adstock(BaseInOutNode):
         try:
             self.adstock_column = data['adstock_column']
             self.adstock_size = data['adstock_size']
+
+            self.onoff_signals(activate=False)
+            self.addOrReplaceButton.setChecked(data.get('replace', False))
+            self.onoff_signals(activate=True)
             return True & res
         except Exception as e:
             dumpException(e)
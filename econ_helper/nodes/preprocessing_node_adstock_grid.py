@@ -0,0 +1,202 @@
+import math
+
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_inout import *
+from pandas.api.types import is_numeric_dtype
+
+DECAY_MODES = ['Decay rate, %', 'Half-life, rows']
+
+
+def parse_decays(text):
+    """ Decays from a text like '10-50/10, 75', None when the text is not valid
+
+    A range 'first-last/step' includes last, the step defaults to 1.
+    """
+    decays = []
+    try:
+        for part in text.replace(' ', '').split(','):
+            if part == '':
+                continue
+            if '-' in part:
+                bounds, _, step = part.partition('/')
+                first, last = (float(bound) for bound in bounds.split('-'))
+                step = float(step) if step != '' else 1.
+                if step <= 0:
+                    return None
+                count = int(math.floor((last - first) / step + 1e-9)) + 1
+                decays.extend(round(first + i * step, 10) for i in range(count))
+            else:
+                decays.append(float(part))
+    except ValueError:
+        return None
+    if len(decays) == 0:
+        return None
+    return sorted(set(decays))
+
+
+def format_decays(decays):
+    return ', '.join(f'{decay:g}' for decay in decays)
+
+
+@register_node('adstock_grid', NODE_TYPE_PREPROCESSING)
+class Node_AdstockGrid(BaseInOutNode):
+    """ Adstock of several columns with several decays, like an adstock node per column and decay """
+    op_code = 'adstock_grid'
+    type_code = NODE_TYPE_PREPROCESSING
+    op_title = 'Adstock Grid'
+    content_label_objname = 'node_adstock_grid'
+
+    def __init__(self, scene, default_node_text='Adstock grid on'):
+        self.adstock_columns = []
+        self.decays = [30.]
+        self.half_life = False
+        self.saturation = 0.
+        self.shape = 1.
+
+        #GUI
+        self.labelColumns = QLabel('Adstock columns')
+        self.columnList = QListWidget()
+
+        self.decayMode = QComboBox()
+        self.decayMode.addItems(DECAY_MODES)
+        self.labelDecays = QLabel('Decays, e.g. 10-90/10, 95')
+        self.decaysEdit = QLineEdit('30')
+
+        self.labelSaturation = QLabel('Half-saturation point, 0 for none')
+        self.saturationControl = QDoubleSpinBox()
+        self.saturationControl.setDecimals(4)
+        self.saturationControl.setMaximum(1e12)
+        self.labelShape = QLabel('Saturation shape')
+        self.shapeControl = QDoubleSpinBox()
+        self.shapeControl.setMinimum(0.1)
+        self.shapeControl.setMaximum(10)
+        self.shapeControl.setSingleStep(0.1)
+        self.shapeControl.setValue(1)
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, default_node_text)
+
+    def onoff_signals(self, activate=True):
+        if activate:
+            self.columnList.itemChanged.connect(self.settingsChanged)
+            self.decayMode.currentIndexChanged.connect(self.settingsChanged)
+            self.decaysEdit.editingFinished.connect(self.settingsChanged)
+            self.saturationControl.valueChanged.connect(self.settingsChanged)
+            self.shapeControl.valueChanged.connect(self.settingsChanged)
+        else:
+            self.columnList.itemChanged.disconnect(self.settingsChanged)
+            self.decayMode.currentIndexChanged.disconnect(self.settingsChanged)
+            self.decaysEdit.editingFinished.disconnect(self.settingsChanged)
+            self.saturationControl.valueChanged.disconnect(self.settingsChanged)
+            self.shapeControl.valueChanged.disconnect(self.settingsChanged)
+
+    def read_params(self, df):
+        columns = [self.columnList.item(i).text() for i in range(self.columnList.count())
+                   if self.columnList.item(i).checkState() == Qt.Checked]
+        if self.columnList.count() == 0:
+            # widgets are populated after the first evaluation, use stored settings
+            columns = list(self.adstock_columns)
+
+        decays = parse_decays(self.decaysEdit.text())
+        if decays is None:
+            decays = list(self.decays)
+
+        return kernels.AdstockGridParams(tuple(columns), tuple(decays), self.decayMode.currentIndex() == 1,
+                                         self.saturationControl.value(), self.shapeControl.value())
+
+    def store_params(self, params):
+        self.adstock_columns = list(params.columns)
+        self.decays = list(params.decays)
+        self.half_life = params.half_life
+        self.saturation = params.saturation
+        self.shape = params.shape
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        self.columnList.clear()
+        if self.input_value is not None:
+            for column in self.input_value.columns:
+                if not is_numeric_dtype(self.input_value[column]):
+                    continue
+                self.columnList.addItem(column)
+                w = self.columnList.item(self.columnList.count() - 1)
+                w.setFlags(w.flags() | Qt.ItemIsUserCheckable)
+                w.setCheckState(Qt.Checked if column in self.adstock_columns else Qt.Unchecked)
+        else:
+            self.markInvalid(error_message='Input is not connected')
+
+        self.decayMode.setCurrentIndex(1 if self.half_life else 0)
+        self.decaysEdit.setText(format_decays(self.decays))
+        self.saturationControl.setValue(self.saturation)
+        self.shapeControl.setValue(self.shape)
+        self.shapeControl.setEnabled(self.saturation > 0)
+
+        if len(self.adstock_columns) == 0:
+            self.markInvalid(error_message='Select adstock columns')
+
+        if not self.isInvalid():
+            new_text = f'{self.content.default_node_text} {len(self.adstock_columns)} columns, ' \
+                       f'{"half-lives" if self.half_life else "decays"} {self.decaysEdit.text()}'
+            self.content.edit.setText(new_text)
+
+        self.onoff_signals(activate=True)
+
+    def settingsChanged(self):
+        self.markInvalid()
+        self.eval()
+        self.update_ui()
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+
+        lo.addWidget(self.labelColumns)
+        lo.addWidget(self.columnList)
+        lo.addWidget(self.decayMode)
+        lo.addWidget(self.labelDecays)
+        lo.addWidget(self.decaysEdit)
+        lo.addWidget(self.labelSaturation)
+        lo.addWidget(self.saturationControl)
+        lo.addWidget(self.labelShape)
+        lo.addWidget(self.shapeControl)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['adstock_columns'] = self.adstock_columns
+        res['decays'] = self.decays
+        res['half_life'] = self.half_life
+        res['saturation'] = self.saturation
+        res['shape'] = self.shape
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.adstock_columns = data['adstock_columns']
+            self.decays = data['decays']
+            self.half_life = data.get('half_life', False)
+            self.saturation = data.get('saturation', 0.)
+            self.shape = data.get('shape', 1.)
+
+            self.onoff_signals(activate=False)
+            self.decayMode.setCurrentIndex(1 if self.half_life else 0)
+            self.decaysEdit.setText(format_decays(self.decays))
+            self.saturationControl.setValue(self.saturation)
+            self.shapeControl.setValue(self.shape)
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
@@ -14,7 +14,7 @@ class Node_BinaryOp(BaseInOutNode):
 
     def __init__(self, scene, default_node_text='Binary op on'):
 
-        self.available_ops = ['sum', 'diff', 'mult', 'div']
+        self.available_ops = kernels.BINARY_OPS
         self.op_column_1st = None
         self.op_column_2nd = None
         self.op_operation = None
@@ -46,55 +46,22 @@ class Node_BinaryOp(BaseInOutNode):
             self.operationCombo.currentIndexChanged.disconnect(self.targetColumnChanged)
 
 
-    def main_node_operation(self, df):
-        dfc = None
+    def read_params(self, df):
         column_first = self.targetColumnFirst.currentText()
-        column_second = self.targetColumnSecond.currentText()
-        op = self.operationCombo.currentText()
-
         if column_first == '' or column_first not in df.columns:
             column_first = self.op_column_1st
+        column_second = self.targetColumnSecond.currentText()
         if column_second == '' or column_second not in df.columns:
             column_second = self.op_column_2nd
+        op = self.operationCombo.currentText()
         if op == '':
             op = self.op_operation
+        return kernels.BinaryParams(column_first, column_second, op)
 
-        self.op_column_1st = column_first if (column_first != '' and column_first in df.columns) else None
-        self.op_column_2nd = column_second if (column_second != '' and column_second in df.columns) else None
-        self.op_operation = op if op != '' else None
-
-        if column_first == '' or column_second == '' \
-                or column_first not in df.columns \
-                or column_second not in df.columns:
-            return None
-
-        new_column = None
-        new_value = None
-        self.operation_name = op
-        if op == 'sum':
-            new_column = f'({column_first}) + ({column_second})'
-            new_value = df[column_first] + df[column_second]
-        elif op == 'diff':
-            new_column = f'({column_first}) - ({column_second})'
-            new_value = df[column_first] - df[column_second]
-        elif op == 'mult':
-            new_column = f'({column_first}) * ({column_second})'
-            new_value = df[column_first] * df[column_second]
-        elif op == 'div':
-            new_column = f'({column_first}) / ({column_second})'
-            new_value = df[column_first] / df[column_second]
-        else:
-            pass
-
-        if new_column is not None and new_value is not None:
-            dfc = df.copy()
-            dfc.insert(0, new_column, new_value)
-
-        self.op_column_1st = column_first
-        self.op_column_2nd = column_second
-        self.op_operation = op
-
-        return dfc
+    def store_params(self, params):
+        self.op_column_1st = params.column_first
+        self.op_column_2nd = params.column_second
+        self.op_operation = params.op
 
     def update_ui(self):
         self.onoff_signals(activate=False)
@@ -183,8 +150,8 @@ class Node_BinaryOp(BaseInOutNode):
     def serialize(self):
         res = super().serialize()
 
-        res['op_column_1st'] = self.targetColumnFirst.currentText()
-        res['op_column_2nd'] = self.targetColumnSecond.currentText()
+        res['op_column_1st'] = self.targetColumnFirst.currentText() or self.op_column_1st
+        res['op_column_2nd'] = self.targetColumnSecond.currentText() or self.op_column_2nd
         res['op'] = self.operationCombo.currentText()
 
         return res
@@ -49,32 +49,16 @@ class Node_Filter(BaseInOutNode):
 
         self.onoff_signals(activate=True)
 
-    def main_node_operation(self, df):
-        dfc = None
-
+    def read_params(self, df):
         columnToDrop = self.dropColumn.currentText()
         if columnToDrop is None \
                 or columnToDrop == '' \
                 or columnToDrop not in df.columns:
             columnToDrop = self.filter_column
-        if columnToDrop is None \
-                or columnToDrop == '' \
-                or columnToDrop not in df.columns:
-            return None
-
-        if columnToDrop in self.input_value.columns:
-            self.filter_column = columnToDrop
-            dfc = df.drop(columns=columnToDrop)
+        return kernels.FilterParams(columnToDrop)
 
-        self.filter_column = columnToDrop
-
-        return dfc
-
-    def onMarkedDirty(self):
-        super().onMarkedDirty()
-        self.eval()
-        #self.node_settings_widget = self.create_settings_widget()
-        self.update_ui()
+    def store_params(self, params):
+        self.filter_column = params.column
 
     def dropFilterChanged(self):
         self.markInvalid()
@@ -100,7 +84,7 @@ class Node_Filter(BaseInOutNode):
     def serialize(self):
         res = super().serialize()
 
-        res['filter_column'] = self.dropColumn.currentText()
+        res['filter_column'] = self.dropColumn.currentText() or self.filter_column
 
         return res
 
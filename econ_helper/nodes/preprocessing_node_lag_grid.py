@@ -0,0 +1,142 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_inout import *
+from pandas.api.types import is_numeric_dtype
+
+
+def parse_lag_sizes(text):
+    """ Lag sizes from a text like '1-4, 8, 12', None when the text is not valid """
+    sizes = []
+    try:
+        for part in text.replace(' ', '').split(','):
+            if part == '':
+                continue
+            if '-' in part:
+                first, last = part.split('-')
+                sizes.extend(range(int(first), int(last) + 1))
+            else:
+                sizes.append(int(part))
+    except ValueError:
+        return None
+    if len(sizes) == 0 or min(sizes) < 1:
+        return None
+    return sorted(set(sizes))
+
+
+@register_node('lag_grid', NODE_TYPE_PREPROCESSING)
+class Node_LagGrid(BaseInOutNode):
+    """ Lags of several columns by several sizes, like a lag node per column and size """
+    op_code = 'lag_grid'
+    type_code = NODE_TYPE_PREPROCESSING
+    op_title = 'Lag Grid'
+    content_label_objname = 'node_lag_grid'
+
+    def __init__(self, scene, default_node_text='Lag grid on'):
+        self.lag_columns = []
+        self.lag_sizes = [1]
+
+        #GUI
+        self.labelColumns = QLabel('Lag on columns')
+        self.columnList = QListWidget()
+
+        self.labelSizes = QLabel('Lag sizes, e.g. 1-4, 8')
+        self.sizesEdit = QLineEdit('1')
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, default_node_text)
+
+    def onoff_signals(self, activate=True):
+        if activate:
+            self.columnList.itemChanged.connect(self.settingsChanged)
+            self.sizesEdit.editingFinished.connect(self.settingsChanged)
+        else:
+            self.columnList.itemChanged.disconnect(self.settingsChanged)
+            self.sizesEdit.editingFinished.disconnect(self.settingsChanged)
+
+    def read_params(self, df):
+        columns = [self.columnList.item(i).text() for i in range(self.columnList.count())
+                   if self.columnList.item(i).checkState() == Qt.Checked]
+        if self.columnList.count() == 0:
+            # widgets are populated after the first evaluation, use stored settings
+            columns = list(self.lag_columns)
+
+        lag_sizes = parse_lag_sizes(self.sizesEdit.text())
+        if lag_sizes is None:
+            lag_sizes = list(self.lag_sizes)
+
+        return kernels.LagGridParams(tuple(columns), tuple(lag_sizes))
+
+    def store_params(self, params):
+        self.lag_columns = list(params.columns)
+        self.lag_sizes = list(params.lag_sizes)
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        self.columnList.clear()
+        if self.input_value is not None:
+            for column in self.input_value.columns:
+                if not is_numeric_dtype(self.input_value[column]):
+                    continue
+                self.columnList.addItem(column)
+                w = self.columnList.item(self.columnList.count() - 1)
+                w.setFlags(w.flags() | Qt.ItemIsUserCheckable)
+                w.setCheckState(Qt.Checked if column in self.lag_columns else Qt.Unchecked)
+        else:
+            self.markInvalid(error_message='Input is not connected')
+
+        self.sizesEdit.setText(', '.join(str(lag_size) for lag_size in self.lag_sizes))
+
+        if len(self.lag_columns) == 0:
+            self.markInvalid(error_message='Select lag columns')
+
+        if not self.isInvalid():
+            new_text = f'{self.content.default_node_text} {len(self.lag_columns)} columns, ' \
+                       f'lags {self.sizesEdit.text()}'
+            self.content.edit.setText(new_text)
+
+        self.onoff_signals(activate=True)
+
+    def settingsChanged(self):
+        self.markInvalid()
+        self.eval()
+        self.update_ui()
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+
+        lo.addWidget(self.labelColumns)
+        lo.addWidget(self.columnList)
+        lo.addWidget(self.labelSizes)
+        lo.addWidget(self.sizesEdit)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['lag_columns'] = self.lag_columns
+        res['lag_sizes'] = self.lag_sizes
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.lag_columns = data['lag_columns']
+            self.lag_sizes = data['lag_sizes']
+
+            self.onoff_signals(activate=False)
+            self.sizesEdit.setText(', '.join(str(lag_size) for lag_size in self.lag_sizes))
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
@@ -46,30 +46,15 @@ class Node_Lag(BaseInOutNode):
            self.lagControl.valueChanged.disconnect(self.targetColumnChanged)
            self.addOrReplaceButton.toggled.disconnect(self.targetColumnChanged)
 
-    def main_node_operation(self, df):
+    def read_params(self, df):
         column = self.targetColumn.currentText()
-        lag_size = self.lagControl.value()
-        replace = self.addOrReplaceButton.isChecked()
-
-        if column == '' or column not in df.columns:
-            column = self.lag_column
-            lag_size = self.lag_size
-
-        self.lag_column = column if (column != '' and column in df.columns) else None
-
         if column == '' or column not in df.columns:
-            return None
-
-        new_column = column + ' ' + self.operation_name + f' {lag_size}'
-        new_value = df[column].shift(lag_size).fillna(0)
-        dfc = df.copy()
-        dfc.insert(0, new_column, new_value)
-        if replace:
-            dfc = dfc.drop(columns=[column])
-        self.lag_column = column
-        self.lag_size = lag_size
+            return kernels.LagParams(self.lag_column, self.lag_size or 1, self.addOrReplaceButton.isChecked())
+        return kernels.LagParams(column, self.lagControl.value(), self.addOrReplaceButton.isChecked())
 
-        return dfc
+    def store_params(self, params):
+        self.lag_column = params.column
+        self.lag_size = params.lag_size
 
     def update_ui(self):
         self.onoff_signals(activate=False)
@@ -132,8 +117,9 @@ class Node_Lag(BaseInOutNode):
     def serialize(self):
         res = super().serialize()
 
-        res['lag_column'] = self.targetColumn.currentText()
+        res['lag_column'] = self.targetColumn.currentText() or self.lag_column
         res['lag_size'] = self.lagControl.value()
+        res['replace'] = self.addOrReplaceButton.isChecked()
 
         return res
 
@@ -143,6 +129,10 @@ class Node_Lag(BaseInOutNode):
             self.lag_column = data['lag_column']
             self.lag_size = data['lag_size']
 
+            self.onoff_signals(activate=False)
+            self.addOrReplaceButton.setChecked(data.get('replace', False))
+            self.onoff_signals(activate=True)
+
             return True & res
         except Exception as e:
             dumpException(e)
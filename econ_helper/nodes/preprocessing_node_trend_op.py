@@ -1,8 +1,6 @@
 from econ_helper.eh_conf import *
 from econ_helper.nodes.base_node_inout import *
 
-import statsmodels.tools.tools as sm_tools
-import statsmodels.api as sm
 from pandas.api.types import is_numeric_dtype
 
 
@@ -39,32 +37,14 @@ class Node_Filter(BaseInOutNode):
             self.targetColumn.currentIndexChanged.disconnect(self.targetColumnChanged)
             self.addOrReplaceButton.toggled.disconnect(self.targetColumnChanged)
 
-    def main_node_operation(self, df):
+    def read_params(self, df):
         column = self.targetColumn.currentText()
-        replace = self.addOrReplaceButton.isChecked()
         if column == '' or column not in df.columns:
             column = self.trend_column
+        return kernels.TrendParams(column, self.addOrReplaceButton.isChecked())
 
-        self.trend_column = column if (column != '' and column in df.columns) else None
-
-        if column == '' or column not in df.columns:
-            return None
-
-        x = list(range(df[column].shape[0]))
-        new_column = column + ' ' + self.operation_name
-        x = sm_tools.add_constant(x)  # Add constant
-        ols_model = sm.OLS(df[column], x)  # Initialize model
-        ols_result = ols_model.fit()  # Fit model
-        trend_data = ols_result.predict(x)
-
-        dfc = df.copy()
-        dfc.insert(0, new_column, trend_data)
-        if replace:
-            dfc = dfc.drop(columns=[column])
-
-        self.trend_column = column
-
-        return dfc
+    def store_params(self, params):
+        self.trend_column = params.column
 
     def update_ui(self):
         self.onoff_signals(activate=False)
@@ -120,7 +100,8 @@ class Node_Filter(BaseInOutNode):
     def serialize(self):
         res = super().serialize()
 
-        res['trend_column'] = self.targetColumn.currentText()
+        res['trend_column'] = self.targetColumn.currentText() or self.trend_column
+        res['replace'] = self.addOrReplaceButton.isChecked()
 
         return res
 
@@ -129,6 +110,10 @@ class Node_Filter(BaseInOutNode):
         try:
             self.trend_column = data['trend_column']
 
+            self.onoff_signals(activate=False)
+            self.addOrReplaceButton.setChecked(data.get('replace', False))
+            self.onoff_signals(activate=True)
+
             return True & res
         except Exception as e:
             dumpException(e)
@@ -0,0 +1,160 @@
+from econ_helper.eh_conf import *
+from econ_helper.nodes.base_node_inout import *
+from pandas.api.types import is_numeric_dtype
+
+
+def parse_knots(text):
+    """ Rows from a text like '52, 104', None when the text is not valid """
+    try:
+        return sorted({int(part) for part in text.replace(' ', '').split(',') if part != ''})
+    except ValueError:
+        return None
+
+
+@register_node('trend_panel', NODE_TYPE_PREPROCESSING)
+class Node_TrendPanel(BaseInOutNode):
+    """ Trends of several columns fitted together, see kernels.trend_panel """
+    op_code = 'trend_panel'
+    type_code = NODE_TYPE_PREPROCESSING
+    op_title = 'Trend Panel'
+    content_label_objname = 'node_trend_panel'
+
+    def __init__(self, scene, default_node_text='Trend on'):
+        self.trend_columns = []
+        self.degree = 1
+        self.knots = []
+        self.detrend = False
+
+        #GUI
+        self.labelColumns = QLabel('Trend on columns')
+        self.columnList = QListWidget()
+
+        self.labelDegree = QLabel('Polynomial degree')
+        self.degreeControl = QSpinBox()
+        self.degreeControl.setMinimum(1)
+        self.degreeControl.setMaximum(5)
+
+        self.labelKnots = QLabel('Rows where the slope changes, e.g. 52, 104')
+        self.knotsEdit = QLineEdit()
+
+        self.detrendButton = QPushButton('Subtract the trend')
+        self.detrendButton.setCheckable(True)
+
+        self.onoff_signals(activate=True)
+
+        super().__init__(scene, default_node_text)
+
+    def onoff_signals(self, activate=True):
+        if activate:
+            self.columnList.itemChanged.connect(self.settingsChanged)
+            self.degreeControl.valueChanged.connect(self.settingsChanged)
+            self.knotsEdit.editingFinished.connect(self.settingsChanged)
+            self.detrendButton.toggled.connect(self.settingsChanged)
+        else:
+            self.columnList.itemChanged.disconnect(self.settingsChanged)
+            self.degreeControl.valueChanged.disconnect(self.settingsChanged)
+            self.knotsEdit.editingFinished.disconnect(self.settingsChanged)
+            self.detrendButton.toggled.disconnect(self.settingsChanged)
+
+    def read_params(self, df):
+        columns = [self.columnList.item(i).text() for i in range(self.columnList.count())
+                   if self.columnList.item(i).checkState() == Qt.Checked]
+        if self.columnList.count() == 0:
+            # widgets are populated after the first evaluation, use stored settings
+            columns = list(self.trend_columns)
+
+        knots = parse_knots(self.knotsEdit.text())
+        if knots is None:
+            knots = list(self.knots)
+
+        return kernels.TrendPanelParams(tuple(columns), self.degreeControl.value(), tuple(knots),
+                                        self.detrendButton.isChecked())
+
+    def store_params(self, params):
+        self.trend_columns = list(params.columns)
+        self.degree = params.degree
+        self.knots = list(params.knots)
+        self.detrend = params.detrend
+
+    def update_ui(self):
+        self.onoff_signals(activate=False)
+
+        self.columnList.clear()
+        if self.input_value is not None:
+            for column in self.input_value.columns:
+                if not is_numeric_dtype(self.input_value[column]):
+                    continue
+                self.columnList.addItem(column)
+                w = self.columnList.item(self.columnList.count() - 1)
+                w.setFlags(w.flags() | Qt.ItemIsUserCheckable)
+                w.setCheckState(Qt.Checked if column in self.trend_columns else Qt.Unchecked)
+        else:
+            self.markInvalid(error_message='Input is not connected')
+
+        self.degreeControl.setValue(self.degree)
+        self.knotsEdit.setText(', '.join(str(knot) for knot in self.knots))
+        self.detrendButton.setChecked(self.detrend)
+
+        if len(self.trend_columns) == 0:
+            self.markInvalid(error_message='Select columns')
+
+        if not self.isInvalid():
+            new_text = f'{self.content.default_node_text} {len(self.trend_columns)} columns, degree {self.degree}'
+            if len(self.knots) > 0:
+                new_text += f', knots {self.knotsEdit.text()}'
+            self.content.edit.setText(new_text)
+
+        self.onoff_signals(activate=True)
+
+    def settingsChanged(self):
+        self.markInvalid()
+        self.eval()
+        self.update_ui()
+
+    def create_settings_widget(self):
+        w = QWidget()
+        lo = QVBoxLayout(w)
+
+        lo.addWidget(self.labelColumns)
+        lo.addWidget(self.columnList)
+        lo.addWidget(self.labelDegree)
+        lo.addWidget(self.degreeControl)
+        lo.addWidget(self.labelKnots)
+        lo.addWidget(self.knotsEdit)
+        lo.addWidget(self.detrendButton)
+
+        vertSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        lo.addItem(vertSpacer)
+
+        w.setLayout(lo)
+
+        return w
+
+    def serialize(self):
+        res = super().serialize()
+
+        res['trend_columns'] = self.trend_columns
+        res['degree'] = self.degree
+        res['knots'] = self.knots
+        res['detrend'] = self.detrend
+
+        return res
+
+    def deserialize(self, data, hashmap={}, restore_id=True, **kwargs):
+        res = super().deserialize(data, hashmap)
+        try:
+            self.trend_columns = data['trend_columns']
+            self.degree = data.get('degree', 1)
+            self.knots = data.get('knots', [])
+            self.detrend = data.get('detrend', False)
+
+            self.onoff_signals(activate=False)
+            self.degreeControl.setValue(self.degree)
+            self.knotsEdit.setText(', '.join(str(knot) for knot in self.knots))
+            self.detrendButton.setChecked(self.detrend)
+            self.onoff_signals(activate=True)
+
+            return True & res
+        except Exception as e:
+            dumpException(e)
+        return res
@@ -1,7 +1,6 @@
 from econ_helper.eh_conf import register_node, NODE_TYPE_PREPROCESSING
 from econ_helper.nodes.base_node_inout import *
 
-import numpy as np
 from pandas.api.types import is_numeric_dtype
 
 
@@ -16,7 +15,7 @@ class Node_UnaryOp(BaseInOutNode):
 
     def __init__(self, scene, default_node_text='Unary op on'):
 
-        self.available_ops = ['log', 'negate']
+        self.available_ops = kernels.UNARY_OPS
         self.op_column = None
         self.op_operation = None
 
@@ -47,48 +46,18 @@ class Node_UnaryOp(BaseInOutNode):
             self.operationCombo.currentIndexChanged.disconnect(self.targetColumnChanged)
             self.addOrReplaceButton.toggled.disconnect(self.targetColumnChanged)
 
-    def main_node_operation(self, df):
+    def read_params(self, df):
         column = self.targetColumn.currentText()
-        op = self.operationCombo.currentText()
-        replace = self.addOrReplaceButton.isChecked()
-
         if column == '' or column not in df.columns:
             column = self.op_column
-
+        op = self.operationCombo.currentText()
         if op == '':
             op = self.op_operation
+        return kernels.UnaryParams(column, op, self.addOrReplaceButton.isChecked())
 
-        self.op_column = column if (column != '' and column in df.columns) else None
-        self.op_operation = op if op != '' else None
-
-        if column == '' or column not in df.columns:
-            return None
-
-        self.op_column = column
-
-        self.operation_name = op
-        new_column = None
-        new_value = None
-        if op == 'log':
-            new_column = f'{self.operation_name}({column})'
-            new_value = np.log(df[column]).fillna(0)
-        elif op == 'negate':
-            new_column = f'{self.operation_name}({column})'
-            new_value = -1 * df[column]
-        else:
-            pass
-
-        dfc = df.copy()
-
-        if new_column is not None and new_value is not None:
-            dfc.insert(0, new_column, new_value)
-            if replace:
-                dfc = dfc.drop(columns=[column])
-
-#        self.op_column = column
-#        self.op_operation = op
-
-        return dfc
+    def store_params(self, params):
+        self.op_column = params.column
+        self.op_operation = params.op
 
     def update_ui(self):
         self.onoff_signals(activate=False)
@@ -160,8 +129,9 @@ class Node_UnaryOp(BaseInOutNode):
     def serialize(self):
         res = super().serialize()
 
-        res['op_column'] = self.targetColumn.currentText()
+        res['op_column'] = self.targetColumn.currentText() or self.op_column
         res['op'] = self.operationCombo.currentText()
+        res['replace'] = self.addOrReplaceButton.isChecked()
 
         return res
 
@@ -171,6 +141,10 @@ class Node_UnaryOp(BaseInOutNode):
             self.op_column = data['op_column']
             self.op_operation = data['op']
 
+            self.onoff_signals(activate=False)
+            self.addOrReplaceButton.setChecked(data.get('replace', False))
+            self.onoff_signals(activate=True)
+
             return True & res
         except Exception as e:
             dumpException(e)
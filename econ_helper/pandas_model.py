@@ -1,41 +1,136 @@
+from collections import OrderedDict
+
 from PyQt5 import QtCore
 import numbers
 
-import pandas as pd
+import numpy as np
 from PyQt5.QtGui import *
+from PyQt5.QtWidgets import QHeaderView, QStyle
+
+# cells measured for a column width, from the head, the tail and at random each
+WIDTH_SAMPLE_ROWS = 100
+
+
+def _format_cells(items):
+    """ Texts of the cells and whether each holds a number """
+    texts, flags = [], []
+    for item in items:
+        is_number = isinstance(item, numbers.Number)
+        texts.append(f'{item:.4f}' if is_number else str(item))
+        flags.append(is_number)
+    return texts, flags
 
 
 class PandasModel(QtCore.QAbstractTableModel):
+    """ Table model over a DataFrame
+
+    Cells are formatted a block of rows of one column at a time and the
+    formatted blocks are kept, so repainting and scrolling don't go through
+    DataFrame.iloc per cell. Numeric columns are formatted from their NumPy
+    array. Rows are handed to the view in batches (fetchMore), so a long frame
+    is not laid out all at once.
+    """
+
+    # rows added to the view when it scrolls to the end
+    FETCH_ROWS = 10000
+    # rows of one column formatted together
+    BLOCK_ROWS = 512
+    # formatted blocks kept, least recently shown ones are dropped
+    MAX_BLOCKS = 512
 
     def __init__(self, data=None):
         QtCore.QAbstractTableModel.__init__(self)
-        self._data = data
         self.paint_callback = None
+        self._reset_data(data)
 
     def set_paint_callback(self, callback):
         self.paint_callback = callback
 
     def set_data(self, data=None):
+        self.beginResetModel()
+        self._reset_data(data)
+        self.endResetModel()
+
+    def _reset_data(self, data):
         self._data = data
+        # column -> (values, kind), see _column
+        self._columns = {}
+        # (column, block) -> (texts, flags telling numbers apart), None flags when all are numbers
+        self._blocks = OrderedDict()
+        self._fetched_rows = 0 if data is None else min(data.shape[0], self.FETCH_ROWS)
+
+    def _column(self, column):
+        """ Values of the column as cells show them: kind 'number' when all are plain numbers,
+        'array' for a NumPy array holding the cell values, 'series' when the values are boxed by pandas
+        """
+        values = self._columns.get(column)
+        if values is None:
+            series = self._data.iloc[:, column]
+            dtype = series.dtype
+            if isinstance(dtype, np.dtype) and dtype.kind in 'iuf':
+                values = (series.to_numpy(), 'number')
+            elif isinstance(dtype, np.dtype) and dtype.kind in 'bO':
+                # numpy.bool_ is not a numbers.Number, bool is shown as text
+                values = (series.to_numpy(), 'array')
+            else:
+                # datetimes, nullable and categorical columns
+                values = (series, 'series')
+            self._columns[column] = values
+        return values
+
+    def _block(self, column, block):
+        key = (column, block)
+        cached = self._blocks.get(key)
+        if cached is not None:
+            self._blocks.move_to_end(key)
+            return cached
+
+        cached = self._texts(column, slice(block * self.BLOCK_ROWS, (block + 1) * self.BLOCK_ROWS))
+
+        self._blocks[key] = cached
+        if len(self._blocks) > self.MAX_BLOCKS:
+            self._blocks.popitem(last=False)
+        return cached
+
+    def _texts(self, column, rows):
+        values, kind = self._column(column)
+        if kind == 'number':
+            return [f'{item:.4f}' for item in values[rows].tolist()], None
+        return _format_cells(values.iloc[rows].tolist() if kind == 'series' else values[rows])
+
+    def column_key(self, column):
+        """ Identifies the column across frames: its name and dtype """
+        return self._data.columns[column], str(self._data.dtypes.iloc[column])
+
+    def sample_texts(self, column, count=WIDTH_SAMPLE_ROWS):
+        """ Texts of the first, the last and of random cells of the column, the same ones on every call """
+        size = self._data.shape[0]
+        if size <= 3 * count:
+            rows = np.arange(size)
+        else:
+            picked = np.random.default_rng(column).integers(count, size - count, count)
+            rows = np.unique(np.concatenate([np.arange(count), picked, np.arange(size - count, size)]))
+        return self._texts(column, rows)[0]
 
+    def is_number(self, row, column):
+        flags = self._block(column, row // self.BLOCK_ROWS)[1]
+        return flags is None or flags[row % self.BLOCK_ROWS]
 
     def default_paint_callback(self, row, column):
         if self._data is None:
             return
-        value = self._data.iloc[row, column]
 
         color = QColor('darkGray')
 
-        if not isinstance(value, numbers.Number):
+        if not self.is_number(row, column):
             brush = QBrush(color)
             return brush
 
         return
 
-
     def rowCount(self, parent=None, **kwargs):
         if self._data is not None:
-            return self._data.shape[0]
+            return self._fetched_rows
         else:
             return 0
 
@@ -45,14 +140,24 @@ class PandasModel(QtCore.QAbstractTableModel):
         else:
             return 0
 
+    def canFetchMore(self, parent):
+        if self._data is None or parent.isValid():
+            return False
+        return self._fetched_rows < self._data.shape[0]
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        rows = min(self._data.shape[0], self._fetched_rows + self.FETCH_ROWS)
+        self.beginInsertRows(QtCore.QModelIndex(), self._fetched_rows, rows - 1)
+        self._fetched_rows = rows
+        self.endInsertRows()
+
     def data(self, index, role=QtCore.Qt.DisplayRole):
         if index.isValid():
             if role == QtCore.Qt.DisplayRole:
-                item = self._data.iloc[index.row(), index.column()]
-                if isinstance(item, numbers.Number):
-                    return f'{item:.4f}'
-
-                return str(item)
+                row = index.row()
+                return self._block(index.column(), row // self.BLOCK_ROWS)[0][row % self.BLOCK_ROWS]
             if role == QtCore.Qt.BackgroundRole:
                 if self.paint_callback is not None:
                     return self.paint_callback(index.row(), index.column())
@@ -68,3 +173,28 @@ class PandasModel(QtCore.QAbstractTableModel):
         return None
 
 
+def adjust_column_widths(table, widths):
+    """ Sizes the columns of table to a sample of their cells, see PandasModel.sample_texts
+
+    Unlike QHeaderView.ResizeToContents not every row is measured. widths keeps
+    {PandasModel.column_key: width} between calls, only columns not seen before
+    are measured.
+    """
+    model = table.model()
+    if not isinstance(model, PandasModel) or model.columnCount() == 0:
+        return
+    header = table.horizontalHeader()
+    metrics = table.fontMetrics()
+    # cell margins as QTableView adds them for its size hint
+    margin = 2 * (table.style().pixelMetric(QStyle.PM_FocusFrameHMargin, None, table) + 1) + int(table.showGrid())
+    for column in range(model.columnCount()):
+        key = model.column_key(column)
+        width = widths.get(key)
+        if width is None:
+            texts = model.sample_texts(column)
+            width = max([metrics.horizontalAdvance(text) for text in texts] + [0]) + margin
+            width = max(width, header.sectionSizeHint(column))
+            widths[key] = width
+        if header.sectionResizeMode(column) != QHeaderView.Interactive:
+            header.setSectionResizeMode(column, QHeaderView.Interactive)
+        header.resizeSection(column, width)
@@ -0,0 +1,84 @@
+"""
+Evaluates a saved graph without the GUI.
+
+    python -m econ_helper.run graph.ehp --input data.xlsx --output result.parquet
+
+With --chunksize, chains of lag, adstock, unary, binary and filter nodes below
+CSV, Parquet and Feather sources are evaluated a chunk of rows at a time, and
+their results are written as they are computed when the output is CSV, Parquet
+or Feather. Inputs larger than memory can be processed this way.
+"""
+import argparse
+import logging
+import sys
+
+from econ_helper import eh_batch
+from econ_helper.eh_cache import ResultCache, DiskCache
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m econ_helper.run',
+                                     description='Evaluate a graph saved by Econometrics Helper')
+    parser.add_argument('graph', help='graph file saved from the editor (.ehp project or legacy .json)')
+    parser.add_argument('--input', '-i',
+                        help='data file (.xlsx, .csv, .parquet, .feather) replacing the data saved in the graph')
+    parser.add_argument('--output', '-o', required=True,
+                        help='result file, the format is taken from the extension (.parquet, .feather, .csv, .xlsx, .json)')
+    parser.add_argument('--chunksize', type=int,
+                        help='rows per chunk when evaluating row-local chains below file sources')
+    parser.add_argument('--cache-dir',
+                        help='directory keeping node results between runs, can be shared by parallel runs')
+    parser.add_argument('--allow-pickle', action='store_true',
+                        help='read pickled datasets of projects saved by earlier versions, only for trusted files')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='[%(levelname)s][%(module)s:%(funcName)s:%(lineno)d] %(message)s')
+
+    if args.chunksize is not None and args.chunksize <= 0:
+        logging.error('--chunksize must be positive')
+        return 1
+
+    cache = ResultCache(disk=DiskCache(args.cache_dir)) if args.cache_dir else None
+    writer = None
+    try:
+        data, datasets = eh_batch.load_graph(args.graph, args.allow_pickle)
+        sheets = eh_batch.read_input(args.input) if args.input else None
+        if args.chunksize and sheets is not None:
+            logging.warning('--chunksize is ignored with --input, the input is read at once')
+        if args.chunksize and sheets is None and eh_batch.ChunkWriter.supports(args.output):
+            names = eh_batch.result_names(eh_batch.parse_graph(data))
+            writer = eh_batch.ChunkWriter(args.output, names.values())
+
+        nodes, outputs = eh_batch.evaluate_graph(data, sheets, cache, datasets, args.chunksize, writer)
+        results = eh_batch.collect_results(nodes, outputs)
+        if writer is not None:
+            for name, df in results.items():
+                writer.write(name, df)
+            written = writer.close()
+        else:
+            written = eh_batch.write_output(results, args.output) if len(results) > 0 else []
+        if len(written) == 0:
+            logging.error('graph produced no results')
+            return 1
+        for fname in written:
+            logging.info(f'written {fname}')
+    except Exception as e:
+        logging.error(e)
+        return 1
+    finally:
+        if writer is not None:
+            writer.close()
+        if cache is not None:
+            cache.disable_disk()
+
+    failed = len(nodes) - len(outputs) - sum(1 for n in nodes.values() if n.op_code in eh_batch.SKIPPED)
+    return 2 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -48,8 +48,8 @@ class StatusWidget(QWidget):
             else:
                 self.splitter.addWidget(node.output_widget)
 
-            self.splitter.setSizes([self.splitter.size().width() * 0.30,
-                                    self.splitter.size().width() * 0.70])
+            self.splitter.setSizes([int(self.splitter.size().width() * 0.30),
+                                    int(self.splitter.size().width() * 0.70)])
             self.layout.addWidget(self.splitter)
 
         self.layout.update()
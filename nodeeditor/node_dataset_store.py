@@ -0,0 +1,66 @@
+from collections.abc import Mapping
+
+
+class DatasetStore():
+    """ Content-addressed storage for the data history stamps refer to
+
+    Nodes put their heavy payloads here under a content hash and keep only the
+    hash in their history state, so a payload is stored once no matter how many
+    stamps refer to it.
+
+    A source (e.g. the project file the scene was loaded from) provides the
+    datasets that are not in memory yet, they are read on first access.
+    """
+    def __init__(self):
+        self._items = {}
+        self.source = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items or (self.source is not None and key in self.source)
+
+    def put(self, key, value):
+        self._items.setdefault(key, value)
+        return key
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is None and self.source is not None and key in self.source:
+            value = self.source.get(key)
+            if value is not None:
+                self._items[key] = value
+        return value
+
+    def peek(self, key):
+        """ The dataset if it is in memory, the source is not read """
+        return self._items.get(key)
+
+    def view(self, refs):
+        """ {name: dataset} for refs {name: key}, datasets are loaded when they are accessed """
+        return DatasetView(self, refs)
+
+    def retain(self, keys):
+        """ Drops everything that is not in keys, the source can provide it again """
+        keys = set(keys)
+        for key in [k for k in self._items if k not in keys]:
+            del self._items[key]
+
+    def clear(self):
+        self._items.clear()
+
+
+class DatasetView(Mapping):
+    def __init__(self, store, refs):
+        self.store = store
+        self.refs = dict(refs)
+
+    def __getitem__(self, name):
+        return self.store.get(self.refs[name])
+
+    def __iter__(self):
+        return iter(self.refs)
+
+    def __len__(self):
+        return len(self.refs)
@@ -44,6 +44,9 @@ class Edge(Serializable):
         if self.start_socket is not None:
             self.start_socket.addEdge(self)
 
+        # connections changed, evaluation order has to be rebuilt
+        self.scene.controller.invalidateOrder()
+
     @property
     def end_socket(self): return self._end_socket
 
@@ -59,6 +62,9 @@ class Edge(Serializable):
         if self.end_socket is not None:
             self.end_socket.addEdge(self)
 
+        # connections changed, evaluation order has to be rebuilt
+        self.scene.controller.invalidateOrder()
+
     @property
     def edge_type(self): return self._edge_type
 
@@ -11,6 +11,8 @@ from nodeeditor.node_scene import Scene, InvalidFile
 
 
 class NodeEditorWidget(QWidget):
+    scene_class = Scene
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -25,7 +27,7 @@ class NodeEditorWidget(QWidget):
         self.setLayout(self.layout)
 
         # crate graphics scene
-        self.scene = Scene()
+        self.scene = self.__class__.scene_class()
 
         # create graphics view
         self.view = QDMGraphicsView(self.scene.grScene, self)
@@ -117,6 +117,9 @@ class NodeEditorWindow(QMainWindow):
     def onScenePosChanged(self, x, y):
         self.status_mouse_pos.setText("Scene Pos: [%d, %d]" % (x, y))
 
+    def getFileDialogFilter(self):
+        return 'Graph (*.json);;All files (*)'
+
     def onFileNew(self):
         if self.maybeSave():
             self.getCurrentNodeEditorWidget().fileNew()
@@ -125,7 +128,7 @@ class NodeEditorWindow(QMainWindow):
 
     def onFileOpen(self):
         if self.maybeSave():
-            fname, filter = QFileDialog.getOpenFileName(self, 'Open graph from file')
+            fname, filter = QFileDialog.getOpenFileName(self, 'Open graph from file', filter=self.getFileDialogFilter())
             if fname != '' and os.path.isfile(fname):
                 self.getCurrentNodeEditorWidget().fileLoad(fname)
                 self.setTitle()
@@ -146,7 +149,7 @@ class NodeEditorWindow(QMainWindow):
     def onFileSaveAs(self):
         current_nodeeditor = self.getCurrentNodeEditorWidget()
         if current_nodeeditor is not None:
-            fname, filter = QFileDialog.getSaveFileName(self, 'Save graph to file')
+            fname, filter = QFileDialog.getSaveFileName(self, 'Save graph to file', filter=self.getFileDialogFilter())
             if fname == '': return False
 
             current_nodeeditor.fileSave(fname)
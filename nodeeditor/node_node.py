@@ -193,24 +193,31 @@ class Node(Serializable):
         pass
 
     def markChildrenDirty(self, new_value=True):
-        for other_node in self.getChildrenNodes():
-            # logging.debug(f"Node {self.__class__.__name__} marked dirty its child "
-            #               f"{other_node.__class__.__name__}, v={new_value}")
+        # mark all children first, the scene controller evaluates them in a single pass afterwards
+        with self.scene.controller.deferred():
+            for other_node in self.getChildrenNodes():
+                # logging.debug(f"Node {self.__class__.__name__} marked dirty its child "
+                #               f"{other_node.__class__.__name__}, v={new_value}")
 
-            other_node.markDirty(new_value)
+                other_node.markDirty(new_value)
 
     def markDescendantsDirty(self, new_value=True):
-        for other_node in self.getChildrenNodes():
-            # logging.debug(f"Node {self.__class__.__name__} marked dirty its descendant "
-            #               f"{other_node.__class__.__name__}, v={new_value}")
-            other_node.markDirty(new_value)
-            # logging.debug(f"Node {self.__class__.__name__} marked dirty its descendant child "
-            #               f"{other_node.__class__.__name__}, v={new_value}")
-            other_node.markChildrenDirty(new_value)
+        with self.scene.controller.deferred():
+            for other_node in self.getChildrenNodes():
+                # logging.debug(f"Node {self.__class__.__name__} marked dirty its descendant "
+                #               f"{other_node.__class__.__name__}, v={new_value}")
+                other_node.markDirty(new_value)
+                # logging.debug(f"Node {self.__class__.__name__} marked dirty its descendant child "
+                #               f"{other_node.__class__.__name__}, v={new_value}")
+                other_node.markChildrenDirty(new_value)
 
     def isInvalid(self):
         return self._is_invalid
 
+    def isPending(self):
+        """ True while the node computes its output asynchronously """
+        return False
+
     def markInvalid(self, new_value=True, error_message='Something went wrong'):
         self._is_invalid = new_value
         if self._is_invalid:
@@ -240,6 +247,10 @@ class Node(Serializable):
         self.markInvalid(False)
         return 0
 
+    def onEvaluated(self):
+        """ Called by the scene controller right after the node was evaluated in a pass """
+        pass
+
     def evalChildren(self):
         for node in self.getChildrenNodes():
             node.eval()
@@ -320,6 +331,28 @@ class Node(Serializable):
             ('content', self.content.serialize()),
         ])
 
+    def serializeState(self):
+        """ Node state for the undo history and project files, heavy data goes to scene.datasets and is referenced by key """
+        return self.serialize()
+
+    def restoreState(self, data, hashmap={}):
+        """ Applies a history state to this live node, its sockets and edges stay in place """
+        res = self.deserialize(data, hashmap, restore_id=True)
+        self.updateConnectedEdges()
+        self.markDirty()
+        self.markDescendantsDirty()
+        return res
+
+    def reuseSocket(self, old_sockets, socket_data, is_input, count_on_this_node_side):
+        socket = old_sockets.get(socket_data['id'])
+        if socket is None or socket.is_input != is_input \
+                or socket.index != socket_data['index'] or socket.position != socket_data['position']:
+            return None
+        del old_sockets[socket_data['id']]
+        socket.count_on_this_node_side = count_on_this_node_side
+        socket.setSocketPosition()
+        return socket
+
     def deserialize(self, data, hashmap={}, restore_id=True):
         try:
             if restore_id: self.id = data['id']
@@ -333,21 +366,31 @@ class Node(Serializable):
             num_inputs = len( data['inputs'] )
             num_outputs = len( data['outputs'] )
 
+            # sockets with the same id are kept, so are the edges connected to them
+            old_sockets = {socket.id: socket for socket in self.inputs + self.outputs}
+
             self.inputs = []
             for socket_data in data['inputs']:
-                new_socket = Socket(node=self, index=socket_data['index'], position=socket_data['position'],
-                                    socket_type=socket_data['socket_type'], count_on_this_node_side=num_inputs,
-                                    is_input=True)
+                new_socket = self.reuseSocket(old_sockets, socket_data, True, num_inputs) if restore_id else None
+                if new_socket is None:
+                    new_socket = Socket(node=self, index=socket_data['index'], position=socket_data['position'],
+                                        socket_type=socket_data['socket_type'], count_on_this_node_side=num_inputs,
+                                        is_input=True)
                 new_socket.deserialize(socket_data, hashmap, restore_id)
                 self.inputs.append(new_socket)
 
             self.outputs = []
             for socket_data in data['outputs']:
-                new_socket = Socket(node=self, index=socket_data['index'], position=socket_data['position'],
-                                    socket_type=socket_data['socket_type'], count_on_this_node_side=num_outputs,
-                                    is_input=False)
+                new_socket = self.reuseSocket(old_sockets, socket_data, False, num_outputs) if restore_id else None
+                if new_socket is None:
+                    new_socket = Socket(node=self, index=socket_data['index'], position=socket_data['position'],
+                                        socket_type=socket_data['socket_type'], count_on_this_node_side=num_outputs,
+                                        is_input=False)
                 new_socket.deserialize(socket_data, hashmap, restore_id)
                 self.outputs.append(new_socket)
+
+            for socket in old_sockets.values():
+                socket.remove()
         except Exception as e: dumpException(e)
 
         # also deseralize the content of the node
@@ -11,6 +11,7 @@ from nodeeditor.node_graphics_scene import QDMGraphicsScene
 from nodeeditor.node_node import Node
 from nodeeditor.node_edge import Edge
 from nodeeditor.node_scene_history import SceneHistory
+from nodeeditor.node_dataset_store import DatasetStore
 from nodeeditor.node_scene_clipboard import SceneClipboard
 
 
@@ -39,6 +40,7 @@ class Scene(Serializable):
         self.node_class_selector = None
 
         self.initUI()
+        self.datasets = DatasetStore()
         self.history = SceneHistory(self)
         self.clipboard = SceneClipboard(self)
 
@@ -48,9 +50,6 @@ class Scene(Serializable):
 
         self.controller = SceneController(self)
 
-        self.addHasBeenModifiedListener(self.controller.scene_changed)
-
-
     def initUI(self):
         self.grScene = QDMGraphicsScene(self)
         self.grScene.setGrScene(self.scene_width, self.scene_height)
@@ -131,20 +130,24 @@ class Scene(Serializable):
 
     def addNode(self, node):
         self.nodes.append(node)
+        self.controller.invalidateOrder()
 
     def addEdge(self, edge):
         self.edges.append(edge)
+        self.controller.invalidateOrder()
 
 
     def removeNode(self, node):
         if node in self.nodes:
             self.nodes.remove(node)
+            self.controller.invalidateOrder()
         else:
             logging.debug(f"Scene::removeNode wanna remove node {node} from self.nodes but it's not in the list!")
 
     def removeEdge(self, edge):
         if edge in self.edges:
             self.edges.remove(edge)
+            self.controller.invalidateOrder()
         else:
             logging.debug(f"Scene::removeEdge wanna remove edge {edge} from self.edges but it's not in the list!")
 
@@ -175,6 +178,17 @@ class Scene(Serializable):
             except Exception as e:
                 dumpException(e)
 
+    def getItemIndex(self):
+        """ {id: object} for the nodes, sockets and edges of the scene """
+        index = {}
+        for node in self.nodes:
+            index[node.id] = node
+            for socket in node.inputs + node.outputs:
+                index[socket.id] = socket
+        for edge in self.edges:
+            index[edge.id] = edge
+        return index
+
     def setNodeClassSelector(self, class_selecting_function):
         """ When the function self.node_class_selector is set, we can use different Node Classes """
         self.node_class_selector = class_selecting_function
@@ -198,27 +212,43 @@ class Scene(Serializable):
             ('edges', edges),
         ])
 
-    def deserialize(self, data, hashmap={}, restore_id=True):
-        self.clear()
-        hashmap = {}
-
-        if restore_id: self.id = data['id']
-
-        # create nodes
-        for node_data in data['nodes']:
-            #classtype = self.getNodeClassFromData(node_data)
-            #c = classtype(self)
-            #c.deserialize(node_data, hashmap, restore_id)
-            #self.addNode(c)
-
-            try:
-                self.getNodeClassFromData(node_data)(self).deserialize(node_data, hashmap, restore_id)
-            except Exception as e:
-                logging.error(e)
-                traceback.print_tb(e.__traceback__)
+    def serializeState(self):
+        """ Like serialize, with the heavy node data referenced by key in self.datasets """
+        nodes, edges = [], []
+        # node.serialize is not called, it would encode the data only to drop it
+        for node in self.nodes: nodes.append(node.serializeState())
+        for edge in self.edges: edges.append(edge.serialize())
+        return OrderedDict([
+            ('id', self.id),
+            ('scene_width', self.scene_width),
+            ('scene_height', self.scene_height),
+            ('nodes', nodes),
+            ('edges', edges),
+        ])
 
-        # create edges
-        for edge_data in data['edges']:
-            Edge(self).deserialize(edge_data, hashmap, restore_id)
+    def deserialize(self, data, hashmap={}, restore_id=True):
+        # evaluate once the whole graph is restored, not after every created node
+        with self.controller.deferred():
+            self.clear()
+            hashmap = {}
+
+            if restore_id: self.id = data['id']
+
+            # create nodes
+            for node_data in data['nodes']:
+                #classtype = self.getNodeClassFromData(node_data)
+                #c = classtype(self)
+                #c.deserialize(node_data, hashmap, restore_id)
+                #self.addNode(c)
+
+                try:
+                    self.getNodeClassFromData(node_data)(self).deserialize(node_data, hashmap, restore_id)
+                except Exception as e:
+                    logging.error(e)
+                    traceback.print_tb(e.__traceback__)
+
+            # create edges
+            for edge_data in data['edges']:
+                Edge(self).deserialize(edge_data, hashmap, restore_id)
 
         return True
\ No newline at end of file
@@ -87,20 +87,21 @@ class SceneClipboard():
         offset_x = mouse_scene_pos.x() - bbox_center_x
         offset_y = mouse_scene_pos.y() - bbox_center_y
 
-        # create each node
-        for node_data in data['nodes']:
-            new_node = self.scene.getNodeClassFromData(node_data)(self.scene)
-            new_node.deserialize(node_data, hashmap, )
-
-            # readjust the new node's position
-            pos = new_node.pos
-            new_node.setPos(pos.x() + offset_x, pos.y() + offset_y)
-
-        # create each edge
-        if 'edges' in data:
-            for edge_data in data['edges']:
-                new_edge = Edge(self.scene)
-                new_edge.deserialize(edge_data, hashmap, restore_id=False)
+        with self.scene.controller.deferred():
+            # create each node
+            for node_data in data['nodes']:
+                new_node = self.scene.getNodeClassFromData(node_data)(self.scene)
+                new_node.deserialize(node_data, hashmap, )
+
+                # readjust the new node's position
+                pos = new_node.pos
+                new_node.setPos(pos.x() + offset_x, pos.y() + offset_y)
+
+            # create each edge
+            if 'edges' in data:
+                for edge_data in data['edges']:
+                    new_edge = Edge(self.scene)
+                    new_edge.deserialize(edge_data, hashmap, restore_id=False)
 
         # store history
         self.scene.history.storeHistory("Pasted elements in scene", setModified=True)
\ No newline at end of file
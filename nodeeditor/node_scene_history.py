@@ -1,11 +1,23 @@
 import logging
+from collections import OrderedDict
+from nodeeditor.node_edge import Edge
 from nodeeditor.node_graphics_edge import QDMGraphicsEdge
 from nodeeditor.utils import dumpException
 
 DEBUG = True
 
+# key of a node state listing its datasets, {name: key in scene.datasets}
+DATASET_REFS = 'dataset_refs'
+
 
 class SceneHistory():
+    """ Undo stack of the scene
+
+    The oldest stamp keeps the whole scene state, every later stamp only the
+    nodes and edges that changed since the previous one. Node states come from
+    Node.serializeState, which references large datasets by content key
+    instead of copying them, so a stamp costs as much as the change it records.
+    """
     def __init__(self, scene):
         self.scene = scene
 
@@ -17,6 +29,9 @@ class SceneHistory():
     def clear(self):
         self.history_stack = []
         self.history_current_step = -1
+        self._base_state = None
+        self._current_state = None
+        self.scene.datasets.clear()
 
     def storeInitialHistoryStamp(self):
         self.storeHistory("Initial History Stamp")
@@ -64,7 +79,10 @@ class SceneHistory():
 
         # history is outside of the limits
         if self.history_current_step+1 >= self.history_limit:
+            # the second stamp becomes the new base
+            self._base_state = self.applyDelta(self._base_state, self.history_stack[1]['delta'])
             self.history_stack = self.history_stack[1:]
+            self.history_stack[0]['delta'] = None
             self.history_current_step -= 1
 
         hs = self.createHistoryStamp(desc)
@@ -73,9 +91,65 @@ class SceneHistory():
         self.history_current_step += 1
         logging.debug(f"  -- setting step to: {self.history_current_step}")
 
+        self.releaseDatasets()
+
         # always trigger history modified (for i.e. updateEditMenu)
         for callback in self._history_modified_listeners: callback()
 
+    def captureState(self):
+        scene = self.scene
+        return {
+            'scene': OrderedDict([
+                ('id', scene.id),
+                ('scene_width', scene.scene_width),
+                ('scene_height', scene.scene_height),
+            ]),
+            'nodes': OrderedDict((node.id, node.serializeState()) for node in scene.nodes),
+            'edges': OrderedDict((edge.id, edge.serialize()) for edge in scene.edges),
+        }
+
+    def diffStates(self, old, new):
+        delta = {'scene': new['scene'] if new['scene'] != old['scene'] else None}
+        for kind in ('nodes', 'edges'):
+            old_items, new_items = old[kind], new[kind]
+            delta[kind] = {key: state for key, state in new_items.items() if old_items.get(key) != state}
+            delta[kind + '_removed'] = [key for key in old_items if key not in new_items]
+            # creation order matters when the scene is rebuilt
+            delta[kind + '_order'] = list(new_items) if list(new_items) != list(old_items) else None
+        return delta
+
+    def applyDelta(self, state, delta):
+        result = {'scene': delta['scene'] if delta['scene'] is not None else state['scene']}
+        for kind in ('nodes', 'edges'):
+            items = OrderedDict(state[kind])
+            for key in delta[kind + '_removed']:
+                items.pop(key, None)
+            items.update(delta[kind])
+            if delta[kind + '_order'] is not None:
+                items = OrderedDict((key, items[key]) for key in delta[kind + '_order'])
+            result[kind] = items
+        return result
+
+    def stateAt(self, step):
+        state = self._base_state
+        for history_stamp in self.history_stack[1:step + 1]:
+            state = self.applyDelta(state, history_stamp['delta'])
+        return state
+
+    def releaseDatasets(self):
+        """ Keeps only the datasets some stamp still refers to """
+        keys = set()
+
+        def collect(node_states):
+            for node_state in node_states:
+                keys.update(node_state.get(DATASET_REFS, {}).values())
+
+        if self._base_state is not None:
+            collect(self._base_state['nodes'].values())
+        for history_stamp in self.history_stack:
+            if history_stamp['delta'] is not None:
+                collect(history_stamp['delta']['nodes'].values())
+        self.scene.datasets.retain(keys)
 
     def createHistoryStamp(self, desc):
         sel_obj = {
@@ -88,9 +162,17 @@ class SceneHistory():
             elif isinstance(item, QDMGraphicsEdge):
                 sel_obj['edges'].append(item.edge.id)
 
+        state = self.captureState()
+        if len(self.history_stack) == 0:
+            self._base_state = state
+            delta = None
+        else:
+            delta = self.diffStates(self._current_state, state)
+        self._current_state = state
+
         history_stamp = {
             'desc': desc,
-            'snapshot': self.scene.serialize(),
+            'delta': delta,
             'selection': sel_obj,
         }
 
@@ -100,19 +182,74 @@ class SceneHistory():
         logging.debug(f"RHS: {history_stamp['desc']}")
 
         try:
-            self.scene.deserialize(history_stamp['snapshot'], )
+            state = self.stateAt(self.history_current_step)
+            # compared with the live scene, it can have changes no stamp recorded
+            self.patchScene(self.captureState(), state)
+            self._current_state = state
 
             # restore selection
+            index = self.scene.getItemIndex()
+            self.scene.grScene.clearSelection()
             for edge_id in history_stamp['selection']['edges']:
-                for edge in self.scene.edges:
-                    if edge.id == edge_id:
-                        edge.grEdge.setSelected(True)
-                        break
+                if edge_id in index:
+                    index[edge_id].grEdge.setSelected(True)
 
             for node_id in history_stamp['selection']['nodes']:
-                for node in self.scene.nodes:
-                    if node.id == node_id:
-                        node.grNode.setSelected(True)
-                        break
-
-        except Exception as e: dumpException(e)
\ No newline at end of file
+                if node_id in index:
+                    index[node_id].grNode.setSelected(True)
+
+        except Exception as e: dumpException(e)
+
+    def patchScene(self, old, new):
+        """ Turns the live scene from state old into state new
+
+        Only nodes and edges that differ are touched, the others keep their
+        widgets and computed outputs. A node that only moved is not re-evaluated.
+        """
+        scene = self.scene
+        delta = self.diffStates(old, new)
+        index = scene.getItemIndex()
+
+        with scene.controller.deferred():
+            if delta['scene'] is not None:
+                scene.id = delta['scene']['id']
+
+            # edges first, removing a node removes its edges as well
+            for edge_id in delta['edges_removed'] + list(delta['edges']):
+                edge = index.pop(edge_id, None)
+                if edge is not None and edge.grEdge is not None:
+                    edge.remove()
+
+            for node_id in delta['nodes_removed']:
+                node = index.pop(node_id, None)
+                if node is not None:
+                    for socket in node.inputs + node.outputs:
+                        index.pop(socket.id, None)
+                    node.remove()
+
+            for node_id, node_state in delta['nodes'].items():
+                node = index.get(node_id)
+                if node is None:
+                    scene.getNodeClassFromData(node_state)(scene).deserialize(node_state, index, restore_id=True)
+                elif self.onlyMoved(old['nodes'][node_id], node_state):
+                    node.setPos(node_state['pos_x'], node_state['pos_y'])
+                    node.updateConnectedEdges()
+                else:
+                    node.restoreState(node_state, index)
+
+            for edge_data in delta['edges'].values():
+                edge = Edge(scene)
+                edge.deserialize(edge_data, index, restore_id=True)
+                for socket in (edge.start_socket, edge.end_socket):
+                    if socket.is_input: socket.node.onInputChanged(edge)
+
+            if delta['nodes_order'] is not None:
+                position = {node_id: i for i, node_id in enumerate(delta['nodes_order'])}
+                scene.nodes.sort(key=lambda node: position.get(node.id, len(position)))
+            if delta['edges_order'] is not None:
+                position = {edge_id: i for i, edge_id in enumerate(delta['edges_order'])}
+                scene.edges.sort(key=lambda edge: position.get(edge.id, len(position)))
+            scene.controller.invalidateOrder()
+
+    def onlyMoved(self, old_state, new_state):
+        return all(old_state.get(key) == value for key, value in new_state.items() if key not in ('pos_x', 'pos_y'))
@@ -70,6 +70,13 @@ class Socket(Serializable):
             edge = self.edges.pop(0)
             edge.remove()
 
+    def remove(self):
+        self.removeAllEdges()
+        grScene = self.grSocket.scene()
+        if grScene is not None:
+            grScene.removeItem(self.grSocket)
+        self.grSocket = None
+
     def determineMultiEdges(self, data):
         if 'multi_edges' in data:
             return data['multi_edges']
@@ -1,23 +1,117 @@
 import logging
+from contextlib import contextmanager
 
 
 class SceneController:
+    """ Evaluates dirty nodes of the scene in topological order.
+
+    The order is derived from the socket edges and cached until the structure
+    of the scene changes (node or edge added/removed). Every pass walks the
+    order once, so each dirty node is evaluated at most once per change no
+    matter how many of its ancestors were updated before it.
+    """
 
     def __init__(self, scene):
         self.scene = scene
 
-    def scene_changed(self):
-        nodes = self.scene.nodes
-        for n in nodes:
-            clname = n.__class__.__name__
-            if not n.isDirty():
-                logging.debug(f'unchanged {clname} ')
-                #continue
-            logging.debug(f'changed {clname}')
-            n.eval()
+        self._order = None
+        self._evaluating = False
+        self._deferred = 0
+        self._pending_pass = False
+
+    def invalidateOrder(self):
+        self._order = None
+
+    def getOrder(self):
+        if self._order is None:
+            self._order = self.topologicalOrder()
+        return self._order
+
+    def getParentNodes(self, node):
+        parents = []
+        for socket in node.inputs:
+            for edge in socket.edges:
+                other_socket = edge.getOtherSocket(socket)
+                if other_socket is not None and other_socket.node not in parents:
+                    parents.append(other_socket.node)
+        return parents
 
+    def getChildNodes(self, node):
+        children = []
+        for socket in node.outputs:
+            for edge in socket.edges:
+                other_socket = edge.getOtherSocket(socket)
+                if other_socket is not None and other_socket.node not in children:
+                    children.append(other_socket.node)
+        return children
 
+    def topologicalOrder(self):
+        nodes = list(self.scene.nodes)
+        in_degree = {node: 0 for node in nodes}
+        children = {}
+        for node in nodes:
+            children[node] = [c for c in self.getChildNodes(node) if c in in_degree]
+            for child in children[node]:
+                in_degree[child] += 1
 
+        # Kahn's algorithm, seeded in insertion order to keep the result stable
+        order = []
+        ready = [node for node in nodes if in_degree[node] == 0]
+        while ready:
+            node = ready.pop(0)
+            order.append(node)
+            for child in children[node]:
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    ready.append(child)
 
+        if len(order) != len(nodes):
+            # cycles are not evaluable in one pass, keep them at the end
+            logging.warning(f'Scene graph contains a cycle, {len(nodes) - len(order)} nodes are unordered')
+            order.extend(node for node in nodes if in_degree[node] > 0)
+
+        logging.debug(f'topological order rebuilt for {len(order)} nodes')
+        return order
+
+    @contextmanager
+    def deferred(self):
+        """ Postpones evaluation while a batch of nodes is being marked dirty """
+        self._deferred += 1
+        try:
+            yield
+        finally:
+            self._deferred -= 1
+            if self._deferred == 0 and self._pending_pass:
+                self.scene_changed()
+
+    def scene_changed(self):
+        if self._deferred > 0:
+            self._pending_pass = True
+            return
 
+        # nodes dirtied while a pass is running come later in the order
+        if self._evaluating:
+            return
 
+        self._pending_pass = False
+        self._evaluating = True
+        try:
+            # nodes downstream of an asynchronous computation wait for its result,
+            # the node finishing it starts another pass
+            waiting = set()
+            for node in self.getOrder():
+                if node.isPending():
+                    waiting.add(node)
+                    continue
+                if not node.isDirty():
+                    continue
+                if any(parent in waiting for parent in self.getParentNodes(node)):
+                    waiting.add(node)
+                    continue
+                logging.debug(f'changed {node.__class__.__name__}')
+                node.eval()
+                node.onEvaluated()
+                if node.isPending():
+                    waiting.add(node)
+        finally:
+            self._evaluating = False
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def app():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def window(app):
+    from econ_helper.eh_executor import get_executor
+    from econ_helper.eh_sub_window import EcoHelperSubWindow
+
+    executor = get_executor()
+    executor.synchronous = True
+    w = EcoHelperSubWindow()
+    yield w
+    executor.synchronous = False
+    w.close()
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from econ_helper.eh_conf import get_class_from_opcode, NODE_TYPE_DATA_SOURCE, NODE_TYPE_PREPROCESSING, NODE_TYPE_ECO
+from nodeeditor.node_edge import Edge
+
+
+def test_undo_restores_factors_of_a_renamed_column(window, tmp_path):
+    scene = window.scene
+    rng = np.random.default_rng(0)
+    filename = str(tmp_path / 'data.csv')
+    pd.DataFrame({'sales': rng.random(50), 'tv': rng.random(50), 'radio': rng.random(50)}).to_csv(filename, index=False)
+
+    reader = get_class_from_opcode('read_csv', NODE_TYPE_DATA_SOURCE)(scene)
+    lag = get_class_from_opcode('lag', NODE_TYPE_PREPROCESSING)(scene)
+    reg = get_class_from_opcode('regression', NODE_TYPE_ECO)(scene)
+    Edge(scene, reader.outputs[0], lag.inputs[0])
+    Edge(scene, lag.outputs[0], reg.inputs[0])
+
+    lag.lag_column, lag.lag_size = 'tv', 1
+    reg.target_column, reg.factors = 'sales', ['tv lag 1', 'radio']
+    reader.filename = filename
+    scene.controller.scene_changed()
+    assert reg.output_value.factors == ['tv lag 1', 'radio']
+    scene.history.storeHistory('Lag 1')
+
+    # the lag column is renamed, 'tv lag 1' is gone from the regression input
+    lag.lagControl.setValue(2)
+    scene.controller.scene_changed()
+    assert 'tv lag 1' not in reg.input_value.columns
+    scene.history.storeHistory('Lag 2')
+
+    scene.history.undo()
+    scene.controller.scene_changed()
+    assert lag.lag_size == 1
+    assert reg.factors == ['tv lag 1', 'radio']
+    assert reg.output_value.factors == ['tv lag 1', 'radio']
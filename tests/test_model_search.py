@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from econ_helper import kernels
+
+
+@pytest.mark.parametrize('strategy', kernels.SEARCH_STRATEGIES)
+def test_leaderboard_respects_max_factors(strategy):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(200, 6)), columns=[f'x{i}' for i in range(6)])
+    df['y'] = df @ np.array([3.0, 2.0, 1.5, 1.0, 0.5, 0.25]) + rng.normal(size=200)
+
+    params = kernels.ModelSearchParams('y', tuple(f'x{i}' for i in range(6)), strategy, 'bic', 2, 10)
+    board = kernels.model_search(df, params)
+
+    assert len(board) > 0
+    assert (board['size'] <= 2).all()